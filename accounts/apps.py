@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'accounts'  # Make sure this matches your project structure 
\ No newline at end of file
+    name = 'accounts'  # Make sure this matches your project structure 
+
+    def ready(self):
+        from . import eligibility  # noqa: F401 - connects the eligibility index signals
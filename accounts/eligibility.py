@@ -0,0 +1,367 @@
+import bisect
+import contextlib
+import datetime
+import fcntl
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .membership_ids import normalize_membership_id
+from .models import EmployeeMembership, DependentMembership
+
+MAGIC = b'ELIG0001'
+# magic, generation, record count, key width, trailer offset
+HEADER = struct.Struct('<8sQQQQ')
+MEMBER_TYPES = {b'E': 'employee', b'D': 'dependent'}
+
+
+def get_config():
+    return {
+        'SNAPSHOT_DIR': os.path.join(settings.BASE_DIR, 'var', 'eligibility'),
+        'MAX_BATCH': 1000,
+        **getattr(settings, 'ELIGIBILITY', {}),
+    }
+
+
+def _record_struct(key_width):
+    # membership id, member type, member id, provider id, tier id,
+    # start ordinal, end ordinal (0 = open), is_active
+    return struct.Struct(f'<{key_width}sc3q2i?')
+
+
+def _entry(member_type, member_id, provider_id, tier_id, tier_name, start_date, end_date, is_active):
+    """Index entry; the field order is shared by the snapshot, journal and overlay"""
+    return (member_type, member_id, provider_id, tier_id, tier_name, start_date, end_date, is_active)
+
+
+def _rows(membership_ids=None):
+    """``(membership_id, entry)`` for every membership (or just ``membership_ids``), straight from the database"""
+    fields = (
+        'membership_id', '{owner}_id', 'provider_id', 'membership_tier_id',
+        'membership_tier__name', 'start_date', 'end_date', 'is_active',
+    )
+    for model, member_type, owner in (
+        (EmployeeMembership, 'employee', 'employee'),
+        (DependentMembership, 'dependent', 'dependent'),
+    ):
+        queryset = model.objects.all()
+        if membership_ids is not None:
+            queryset = queryset.filter(membership_id__in=membership_ids)
+        values = queryset.values_list(*(field.format(owner=owner) for field in fields))
+        for membership_id, *rest in values.iterator(chunk_size=5000):
+            yield membership_id, _entry(member_type, *rest)
+
+
+def _entry_for(instance):
+    member_type = 'employee' if isinstance(instance, EmployeeMembership) else 'dependent'
+    return _entry(
+        member_type,
+        instance.employee_id if member_type == 'employee' else instance.dependent_id,
+        instance.provider_id,
+        instance.membership_tier_id,
+        instance.membership_tier.name,
+        instance.start_date,
+        instance.end_date,
+        instance.is_active,
+    )
+
+
+class Snapshot:
+    """Read-only view of a snapshot file: fixed-width records sorted by membership id"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.generation, self.count, key_width, trailer = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not an eligibility snapshot')
+        self.key_width = key_width
+        self.record = _record_struct(key_width)
+        self.tier_names = {
+            int(tier_id): name for tier_id, name in json.loads(self.buffer[trailer:]).items()
+        }
+        self.keys = _Keys(self)
+
+    def get(self, membership_id):
+        key = membership_id.encode()
+        if len(key) > self.key_width:
+            return None
+        key = key.ljust(self.key_width, b'\0')
+        position = bisect.bisect_left(self.keys, key)
+        if position == self.count or self.keys[position] != key:
+            return None
+        _, member_type, member_id, provider_id, tier_id, start, end, is_active = self.record.unpack_from(
+            self.buffer, HEADER.size + position * self.record.size
+        )
+        return _entry(
+            MEMBER_TYPES[member_type], member_id, provider_id, tier_id,
+            self.tier_names.get(tier_id, ''),
+            datetime.date.fromordinal(start),
+            datetime.date.fromordinal(end) if end else None,
+            is_active,
+        )
+
+    def close(self):
+        self.buffer.close()
+
+
+class _Keys:
+    """Sequence of a snapshot's record keys for ``bisect``, read straight from the mmap"""
+
+    def __init__(self, snapshot):
+        self.buffer = snapshot.buffer
+        self.size = snapshot.record.size
+        self.width = snapshot.key_width
+        self.count = snapshot.count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        offset = HEADER.size + index * self.size
+        return self.buffer[offset:offset + self.width]
+
+
+class EligibilityIndex:
+    """
+    Membership eligibility by ``membership_id`` without touching the database.
+
+    Memberships are written to an mmap'ed snapshot file (fixed-width records
+    sorted by ID, binary searched in place), so every worker on the host shares
+    the same pages. Saves and deletes are appended, once committed, to a
+    journal next to the snapshot; each worker replays new journal lines into a
+    small in-memory overlay before answering, so changes show up everywhere
+    without a rebuild. ``build()`` writes a fresh snapshot and journal and
+    switches the ``CURRENT`` pointer atomically. Until the first build there is
+    no snapshot, and lookups read the memberships from the database instead.
+    """
+
+    def __init__(self, directory=None):
+        self._directory = directory
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.overlay = {}
+        self.generation = None
+        self.current_mtime = None
+        self.journal_offset = 0
+
+    @property
+    def directory(self):
+        return self._directory or get_config()['SNAPSHOT_DIR']
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _current_generation(self):
+        try:
+            with open(self._path('CURRENT')) as file:
+                return int(file.read())
+        except FileNotFoundError:
+            return None
+
+    @contextlib.contextmanager
+    def _journal_lock(self, operation):
+        """flock shared by journal writers (``LOCK_SH``) and taken exclusively by ``build()``"""
+        with open(self._path('journal.lock'), 'ab') as file:
+            fcntl.flock(file, operation)
+            yield
+
+    # Building
+
+    def build(self, rows=None):
+        """Write a new snapshot generation (from the database unless ``rows`` is given); returns the record count"""
+        os.makedirs(self.directory, exist_ok=True)
+        previous = self._current_generation() or 0
+        generation = previous + 1
+        old_journal = self._path(f'journal-{previous}.ndjson')
+        journal_start = os.path.getsize(old_journal) if os.path.exists(old_journal) else 0
+
+        rows = sorted(
+            ((membership_id.encode(), entry) for membership_id, entry in (rows or _rows())),
+            key=lambda row: row[0]
+        )
+        key_width = max((len(key) for key, _ in rows), default=1)
+        record = _record_struct(key_width)
+        tier_names = {}
+
+        with tempfile.NamedTemporaryFile('wb', dir=self.directory, delete=False) as file:
+            file.write(HEADER.pack(MAGIC, generation, len(rows), key_width, 0))
+            for key, (member_type, member_id, provider_id, tier_id, tier_name, start, end, active) in rows:
+                tier_names[tier_id] = tier_name
+                file.write(record.pack(
+                    key, member_type[0].upper().encode(), member_id, provider_id, tier_id,
+                    start.toordinal(), end.toordinal() if end else 0, active
+                ))
+            trailer = file.tell()
+            file.write(json.dumps(tier_names).encode())
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, generation, len(rows), key_width, trailer))
+        os.replace(file.name, self._path(f'snapshot-{generation}.bin'))
+
+        # Carry over changes journalled while the snapshot was being built.
+        # Writers are held off until CURRENT points at the new journal, so no
+        # line can land in the old one after its tail is copied
+        with self._journal_lock(fcntl.LOCK_EX):
+            with open(self._path(f'journal-{generation}.ndjson'), 'ab') as journal:
+                if os.path.exists(old_journal):
+                    with open(old_journal, 'rb') as source:
+                        source.seek(journal_start)
+                        journal.write(source.read())
+            self._write_current(generation)
+        for name in (f'snapshot-{previous - 1}.bin', f'journal-{previous - 1}.ndjson'):
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+        return len(rows)
+
+    def _write_current(self, generation):
+        with tempfile.NamedTemporaryFile('w', dir=self.directory, delete=False) as file:
+            file.write(str(generation))
+        os.replace(file.name, self._path('CURRENT'))
+
+    # Reading
+
+    def _refresh(self):
+        """Pick up a new snapshot generation and any journal lines not yet applied"""
+        try:
+            mtime = os.stat(self._path('CURRENT')).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self.current_mtime:
+            generation = self._current_generation()
+            if generation != self.generation:
+                if self.snapshot is not None:
+                    self.snapshot.close()
+                self.snapshot = Snapshot(self._path(f'snapshot-{generation}.bin'))
+                self.generation = generation
+                self.overlay = {}
+                self.journal_offset = 0
+            self.current_mtime = mtime
+
+        journal = self._path(f'journal-{self.generation}.ndjson')
+        try:
+            size = os.stat(journal).st_size
+        except FileNotFoundError:
+            return
+        if size > self.journal_offset:
+            with open(journal, 'rb') as file:
+                file.seek(self.journal_offset)
+                data = file.read(size - self.journal_offset)
+            # Only consume complete lines; a partial one is read next time
+            data = data[:data.rfind(b'\n') + 1]
+            for line in data.splitlines():
+                change = json.loads(line)
+                self.overlay[change['id']] = self._decode(change['entry'])
+            self.journal_offset += len(data)
+
+    def _decode(self, entry):
+        if entry is None:
+            return None
+        start, end = entry[5], entry[6]
+        return _entry(
+            *entry[:5],
+            datetime.date.fromisoformat(start),
+            datetime.date.fromisoformat(end) if end else None,
+            entry[7],
+        )
+
+    def _get(self, membership_id):
+        if membership_id in self.overlay:
+            return self.overlay[membership_id]
+        if self.snapshot is None:
+            return None
+        return self.snapshot.get(membership_id)
+
+    def lookup_many(self, membership_ids, today=None):
+        """Eligibility for each ID, in order; IDs are also tried in normalized form"""
+        today = today or datetime.date.today()
+        membership_ids = [str(membership_id).strip() for membership_id in membership_ids]
+        with self.lock:
+            self._refresh()
+            if self.snapshot is not None:
+                return self._resolve(membership_ids, self._get, today)
+        # No snapshot built yet: every member would read as not found
+        entries = dict(_rows([*membership_ids, *map(normalize_membership_id, membership_ids)]))
+        return self._resolve(membership_ids, entries.get, today)
+
+    def _resolve(self, membership_ids, get, today):
+        results = []
+        for membership_id in membership_ids:
+            entry = get(membership_id)
+            if entry is None:
+                normalized = normalize_membership_id(membership_id)
+                if normalized != membership_id:
+                    entry = get(normalized)
+                    membership_id = normalized if entry is not None else membership_id
+            results.append(self._result(membership_id, entry, today))
+        return results
+
+    def lookup(self, membership_id, today=None):
+        return self.lookup_many([membership_id], today)[0]
+
+    def _result(self, membership_id, entry, today):
+        if entry is None:
+            return {'membership_id': membership_id, 'found': False, 'eligible': False}
+        member_type, member_id, provider_id, tier_id, tier_name, start, end, is_active = entry
+        return {
+            'membership_id': membership_id,
+            'found': True,
+            'eligible': is_active and start <= today and (end is None or today <= end),
+            'member_type': member_type,
+            'member_id': member_id,
+            'provider': provider_id,
+            'membership_tier': tier_id,
+            'membership_tier_name': tier_name,
+            'start_date': start,
+            'end_date': end,
+            'is_active': is_active,
+        }
+
+    # Incremental updates
+
+    def record_change(self, membership_id, entry):
+        """Journal a membership's new state (``None`` when deleted) for every worker"""
+        if self._current_generation() is None:
+            return
+        line = {'id': membership_id, 'entry': None}
+        if entry is not None:
+            line['entry'] = [
+                *entry[:5],
+                entry[5].isoformat(),
+                entry[6].isoformat() if entry[6] else None,
+                entry[7],
+            ]
+        # One short O_APPEND write, so concurrent workers never interleave
+        # lines; the shared lock keeps build() from switching generations
+        # between reading CURRENT and writing
+        with self._journal_lock(fcntl.LOCK_SH):
+            generation = self._current_generation()
+            with open(self._path(f'journal-{generation}.ndjson'), 'ab') as journal:
+                journal.write(json.dumps(line).encode() + b'\n')
+
+
+eligibility_index = EligibilityIndex()
+
+
+def membership_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    entry = _entry_for(instance)
+    transaction.on_commit(lambda: eligibility_index.record_change(instance.membership_id, entry))
+
+
+def membership_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: eligibility_index.record_change(instance.membership_id, None))
+
+
+for _model in (EmployeeMembership, DependentMembership):
+    post_save.connect(membership_saved, sender=_model, dispatch_uid=f'eligibility.save.{_model.__name__}')
+    post_delete.connect(membership_deleted, sender=_model, dispatch_uid=f'eligibility.delete.{_model.__name__}')
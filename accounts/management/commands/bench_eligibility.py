@@ -0,0 +1,87 @@
+import datetime
+import random
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.eligibility import EligibilityIndex
+from accounts.membership_ids import format_membership_id
+
+
+def synthetic_rows(size):
+    """Membership entries shaped like the index's, with IDs from the real allocator format"""
+    rng = random.Random(42)
+    today = datetime.date.today()
+    for number in range(1, size + 1):
+        prefix = 'E' if number % 3 else 'D'
+        start = today - datetime.timedelta(days=rng.randint(0, 2000))
+        end = None if number % 5 else start + datetime.timedelta(days=rng.randint(30, 800))
+        yield format_membership_id(prefix, number), (
+            'employee' if prefix == 'E' else 'dependent', number, number % 200 + 1,
+            number % 600 + 1, f'Tier {number % 600 + 1}', start, end, number % 11 != 0,
+        )
+
+
+class Command(BaseCommand):
+    help = 'Measure eligibility index lookup latency on a synthetic snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1_000_000, help='Memberships in the snapshot')
+        parser.add_argument('--lookups', type=int, default=100_000)
+        parser.add_argument('--batch', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rows = dict(synthetic_rows(options['size']))
+        ids = list(rows)
+        rng = random.Random(7)
+        # One lookup in ten misses
+        probes = [
+            rng.choice(ids) if i % 10 else format_membership_id('E', options['size'] * 2 + i)
+            for i in range(options['lookups'])
+        ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            index = EligibilityIndex(directory)
+            start = time.perf_counter()
+            index.build(rows.items())
+            self.stdout.write(f"Built {options['size']:,} memberships in {time.perf_counter() - start:.1f}s")
+
+            for membership_id in probes[:1000]:
+                result = index.lookup(membership_id)
+                entry = rows.get(membership_id)
+                if result['found'] != (entry is not None) or (entry and result['membership_tier'] != entry[3]):
+                    raise CommandError(f'Index disagrees with the source rows for {membership_id}')
+
+            timings = []
+            for membership_id in probes:
+                begin = time.perf_counter_ns()
+                index.lookup(membership_id)
+                timings.append(time.perf_counter_ns() - begin)
+            timings.sort()
+            self.stdout.write(
+                f'Single lookup: p50 {timings[len(timings) // 2] / 1000:.1f}us, '
+                f'p99 {timings[int(len(timings) * 0.99)] / 1000:.1f}us, '
+                f'mean {statistics.fmean(timings) / 1000:.1f}us'
+            )
+
+            batch = options['batch']
+            start = time.perf_counter()
+            for offset in range(0, len(probes), batch):
+                index.lookup_many(probes[offset:offset + batch])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'Batch lookup ({batch} per call): {len(probes) / elapsed:,.0f} IDs/s, '
+                f'{elapsed / (len(probes) / batch) * 1000:.2f}ms per batch'
+            )
+
+            # A second worker sees a journalled change without a rebuild
+            changed = ids[0]
+            entry = rows[changed]
+            index.record_change(changed, (*entry[:7], False))
+            other = EligibilityIndex(directory)
+            if other.lookup(changed)['is_active'] or index.lookup(changed)['is_active']:
+                raise CommandError('Journalled change was not picked up')
+
+        self.stdout.write(self.style.SUCCESS('Eligibility index matches its source rows'))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts.eligibility import eligibility_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the shared eligibility snapshot from the membership tables'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = eligibility_index.build()
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {count} memberships to {eligibility_index.directory} '
+            f'in {time.perf_counter() - start:.1f}s'
+        ))
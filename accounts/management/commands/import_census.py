@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Employer
+from accounts.services import CensusImportService, CensusFormatError
+
+
+class Command(BaseCommand):
+    help = 'Bulk import employees and dependents for an employer from a CSV or NDJSON census file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('employer_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=CensusImportService.FORMATS,
+                            help='File format (defaults to the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--chunked', action='store_true',
+                            help='Commit each chunk separately instead of one transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only')
+
+    def handle(self, *args, **options):
+        try:
+            employer = Employer.objects.get(pk=options['employer_id'])
+        except Employer.DoesNotExist:
+            raise CommandError(f"Employer {options['employer_id']} does not exist")
+
+        file_format = options['format'] or options['path'].rsplit('.', 1)[-1].lower()
+        service = CensusImportService(
+            employer,
+            chunk_size=options['chunk_size'],
+            atomic=not options['chunked'],
+            dry_run=options['dry_run'],
+        )
+        try:
+            with open(options['path'], 'rb') as stream:
+                report = service.run(stream, file_format)
+        except (CensusFormatError, OSError) as e:
+            raise CommandError(str(e))
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Employees: {report['employees_created']} created, {report['employees_updated']} updated; "
+            f"dependents: {report['dependents_created']} created, {report['dependents_updated']} updated; "
+            f"{len(report['errors'])} rows rejected"
+        ))
@@ -0,0 +1,127 @@
+import os
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Crockford base32: no I, L, O or U, so IDs read back unambiguously
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+WIDTH = 7  # 32**7 ~ 34 billion numbers per prefix
+_DECODE = str.maketrans({'O': '0', 'I': '1', 'L': '1', '-': None, ' ': None})
+
+
+def check_character(payload):
+    """Luhn mod 32 check character: catches every single-character typo and nearly all swaps"""
+    factor = 2
+    total = 0
+    for char in reversed(payload):
+        addend = factor * ALPHABET.index(char)
+        factor = 1 if factor == 2 else 2
+        total += addend // 32 + addend % 32
+    return ALPHABET[-total % 32]
+
+
+def format_membership_id(prefix, number):
+    """Format ``number`` as ``<prefix><7 base32 digits><check>``, e.g. ``E000005BQ``"""
+    digits = []
+    for _ in range(WIDTH):
+        number, remainder = divmod(number, 32)
+        digits.append(ALPHABET[remainder])
+    if number:
+        raise OverflowError('Membership number does not fit in the ID width')
+    payload = prefix + ''.join(reversed(digits))
+    return payload + check_character(payload)
+
+
+def normalize_membership_id(value):
+    """Uppercase and undo common misreadings (O/0, I/L/1, separators)"""
+    return str(value).upper().translate(_DECODE)
+
+
+def is_valid_membership_id(value):
+    value = normalize_membership_id(value)
+    if len(value) != WIDTH + 2 or any(char not in ALPHABET for char in value):
+        return False
+    return check_character(value[:-1]) == value[-1]
+
+
+class MembershipIdAllocator:
+    """
+    Hands out membership IDs from number blocks reserved per worker.
+
+    Each worker reserves ``MEMBERSHIP_ID_BLOCK_SIZE`` numbers at a time from the shared
+    ``MembershipIdSequence`` row and formats IDs locally, so creating memberships
+    costs one database round trip per block rather than per ID. Reservations
+    run on their own autocommit connection: a caller's rollback can never hand
+    the same block to another worker. Numbers left in a block when a worker
+    exits are skipped, never reused.
+    """
+
+    def __init__(self, sequence='membership'):
+        self.sequence = sequence
+        self.lock = threading.Lock()
+        self.pid = None
+        self.next = self.end = 0
+
+    @property
+    def block_size(self):
+        return getattr(settings, 'MEMBERSHIP_ID_BLOCK_SIZE', 1000)
+
+    def _reserve(self, count):
+        """Reserve ``count`` numbers and return the first one"""
+        table = apps.get_model('accounts', 'MembershipIdSequence')._meta.db_table
+        connection = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (name, next_value) VALUES (%s, 1) '
+                    f'ON CONFLICT (name) DO NOTHING',
+                    [self.sequence]
+                )
+                cursor.execute(
+                    f'UPDATE {table} SET next_value = next_value + %s '
+                    f'WHERE name = %s RETURNING next_value',
+                    [count, self.sequence]
+                )
+                return cursor.fetchone()[0] - count
+        finally:
+            connection.close()
+
+    def numbers(self, count):
+        """Return ``count`` unused membership numbers"""
+        with self.lock:
+            if self.pid != os.getpid():
+                # Never share a block reserved before a fork
+                self.pid = os.getpid()
+                self.next = self.end = 0
+
+            numbers = []
+            while len(numbers) < count:
+                if self.next >= self.end:
+                    size = max(self.block_size, count - len(numbers))
+                    self.next = self._reserve(size)
+                    self.end = self.next + size
+                take = min(count - len(numbers), self.end - self.next)
+                numbers.extend(range(self.next, self.next + take))
+                self.next += take
+            return numbers
+
+    def allocate(self, prefix, count=1):
+        return [format_membership_id(prefix, number) for number in self.numbers(count)]
+
+    def assign(self, memberships):
+        """Fill in ``membership_id`` on every membership that lacks one"""
+        pending = [membership for membership in memberships if not membership.membership_id]
+        for membership, number in zip(pending, self.numbers(len(pending))):
+            membership.membership_id = format_membership_id(
+                membership.MEMBERSHIP_ID_PREFIX, number
+            )
+        return memberships
+
+    def bulk_create(self, model, memberships, batch_size=1000):
+        """``bulk_create`` memberships with generated IDs"""
+        return model.objects.bulk_create(self.assign(memberships), batch_size=batch_size)
+
+
+membership_ids = MembershipIdAllocator()
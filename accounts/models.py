@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from core.ranges import CoverageQuerySet, coverage_exclusion, coverage_field, coverage_index
+from .membership_ids import membership_ids
 
 class User(AbstractUser):
     class UserType(models.TextChoices):
@@ -59,6 +61,7 @@ class Provider(models.Model):
         default=0,
         help_text="Current number of active patients"
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Provider: {self.user.get_full_name()} ({self.get_provider_type_display()})"
@@ -125,6 +128,7 @@ class Broker(models.Model):
     national_producer_number = models.CharField(max_length=100)
     states_licensed = models.JSONField(default=list)
     licensure_number = models.CharField(max_length=100)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Broker: {self.user.get_full_name()}"
@@ -152,6 +156,7 @@ class Employer(models.Model):
     city = models.CharField(max_length=100)
     state = models.CharField(max_length=2)
     zip_code = models.CharField(max_length=10)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.company_name} (Contact: {self.contact_person.get_full_name()})"
@@ -186,6 +191,7 @@ class Employee(models.Model):
     date_of_birth = models.DateField()
     enrollment_date = models.DateField()
     enrollment_status = models.CharField(max_length=20)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -217,11 +223,33 @@ class EmployeeMembership(models.Model):
     membership_id = models.CharField(max_length=50, unique=True)
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
+    coverage = coverage_field()
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CoverageQuerySet.as_manager()
+
+    MEMBERSHIP_ID_PREFIX = 'E'
 
     def __str__(self):
         return f"{self.employee} - {self.membership_tier.name} ({self.membership_id})"
 
+    def save(self, *args, **kwargs):
+        if not self.membership_id:
+            membership_ids.assign([self])
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            coverage_index('employee_mship_coverage_gist'),
+        ]
+        constraints = [
+            coverage_exclusion(
+                'employee_membership_no_overlapping_coverage', 'employee', 'provider',
+                condition=models.Q(is_active=True)
+            ),
+        ]
+
 class Dependent(models.Model):
     class Relationship(models.TextChoices):
         SPOUSE = 'SPOUSE', 'Spouse'
@@ -243,6 +271,7 @@ class Dependent(models.Model):
     )
     enrollment_date = models.DateField()
     enrollment_status = models.CharField(max_length=20)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.get_relationship_display()} of {self.employee.first_name} {self.employee.last_name}"
@@ -269,11 +298,41 @@ class DependentMembership(models.Model):
     membership_id = models.CharField(max_length=50, unique=True)
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
+    coverage = coverage_field()
     is_active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CoverageQuerySet.as_manager()
+
+    MEMBERSHIP_ID_PREFIX = 'D'
 
     def __str__(self):
         return f"{self.dependent} - {self.membership_tier.name} ({self.membership_id})"
 
+    def save(self, *args, **kwargs):
+        if not self.membership_id:
+            membership_ids.assign([self])
+        super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            coverage_index('dependent_mship_coverage_gist'),
+        ]
+        constraints = [
+            coverage_exclusion(
+                'dependent_membership_no_overlapping_coverage', 'dependent', 'provider',
+                condition=models.Q(is_active=True)
+            ),
+        ]
+
+class MembershipIdSequence(models.Model):
+    """Block counter behind membership ID generation (see membership_ids)"""
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
 class ProviderOperatingHours(models.Model):
     class DayOfWeek(models.TextChoices):
         MONDAY = 'monday', 'Monday'
@@ -296,6 +355,7 @@ class ProviderOperatingHours(models.Model):
     is_open = models.BooleanField(default=True)
     open_time = models.TimeField(null=True, blank=True)
     close_time = models.TimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['provider', 'day']
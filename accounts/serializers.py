@@ -15,7 +15,9 @@ from .models import (
     DependentMembership,
     Message
 )
+from django.db.models import BooleanField, Case, F, Value, When
 from django.utils import timezone
+from core.serializers import CompiledSerializer
 import uuid
 
 class UserSerializer(serializers.ModelSerializer):
@@ -74,6 +76,19 @@ class EmployeeSerializer(serializers.ModelSerializer):
             'memberships'
         ]
 
+class EmployeeCompiledSerializer(CompiledSerializer):
+    """Read-only fast path for employee lists"""
+    serializer_class = EmployeeSerializer
+    expressions = {
+        # Mirrors Employee.is_contact_person
+        'is_contact_person': Case(
+            When(user__isnull=True, then=Value(None)),
+            When(user_id=F('employer__contact_person_id'), then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+    }
+
 class EmployerSerializer(serializers.ModelSerializer):
     contact_person = UserSerializer(read_only=True)
     employees = EmployeeSerializer(many=True, read_only=True)
@@ -235,6 +250,10 @@ class DependentSerializer(serializers.ModelSerializer):
             'memberships'
         ]
 
+class DependentCompiledSerializer(CompiledSerializer):
+    """Read-only fast path for dependent lists"""
+    serializer_class = DependentSerializer
+
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message  # Create Message model if not exists
@@ -0,0 +1,292 @@
+import csv
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from audit.services import AuditService
+from .models import Employee, Dependent
+
+
+class CensusFormatError(ValueError):
+    """Raised when a census file cannot be read at all"""
+
+
+class CensusImportService:
+    """
+    Bulk employee census import for an employer.
+
+    Accepts CSV (one row per person; dependent rows name their employee in
+    ``employee_email`` and carry a ``relationship``) or NDJSON (one employee
+    object per line with an optional ``dependents`` list). Rows are validated
+    column by column in batches, employees are upserted by email with
+    ``bulk_create(update_conflicts=True)`` and dependents are matched on
+    employee, name and date of birth, then bulk updated or created.
+
+    Invalid rows are skipped and returned in the report. With ``atomic`` the
+    whole import is one transaction; otherwise each chunk commits on its own
+    and a chunk that fails in the database is reported against its rows.
+    """
+    EMPLOYEE_FIELDS = [
+        'first_name', 'last_name', 'email', 'address_line1', 'address_line2',
+        'city', 'state', 'zip_code', 'sex', 'date_of_birth', 'enrollment_date',
+        'enrollment_status',
+    ]
+    DEPENDENT_FIELDS = [
+        'first_name', 'last_name', 'date_of_birth', 'sex', 'relationship',
+        'enrollment_date', 'enrollment_status',
+    ]
+    FORMATS = ('csv', 'ndjson')
+
+    def __init__(self, employer, user=None, chunk_size=500, atomic=True, dry_run=False):
+        self.employer = employer
+        self.user = user
+        self.chunk_size = chunk_size
+        self.atomic = atomic
+        self.dry_run = dry_run
+        self.errors = []
+        self.counts = {
+            'employees_created': 0,
+            'employees_updated': 0,
+            'dependents_created': 0,
+            'dependents_updated': 0,
+        }
+
+    def run(self, stream, file_format, request=None):
+        """Import ``stream`` (bytes) and return the per-row report"""
+        employees, dependents = self.read(stream, file_format)
+        employees = self.validate_employees(employees)
+        dependents = self.validate_dependents(dependents)
+
+        if not self.dry_run:
+            if self.atomic:
+                with transaction.atomic():
+                    self.write(employees, dependents)
+            else:
+                self.write(employees, dependents)
+
+            AuditService.log_action(
+                user=self.user,
+                action='CREATE',
+                request=request,
+                target_object=self.employer,
+                details={'census_import': self.counts, 'rejected_rows': len(self.errors)}
+            )
+
+        return {
+            **self.counts,
+            'dry_run': self.dry_run,
+            'valid_employees': len(employees),
+            'valid_dependents': len(dependents),
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+        }
+
+    # Reading
+
+    def read(self, stream, file_format):
+        """Split the file into ``(row, data)`` employees and ``(row, email, data)`` dependents"""
+        if file_format not in self.FORMATS:
+            raise CensusFormatError(f"Unsupported census format '{file_format}'")
+
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        employees, dependents = [], []
+        try:
+            if file_format == 'csv':
+                reader = csv.DictReader(text)
+                missing = {'first_name', 'last_name', 'email'} - set(reader.fieldnames or [])
+                if missing:
+                    raise CensusFormatError(f"Missing CSV columns: {', '.join(sorted(missing))}")
+                for row, data in enumerate(reader, start=2):
+                    if data.get('employee_email'):
+                        dependents.append((row, data['employee_email'].strip().lower(), data))
+                    else:
+                        employees.append((row, data))
+            else:
+                for row, line in enumerate(text, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        data = json.loads(line)
+                    except ValueError as exc:
+                        self.errors.append({'row': row, 'errors': {'non_field_errors': [str(exc)]}})
+                        continue
+                    if not isinstance(data, dict):
+                        self.errors.append({'row': row, 'errors': {'non_field_errors': ['Expected a JSON object.']}})
+                        continue
+                    employees.append((row, data))
+                    email = str(data.get('email') or '').strip().lower()
+                    for dependent in data.get('dependents') or []:
+                        dependents.append((row, email, dependent))
+        except UnicodeDecodeError:
+            raise CensusFormatError('Census files must be UTF-8 encoded')
+        finally:
+            text.detach()
+        return employees, dependents
+
+    # Validation
+
+    def _clean_batch(self, rows, model, field_names):
+        """Validate a batch column by column; returns ``(row, cleaned)`` pairs"""
+        errors = {row: {} for row, *_ in rows}
+        cleaned = {row: {} for row, *_ in rows}
+        for name in field_names:
+            model_field = model._meta.get_field(name)
+            choices = {str(value) for value, _ in model_field.choices} if model_field.choices else None
+            is_date = model_field.get_internal_type() == 'DateField'
+            is_email = name == 'email'
+            for row, *_, data in rows:
+                value = data.get(name)
+                value = '' if value is None else str(value).strip()
+                if is_email or name == 'sex':
+                    value = value.lower() if is_email else value.upper()
+                if not value:
+                    if model_field.blank:
+                        # A column missing from the file is left out, so an
+                        # update does not blank it
+                        if name in data:
+                            cleaned[row][name] = ''
+                    else:
+                        errors[row][name] = ['This field is required.']
+                    continue
+                if is_date:
+                    try:
+                        value = parse_date(value)
+                    except ValueError:
+                        value = None
+                    if value is None:
+                        errors[row][name] = ['Enter a valid date (YYYY-MM-DD).']
+                        continue
+                elif model_field.max_length and len(value) > model_field.max_length:
+                    errors[row][name] = [f'Ensure this field has no more than {model_field.max_length} characters.']
+                    continue
+                if choices is not None and value not in choices:
+                    errors[row][name] = [f'"{value}" is not a valid choice.']
+                    continue
+                if is_email:
+                    try:
+                        validate_email(value)
+                    except ValidationError:
+                        errors[row][name] = ['Enter a valid email address.']
+                        continue
+                cleaned[row][name] = value
+
+        valid = []
+        for row, *rest in rows:
+            if errors[row]:
+                self.errors.append({'row': row, 'errors': errors[row]})
+            else:
+                valid.append((row, *rest[:-1], cleaned[row]))
+        return valid
+
+    def validate_employees(self, employees):
+        valid = []
+        seen = set()
+        for start in range(0, len(employees), self.chunk_size):
+            batch = self._clean_batch(employees[start:start + self.chunk_size], Employee, self.EMPLOYEE_FIELDS)
+            taken = set(
+                Employee.objects.filter(email__in=[data['email'] for _, data in batch])
+                .exclude(employer=self.employer)
+                .values_list('email', flat=True)
+            )
+            for row, data in batch:
+                if data['email'] in taken:
+                    self.errors.append({'row': row, 'errors': {'email': ['Email belongs to another employer.']}})
+                elif data['email'] in seen:
+                    self.errors.append({'row': row, 'errors': {'email': ['Duplicate email in this file.']}})
+                else:
+                    seen.add(data['email'])
+                    valid.append((row, data))
+        return valid
+
+    def validate_dependents(self, dependents):
+        valid = []
+        for start in range(0, len(dependents), self.chunk_size):
+            valid.extend(self._clean_batch(
+                dependents[start:start + self.chunk_size], Dependent, self.DEPENDENT_FIELDS
+            ))
+        return valid
+
+    # Writing
+
+    def _chunks(self, rows):
+        for start in range(0, len(rows), self.chunk_size):
+            yield rows[start:start + self.chunk_size]
+
+    def _write_chunk(self, write, chunk):
+        if self.atomic:
+            write(chunk)
+            return
+        try:
+            with transaction.atomic():
+                write(chunk)
+        except DatabaseError as exc:
+            for row, *_ in chunk:
+                self.errors.append({'row': row, 'errors': {'non_field_errors': [str(exc)]}})
+
+    def write(self, employees, dependents):
+        for chunk in self._chunks(employees):
+            self._write_chunk(self._write_employees, chunk)
+        for chunk in self._chunks(dependents):
+            self._write_chunk(self._write_dependents, chunk)
+
+    def _write_employees(self, chunk):
+        emails = [data['email'] for _, data in chunk]
+        existing = set(
+            Employee.objects.filter(employer=self.employer, email__in=emails)
+            .values_list('email', flat=True)
+        )
+        # Only the columns a row carries are updated; NDJSON rows may differ
+        by_columns = {}
+        for _, data in chunk:
+            by_columns.setdefault(tuple(data), []).append(data)
+        for columns, rows in by_columns.items():
+            Employee.objects.bulk_create(
+                [Employee(employer=self.employer, **data) for data in rows],
+                update_conflicts=True,
+                unique_fields=['email'],
+                update_fields=[name for name in columns if name != 'email'] + ['updated_at'],
+            )
+        self.counts['employees_created'] += len(chunk) - len(existing)
+        self.counts['employees_updated'] += len(existing)
+
+    def _write_dependents(self, chunk):
+        employee_ids = dict(
+            Employee.objects.filter(
+                employer=self.employer,
+                email__in={email for _, email, _ in chunk}
+            ).values_list('email', 'id')
+        )
+        existing = {
+            (dependent.employee_id, dependent.first_name.lower(),
+             dependent.last_name.lower(), dependent.date_of_birth): dependent
+            for dependent in Dependent.objects.filter(employee_id__in=employee_ids.values())
+        }
+
+        to_create, to_update = [], []
+        now = timezone.now()
+        for row, email, data in chunk:
+            employee_id = employee_ids.get(email)
+            if employee_id is None:
+                self.errors.append({'row': row, 'errors': {'employee_email': ['No employee with this email.']}})
+                continue
+            key = (employee_id, data['first_name'].lower(), data['last_name'].lower(), data['date_of_birth'])
+            dependent = existing.get(key)
+            if dependent is None:
+                dependent = Dependent(employee_id=employee_id, **data)
+                existing[key] = dependent
+                to_create.append(dependent)
+            else:
+                for name, value in data.items():
+                    setattr(dependent, name, value)
+                # bulk_update() does not apply auto_now
+                dependent.updated_at = now
+                to_update.append(dependent)
+
+        Dependent.objects.bulk_create(to_create)
+        Dependent.objects.bulk_update(to_update, [*self.DEPENDENT_FIELDS, 'updated_at'])
+        self.counts['dependents_created'] += len(to_create)
+        self.counts['dependents_updated'] += len(to_update)
@@ -19,6 +19,8 @@ from .views import (
     request_password_reset,
     reset_password_confirm,
     verify_email,
+    eligibility_lookup,
+    eligibility_batch,
 )
 
 router = DefaultRouter()
@@ -37,5 +39,7 @@ urlpatterns = [
     path('password/reset/', request_password_reset, name='password_reset'),
     path('password/reset/confirm/', reset_password_confirm, name='password_reset_confirm'),
     path('verify-email/', verify_email, name='verify_email'),
+    path('eligibility/batch/', eligibility_batch, name='eligibility_batch'),
+    path('eligibility/<str:membership_id>/', eligibility_lookup, name='eligibility_lookup'),
     path('', include(router.urls)),
 ] 
\ No newline at end of file
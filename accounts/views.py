@@ -1,5 +1,6 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from .models import (
@@ -28,7 +29,9 @@ from .serializers import (
     NPProviderSerializer,
     EmployerSerializer,
     EmployeeSerializer,
+    EmployeeCompiledSerializer,
     DependentSerializer,
+    DependentCompiledSerializer,
     MembershipTierSerializer,
     OperatingHoursSerializer,
     ProviderProfileSerializer,
@@ -58,29 +61,37 @@ from datetime import datetime
 from django.shortcuts import get_object_or_404
 from django.db.models import Count, Sum
 from .permissions import IsEmployer, IsProvider, IsBroker, IsAdmin, IsOwnerOrAdmin
+from .services import CensusImportService, CensusFormatError
+from .eligibility import eligibility_index, get_config as get_eligibility_config
 from .decorators import require_user_type, require_object_ownership
 from audit.decorators import audit_action, audit_security
 from audit.services import AuditService
+from core.cache import cache_response
+from core.mixins import CompiledListMixin, ConditionalGetMixin
 
 User = get_user_model()
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
     @action(detail=False, methods=['GET'])
     def me(self, request):
-        serializer = self.get_serializer(request.user)
-        return Response(serializer.data)
+        return self.conditional_response(
+            User.objects.filter(pk=request.user.pk),
+            lambda: Response(self.get_serializer(request.user).data)
+        )
 
     @action(detail=False, methods=['GET'])
+    @cache_response(User)
     def brokers(self, request):
         brokers = User.objects.filter(user_type=User.UserType.BROKER)
         serializer = self.get_serializer(brokers, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['GET'])
+    @cache_response(User)
     def providers(self, request):
         providers = User.objects.filter(user_type=User.UserType.PROVIDER)
         serializer = self.get_serializer(providers, many=True)
@@ -89,8 +100,10 @@ class UserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['GET'], permission_classes=[IsAuthenticated])
     def profile(self, request):
         """Get current user's profile"""
-        serializer = self.get_serializer(request.user)
-        return Response(serializer.data)
+        return self.conditional_response(
+            User.objects.filter(pk=request.user.pk),
+            lambda: Response(self.get_serializer(request.user).data)
+        )
 
     @action(detail=False, methods=['PUT', 'PATCH'], permission_classes=[IsAuthenticated])
     def update_profile(self, request):
@@ -145,6 +158,37 @@ class EmployerViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['POST'], parser_classes=[MultiPartParser])
+    def import_census(self, request, pk=None):
+        """Bulk import employees and dependents from a CSV or NDJSON census file"""
+        # permission_classes admits employers and admins; only the employer's
+        # contact person may import into it
+        employer = get_object_or_404(Employer, pk=pk)
+        if request.user.user_type != 'ADMIN' and employer.contact_person_id != request.user.pk:
+            return Response(
+                {'error': 'Permission denied'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'A census file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        file_format = request.data.get('format') or upload.name.rsplit('.', 1)[-1].lower()
+        service = CensusImportService(
+            employer,
+            user=request.user,
+            atomic=request.data.get('atomic', 'true').lower() != 'false',
+            dry_run=request.data.get('dry_run', 'false').lower() == 'true',
+        )
+        try:
+            report = service.run(upload, file_format, request=request)
+        except CensusFormatError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
     @action(detail=True, methods=['GET'])
     def healthcare_spend(self, request, pk=None):
         """Get healthcare spending metrics"""
@@ -194,6 +238,7 @@ class EmployerViewSet(viewsets.ModelViewSet):
         return Response(stats)
 
     @action(detail=True, methods=['GET'])
+    @cache_response(Provider, User)
     def provider_directory(self, request, pk=None):
         """Get list of available providers"""
         from .models import Provider  # Import here to avoid circular import
@@ -263,9 +308,13 @@ class EmployerViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ProviderViewSet(viewsets.ModelViewSet):
+class ProviderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     permission_classes = [IsProvider | IsAdmin]
     serializer_class = ProviderSerializer
+    # Everything ProviderSerializer nests
+    conditional_fields = (
+        'updated_at', 'user__updated_at', 'operating_hours__updated_at', 'membership_tiers__updated_at',
+    )
     
     @require_user_type('PROVIDER', 'ADMIN')
     def get_queryset(self):
@@ -288,6 +337,7 @@ class ProviderViewSet(viewsets.ModelViewSet):
         })
 
     @action(detail=True, methods=['GET', 'PUT'])
+    @cache_response(Provider, ProviderOperatingHours, per_object=True)
     def operating_hours(self, request, pk=None):
         """Manage provider's operating hours"""
         provider = self.get_object()
@@ -593,9 +643,10 @@ class BrokerViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(CompiledListMixin, viewsets.ModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
+    compiled_serializer_class = EmployeeCompiledSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -605,9 +656,10 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(employer_id=employer_id)
         return queryset
 
-class DependentViewSet(viewsets.ModelViewSet):
+class DependentViewSet(CompiledListMixin, viewsets.ModelViewSet):
     queryset = Dependent.objects.all()
     serializer_class = DependentSerializer
+    compiled_serializer_class = DependentCompiledSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
@@ -726,4 +778,39 @@ def reset_password_confirm(request):
         return Response(
             {"error": "Invalid email"}, 
             status=status.HTTP_400_BAD_REQUEST
-        ) 
\ No newline at end of file
+        ) 
+def _eligibility_for(request, membership_ids):
+    """Look up memberships in the eligibility index; providers only see their own members"""
+    results = eligibility_index.lookup_many(membership_ids)
+    if request.user.user_type == 'PROVIDER':
+        provider_id = getattr(getattr(request.user, 'provider', None), 'pk', None)
+        results = [
+            result if result.get('provider') == provider_id
+            else {'membership_id': result['membership_id'], 'found': False, 'eligible': False}
+            for result in results
+        ]
+    return results
+
+@api_view(['GET'])
+@permission_classes([IsProvider | IsAdmin])
+def eligibility_lookup(request, membership_id):
+    """Whether a member is eligible today, and on which tier"""
+    return Response(_eligibility_for(request, [membership_id])[0])
+
+@api_view(['POST'])
+@permission_classes([IsProvider | IsAdmin])
+def eligibility_batch(request):
+    """Eligibility for a list of membership IDs, in request order"""
+    membership_ids = request.data.get('membership_ids')
+    if not isinstance(membership_ids, list) or not membership_ids:
+        return Response(
+            {"error": "membership_ids must be a non-empty list"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    max_batch = get_eligibility_config()['MAX_BATCH']
+    if len(membership_ids) > max_batch:
+        return Response(
+            {"error": f"At most {max_batch} membership IDs per request"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response({'results': _eligibility_for(request, membership_ids)})
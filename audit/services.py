@@ -36,6 +36,41 @@ class AuditService:
         audit_log.save()
         return audit_log
 
+    @staticmethod
+    def log_actions_bulk(
+        user,
+        action: str,
+        objects,
+        details: Dict[str, Any] = None,
+        request = None,
+        object_details: Dict[Any, Dict[str, Any]] = None
+    ) -> int:
+        """Log the same action against many objects with a single INSERT"""
+        objects = list(objects)
+        if not objects:
+            return 0
+
+        ip_address = request.META.get('REMOTE_ADDR') if request else None
+        user_agent = request.META.get('HTTP_USER_AGENT') if request else None
+        content_types = {}
+        logs = []
+        for obj in objects:
+            model = type(obj)
+            if model not in content_types:
+                content_types[model] = ContentType.objects.get_for_model(model)
+            logs.append(AuditLog(
+                user=user,
+                action=action,
+                user_type=getattr(user, 'user_type', 'ANONYMOUS'),
+                details={**(details or {}), **((object_details or {}).get(obj.pk) or {})},
+                ip_address=ip_address,
+                user_agent=user_agent,
+                content_type=content_types[model],
+                object_id=obj.pk
+            ))
+        AuditLog.objects.bulk_create(logs, batch_size=1000)
+        return len(logs)
+
     @staticmethod
     def log_security_event(
         action: str,
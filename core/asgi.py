@@ -1,4 +1,14 @@
 import os
 from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.core.settings')
-application = get_asgi_application() 
\ No newline at end of file
+django_application = get_asgi_application()
+
+# Imports models, so only once the app registry is ready
+from messaging import realtime  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Django, except for the real-time message endpoints and lifespan events"""
+    if realtime.handles(scope):
+        return await realtime.application(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -0,0 +1,149 @@
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.response import Response
+
+_tracked_models = set()
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0})
+_stats_lock = threading.Lock()
+
+
+def get_config():
+    return {
+        'ENABLED': True,
+        'TIMEOUT': 300,
+        'KEY_PREFIX': 'response',
+        # Fields no cached response renders; saves touching only these keep entries
+        'IGNORED_FIELDS': {'accounts.user': ['last_login']},
+        **getattr(settings, 'RESPONSE_CACHE', {}),
+    }
+
+
+def model_tag(model):
+    return model._meta.label_lower
+
+
+def row_tag(model, pk):
+    return f'{model._meta.label_lower}:{pk}'
+
+
+def _tag_key(tag):
+    return f"{get_config()['KEY_PREFIX']}:tag:{tag}"
+
+
+def _tag_versions(tags):
+    """Current version of each tag, starting unseen tags at a fresh value"""
+    keys = {_tag_key(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        # A fresh time-based version never matches an entry stored before
+        # the tag was evicted
+        cache.add(key, time.time_ns(), timeout=None)
+        versions[key] = cache.get(key)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def bump_tags(tags):
+    for tag in tags:
+        try:
+            cache.incr(_tag_key(tag))
+        except ValueError:
+            cache.set(_tag_key(tag), time.time_ns(), timeout=None)
+
+
+def invalidate_instance(sender, instance, update_fields=None, **kwargs):
+    """
+    Invalidate entries tagged with ``instance``, its model or a row it points at.
+
+    Tags are bumped once the write commits: a bump before then lets a
+    concurrent request store pre-commit rows under the new version.
+    """
+    config = get_config()
+    if sender not in _tracked_models or not config['ENABLED']:
+        return
+    ignored = config['IGNORED_FIELDS'].get(model_tag(sender), ())
+    if update_fields and set(update_fields) <= set(ignored):
+        return
+    tags = [model_tag(sender), row_tag(sender, instance.pk)]
+    for field in sender._meta.concrete_fields:
+        if field.many_to_one or field.one_to_one:
+            related_pk = getattr(instance, field.attname)
+            if related_pk is not None:
+                tags.append(row_tag(field.related_model, related_pk))
+    transaction.on_commit(lambda: bump_tags(tags), using=kwargs.get('using'))
+
+
+post_save.connect(invalidate_instance, dispatch_uid='core.cache.post_save')
+post_delete.connect(invalidate_instance, dispatch_uid='core.cache.post_delete')
+
+
+def _record(route, outcome):
+    with _stats_lock:
+        _stats[route][outcome] += 1
+
+
+def get_stats():
+    """Per-route hit/miss counters for this process"""
+    with _stats_lock:
+        return {route: dict(counts) for route, counts in _stats.items()}
+
+
+def cache_response(*models, per_object=False, timeout=None):
+    """
+    Cache a viewset handler's successful GET responses.
+
+    Entries are keyed by route, query string and the requesting user's role,
+    and tagged with ``models``: a save or delete of any of them invalidates the
+    entry. With ``per_object`` the entry is tagged with the route's object
+    instead, so only writes to that row (or to rows pointing at it) invalidate
+    it. Detail routes always resolve ``get_object()`` first so ownership and
+    object permissions still apply on a hit.
+    """
+    _tracked_models.update(models)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapped(self, request, *args, **kwargs):
+            config = get_config()
+            if request.method != 'GET' or not config['ENABLED']:
+                return func(self, request, *args, **kwargs)
+
+            obj = self.get_object() if kwargs.get(self.lookup_url_kwarg or self.lookup_field) else None
+            if per_object and obj is not None:
+                tags = [row_tag(type(obj), obj.pk)]
+            else:
+                tags = [model_tag(model) for model in models]
+
+            role = getattr(request.user, 'user_type', None) or 'ANONYMOUS'
+            route = f'{type(self).__name__}.{func.__name__}'
+            key = hashlib.md5(
+                repr((route, request.path, sorted(request.query_params.lists()), role)).encode(),
+                usedforsecurity=False
+            ).hexdigest()
+            key = f"{config['KEY_PREFIX']}:{key}"
+
+            versions = _tag_versions(tags)
+            entry = cache.get(key)
+            if entry is not None and entry['versions'] == versions:
+                _record(route, 'hits')
+                return Response(entry['data'], headers={'X-Cache': 'HIT'})
+
+            _record(route, 'misses')
+            response = func(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(
+                    key,
+                    {'versions': versions, 'data': response.data},
+                    timeout if timeout is not None else config['TIMEOUT']
+                )
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,175 @@
+import logging
+import os
+import threading
+import time
+
+import psutil
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def get_config():
+    return {
+        'INTERVAL': 10,  # seconds between samples
+        'STALE_AFTER': 30,  # seconds; an older snapshot is not ready
+        'REQUIRED': ['database'],  # checks that must pass for readiness
+        'DATABASE': 'default',
+        'DISK_PATH': '/',
+        'MEMORY_PERCENT_MAX': 95,
+        'DISK_PERCENT_MAX': 95,
+        'LIVE_PATH': '/live',
+        'READY_PATH': '/ready',
+        **getattr(settings, 'HEALTH', {}),
+    }
+
+
+def check_database(config):
+    """Round-trip latency of ``SELECT 1`` on the sampler's own connection"""
+    connection = connections[config['DATABASE']]
+    connection.close_if_unusable_or_obsolete()
+    start = time.perf_counter()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception as e:
+        connection.close()
+        return {'healthy': False, 'error': str(e)}
+    return {'healthy': True, 'latency_ms': round((time.perf_counter() - start) * 1000, 2)}
+
+
+def check_connections(config):
+    """Server-side connection usage for this database, by state"""
+    connection = connections[config['DATABASE']]
+    if connection.vendor != 'postgresql':
+        return {'healthy': True, 'conn_max_age': connection.settings_dict['CONN_MAX_AGE']}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT COALESCE(state, \'unknown\'), COUNT(*) FROM pg_stat_activity '
+                'WHERE datname = current_database() GROUP BY 1'
+            )
+            states = dict(cursor.fetchall())
+            cursor.execute('SHOW max_connections')
+            max_connections = int(cursor.fetchone()[0])
+    except Exception as e:
+        connection.close()
+        return {'healthy': False, 'error': str(e)}
+    return {
+        'healthy': True,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'states': states,
+        'total': sum(states.values()),
+        'max': max_connections,
+    }
+
+
+def check_memory(config):
+    memory = psutil.virtual_memory()
+    return {
+        'healthy': memory.percent < config['MEMORY_PERCENT_MAX'],
+        'percent': memory.percent,
+        'process_rss_mb': round(psutil.Process().memory_info().rss / 1024 / 1024, 1),
+    }
+
+
+def check_disk(config):
+    disk = psutil.disk_usage(config['DISK_PATH'])
+    return {'healthy': disk.percent < config['DISK_PERCENT_MAX'], 'percent': disk.percent}
+
+
+def check_email(config):
+    """Email is sent inline over SMTP, so there is no outbox; report whether it is configured"""
+    return {
+        'healthy': True,
+        'configured': bool(getattr(settings, 'EMAIL_HOST_USER', None)),
+        'backend': settings.EMAIL_BACKEND,
+    }
+
+
+CHECKS = {
+    'database': check_database,
+    'connections': check_connections,
+    'memory': check_memory,
+    'disk': check_disk,
+    'email': check_email,
+}
+
+
+class Sampler:
+    """
+    Refreshes a health snapshot from a daemon thread every ``INTERVAL`` seconds.
+
+    Probes read ``snapshot`` and never touch the database or the OS
+    themselves. The thread is started when the middleware loads (or on the
+    first probe) and restarted after a fork, so it runs once per worker
+    process; a probe that arrives before its first pass samples inline once.
+    If a check hangs, the snapshot stops advancing and goes stale, which
+    readiness reports as a failure.
+    """
+
+    def __init__(self):
+        self.snapshot = None
+        self._lock = threading.Lock()
+        self._first_sample_lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.snapshot = None
+            thread = threading.Thread(target=self._run, name='health-sampler', daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            config = get_config()
+            try:
+                self.snapshot = self.sample(config)
+            except Exception:
+                logger.exception('Health sample failed')
+            time.sleep(config['INTERVAL'])
+
+    def sample(self, config=None):
+        config = config or get_config()
+        start = time.perf_counter()
+        checks = {}
+        for name, check in CHECKS.items():
+            try:
+                checks[name] = check(config)
+            except Exception as e:
+                checks[name] = {'healthy': False, 'error': str(e)}
+        return {
+            'sampled_at': time.time(),
+            'sample_ms': round((time.perf_counter() - start) * 1000, 2),
+            'checks': checks,
+        }
+
+    def readiness(self):
+        """``(ready, snapshot)`` judged from the cached snapshot"""
+        self.ensure_started()
+        config = get_config()
+        snapshot = self.snapshot
+        if snapshot is None:
+            with self._first_sample_lock:
+                if self.snapshot is None:
+                    self.snapshot = self.sample(config)
+                snapshot = self.snapshot
+        age = time.time() - snapshot['sampled_at']
+        failing = [name for name in config['REQUIRED'] if not snapshot['checks'][name]['healthy']]
+        ready = not failing and age < config['STALE_AFTER']
+        return ready, {
+            **snapshot,
+            'status': 'ready' if ready else 'unready',
+            'age': round(age, 2),
+            'failing': failing if age < config['STALE_AFTER'] else [*failing, 'stale'],
+        }
+
+
+sampler = Sampler()
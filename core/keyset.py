@@ -0,0 +1,59 @@
+import base64
+import datetime
+import json
+
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe cursor for a row's ordering values"""
+    values = [value.isoformat() if isinstance(value, datetime.datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """Ordering values from ``encode_cursor``; raises ``ValueError`` for anything else"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def after(fields, values):
+    """
+    Rows that come after ``values`` when ordered by ``fields`` descending.
+
+    ``(a, b) < (x, y)`` spelled out as ``a < x OR (a = x AND b < y)``, which
+    the planner turns into a range scan of an index on ``fields``.
+    """
+    condition = Q()
+    for index in reversed(range(len(fields))):
+        step = Q(**{f'{fields[index]}__lt': values[index]})
+        if index + 1 < len(fields):
+            step |= Q(**{fields[index]: values[index]}) & condition
+        condition = step
+    return condition
+
+
+def keyset_page(parts, fields, cursor=None, limit=50):
+    """
+    One page of rows ordered by ``fields`` descending, plus the next cursor.
+
+    ``parts`` are disjoint querysets; with more than one the page is a
+    ``UNION ALL`` of them, each restricted to rows after the cursor and read
+    from its own index. The next cursor is ``None`` on the last page.
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(fields))
+        parts = [part.filter(after(fields, values)) for part in parts]
+    parts = [part.order_by() for part in parts]
+    queryset = parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+    items = list(queryset.order_by(*(f'-{field}' for field in fields))[:limit + 1])
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([getattr(items[-1], field) for field in fields])
+    return items, next_cursor
@@ -0,0 +1,100 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+from pythonjsonlogger.json import JsonFormatter
+
+JSON_FORMAT = '{asctime}{levelname}{name}{message}'
+JSON_RENAMES = {'asctime': 'time', 'levelname': 'level', 'name': 'logger'}
+
+
+def json_formatter():
+    """One JSON object per line; ``extra`` fields become top-level keys"""
+    return JsonFormatter(JSON_FORMAT, style='{', rename_fields=JSON_RENAMES)
+
+
+class QueueListenerHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a listener thread that encodes and writes them.
+
+    The calling thread only resolves the message and puts the record on a
+    bounded queue; JSON encoding, file rotation and console output happen on
+    the ``QueueListener`` thread. A full queue drops records rather than
+    blocking a request, and the next record that fits is preceded by a
+    warning with the drop count. The listener is started on first use in
+    each process, so it survives a fork, and drains the queue at exit.
+
+    Meant for ``LOGGING['handlers']`` through the ``'()'`` factory key.
+    """
+
+    def __init__(self, filename=None, max_bytes=5 * 1024 * 1024, backup_count=5, console=True, queue_size=10_000):
+        super().__init__(queue.Queue(queue_size))
+        targets = []
+        if filename:
+            # delay: the file is created by the first record, not by loading settings
+            targets.append(logging.handlers.RotatingFileHandler(
+                filename, maxBytes=max_bytes, backupCount=backup_count, delay=True
+            ))
+        if console:
+            targets.append(logging.StreamHandler(sys.stderr))
+        for target in targets:
+            target.setFormatter(json_formatter())
+        self.targets = targets
+        self.listener = None
+        self.dropped = 0
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listening(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.listener = logging.handlers.QueueListener(self.queue, *self.targets, respect_handler_level=True)
+            self.listener.start()
+            atexit.register(self._stop_listening)
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Unlike the default, skip formatting: only fix the message text so
+        # later changes to the arguments cannot alter it
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.dropped:
+            dropped, self.dropped = self.dropped, 0
+            warning = logging.LogRecord(
+                __name__, logging.WARNING, __file__, 0,
+                'Dropped %d log records: logging queue full', (dropped,), None
+            )
+            try:
+                self.queue.put_nowait(self.prepare(warning))
+            except queue.Full:
+                self.dropped += dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        self._ensure_listening()
+        super().emit(record)
+
+    def _stop_listening(self):
+        with self._start_lock:
+            if self.listener is not None and self._pid == os.getpid():
+                self.listener.stop()
+                self._pid = None
+
+    def close(self):
+        self._stop_listening()
+        for target in self.targets:
+            target.close()
+        super().close()
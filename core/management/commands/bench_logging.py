@@ -0,0 +1,102 @@
+import logging
+import logging.handlers
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.log import QueueListenerHandler
+
+
+def request_fields(i):
+    """The fields RequestLoggingMiddleware logs for one request"""
+    return {
+        'method': 'GET',
+        'path': f'/api/enrollments/{i}/',
+        'route': 'enrollment-detail',
+        'status': 200,
+        'duration_ms': 12.34,
+        'user': f'employee{i % 50}@example.com',
+        'ip': f'10.0.{i % 256}.{i % 200}',
+        'sample_rate': 1.0,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the request-thread cost of logging synchronously to the console and a rotating '
+        'file against enqueueing for the QueueListener'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=20_000, help='Records per thread')
+        parser.add_argument('--threads', type=int, default=8)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull:
+            # The previous setup: formatted f-string, both handlers on the calling thread
+            verbose = logging.Formatter('{levelname} {asctime} {module} {message}', style='{')
+            file_handler = logging.handlers.RotatingFileHandler(
+                os.path.join(directory, 'sync.log'), maxBytes=5 * 1024 * 1024, backupCount=5
+            )
+            console_handler = logging.StreamHandler(devnull)
+            for handler in (file_handler, console_handler):
+                handler.setFormatter(verbose)
+            self.run('sync', [file_handler, console_handler], options,
+                     lambda logger, i: logger.info(f'Request completed: {request_fields(i)}'))
+
+            queue_handler = QueueListenerHandler(
+                os.path.join(directory, 'queue.log'), console=False, queue_size=options['records'] * options['threads']
+            )
+            console_handler = logging.StreamHandler(devnull)
+            console_handler.setFormatter(queue_handler.targets[0].formatter)
+            queue_handler.targets.append(console_handler)
+            self.run('queue', [queue_handler], options,
+                     lambda logger, i: logger.info('Request completed', extra=request_fields(i)))
+
+            start = time.perf_counter()
+            queue_handler.close()
+            self.stdout.write(f'queue: listener drained the backlog {time.perf_counter() - start:.2f}s after the last call')
+            with open(os.path.join(directory, 'queue.log')) as f:
+                self.stdout.write(f'queue: sample line {f.readline().strip()}')
+        self.stdout.write(self.style.SUCCESS('Done'))
+
+    def run(self, name, handlers, options, log):
+        logger = logging.getLogger(f'bench_logging.{name}')
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        for handler in handlers:
+            logger.addHandler(handler)
+
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(offset):
+            own = []
+            for i in range(offset, offset + options['records']):
+                start = time.perf_counter()
+                log(logger, i)
+                own.append(time.perf_counter() - start)
+            with lock:
+                latencies.extend(own)
+
+        threads = [threading.Thread(target=worker, args=(n * options['records'],)) for n in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        for handler in handlers:
+            logger.removeHandler(handler)
+
+        latencies.sort()
+        self.stdout.write(
+            f'{name}: {len(latencies):,} calls from {options["threads"]} threads in {elapsed:.2f}s; '
+            f'per call mean {statistics.fmean(latencies) * 1e6:.1f}us, '
+            f'p50 {latencies[len(latencies) // 2] * 1e6:.1f}us, '
+            f'p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f}us'
+        )
@@ -0,0 +1,136 @@
+import datetime
+import decimal
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, orjson
+
+
+def roster_payload(size):
+    """Employee roster rows shaped like EmployerViewSet.employee_roster"""
+    return [{
+        'id': i,
+        'employer': 1,
+        'user': None if i % 4 else {
+            'id': i, 'username': f'employee{i}@example.com', 'email': f'employee{i}@example.com',
+            'first_name': 'Jordan', 'last_name': f'Lee-{i}', 'user_type': 'EMPLOYER',
+            'phone': '555-0100', 'address_line1': '12 Main St', 'address_line2': '',
+            'city': 'Springfield', 'state': 'IL', 'zip_code': '62701',
+        },
+        'first_name': 'Jordan', 'last_name': f'Lee-{i}', 'email': f'employee{i}@example.com',
+        'address_line1': '12 Main St', 'address_line2': 'Apt ' + str(i % 30), 'city': 'Springfield',
+        'state': 'IL', 'zip_code': '62701', 'sex': 'F', 'date_of_birth': '1988-04-12',
+        'enrollment_date': '2024-01-01', 'enrollment_status': 'ACTIVE', 'is_contact_person': i == 0,
+        'memberships': [{
+            'id': i, 'membership_id': f'M{i:08d}', 'membership_tier': 3, 'membership_tier_name': 'Gold',
+            'provider': 7, 'provider_name': 'Main Street Direct Primary Care', 'start_date': '2024-01-01',
+            'end_date': None, 'is_active': True,
+        }],
+        'dependents': [{
+            'id': i * 3 + d, 'employee': i, 'first_name': 'Sam', 'last_name': f'Lee-{i}',
+            'date_of_birth': '2015-06-30', 'sex': 'M', 'relationship': 'CHILD',
+            'enrollment_date': '2024-01-01', 'enrollment_status': 'ACTIVE', 'memberships': [],
+        } for d in range(i % 3)],
+    } for i in range(size)]
+
+
+def transaction_payload(size):
+    """Transaction rows with the raw Decimal/date/datetime/UUID values views return"""
+    now = timezone.now()
+    return [{
+        'id': i,
+        'enrollment': i // 2,
+        'transaction_type': 'PROVIDER' if i % 5 else 'BROKER',
+        'amount': decimal.Decimal('89.00') + i % 40,
+        'status': 'COMPLETED',
+        'billing_period_start': datetime.date(2024, 1 + i % 12, 1),
+        'billing_period_end': datetime.date(2024, 1 + i % 12, 28),
+        'provider': 7,
+        'broker': None,
+        'reference_id': uuid.UUID(int=i),
+        'notes': 'Monthly membership – café plan' if i % 7 == 0 else '',
+        'created_at': now - datetime.timedelta(minutes=i),
+        'updated_at': now,
+    } for i in range(size)]
+
+
+def audit_payload(size):
+    """Audit log entries with nested JSON details"""
+    now = timezone.now()
+    return [{
+        'id': i,
+        'user': i % 50,
+        'action': 'ACCESS',
+        'user_type': 'EMPLOYER',
+        'timestamp': now - datetime.timedelta(seconds=i),
+        'ip_address': f'10.0.{i % 256}.{i % 200}',
+        'user_agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_2) AppleWebKit/605.1.15',
+        'details': {'method': 'GET', 'path': f'/api/enrollments/{i}/', 'status_code': 200},
+        'status': 'SUCCESS',
+        'error_message': None,
+    } for i in range(size)]
+
+
+class Command(BaseCommand):
+    help = 'Compare JSONRenderer/JSONParser and FastJSONRenderer/FastJSONParser on realistic payloads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=20000, help='Rows per payload')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per renderer')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError('orjson is not installed; FastJSONRenderer would fall back to JSONRenderer')
+
+        payloads = [
+            ('roster', roster_payload(options['size'])),
+            ('transactions', transaction_payload(options['size'])),
+            ('audit', audit_payload(options['size'])),
+        ]
+        baseline_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        baseline_parser, fast_parser = JSONParser(), FastJSONParser()
+
+        for name, data in payloads:
+            expected = baseline_renderer.render(data)
+            if fast_renderer.render(data) != expected:
+                raise CommandError(f'{name}: FastJSONRenderer output differs from JSONRenderer')
+
+            size_mb = len(expected) / 1024 / 1024
+            render_base = self._best(lambda: baseline_renderer.render(data), options['repeat'])
+            render_fast = self._best(lambda: fast_renderer.render(data), options['repeat'])
+            parse_base = self._best(lambda: baseline_parser.parse(_Stream(expected)), options['repeat'])
+            parse_fast = self._best(lambda: fast_parser.parse(_Stream(expected)), options['repeat'])
+            self.stdout.write(
+                f'{name} ({size_mb:.1f} MB): '
+                f'render {size_mb / render_base:.0f} -> {size_mb / render_fast:.0f} MB/s '
+                f'({render_base / render_fast:.1f}x), '
+                f'parse {size_mb / parse_base:.0f} -> {size_mb / parse_fast:.0f} MB/s '
+                f'({parse_base / parse_fast:.1f}x)'
+            )
+
+        self.stdout.write(self.style.SUCCESS('FastJSONRenderer output matches JSONRenderer byte for byte'))
+
+    def _best(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+
+class _Stream:
+    """Minimal request stream over an in-memory body"""
+
+    def __init__(self, body):
+        self.body = body
+
+    def read(self, *args):
+        body, self.body = self.body, b''
+        return body
@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Employee, Dependent
+from accounts.serializers import (
+    EmployeeSerializer,
+    EmployeeCompiledSerializer,
+    DependentSerializer,
+    DependentCompiledSerializer,
+)
+from enrollment.models import Transaction
+from enrollment.serializers import TransactionSerializer, TransactionCompiledSerializer
+from messaging.models import Message
+from messaging.serializers import MessageSerializer, MessageCompiledSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare ModelSerializer and compiled serializer throughput on existing rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=5000, help='Rows per serializer')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per path')
+
+    def handle(self, *args, **options):
+        limit = options['limit']
+        cases = [
+            ('employees', Employee.objects.all(), EmployeeSerializer, EmployeeCompiledSerializer),
+            ('dependents', Dependent.objects.all(), DependentSerializer, DependentCompiledSerializer),
+            ('transactions', Transaction.objects.all(), TransactionSerializer, TransactionCompiledSerializer),
+            ('messages', Message.objects.order_by('-created_at'), MessageSerializer, MessageCompiledSerializer),
+        ]
+
+        for name, queryset, serializer_class, compiled_class in cases:
+            queryset = queryset[:limit]
+            expected = serializer_class(queryset, many=True).data
+            if compiled_class(queryset).data != expected:
+                raise CommandError(f'{name}: compiled output differs from {serializer_class.__name__}')
+            if not expected:
+                self.stdout.write(f'{name}: no rows, skipped')
+                continue
+
+            baseline = self._best(lambda: serializer_class(queryset, many=True).data, options['repeat'])
+            compiled = self._best(lambda: compiled_class(queryset).data, options['repeat'])
+            rows = len(expected)
+            self.stdout.write(
+                f'{name}: {rows} rows, '
+                f'ModelSerializer {rows / baseline:,.0f} rows/s, '
+                f'compiled {rows / compiled:,.0f} rows/s '
+                f'({baseline / compiled:.1f}x)'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Compiled output matches ModelSerializer output'))
+
+    def _best(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,211 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# name: (type, help, buckets)
+METRICS = {
+    'http_requests_total': ('counter', 'Requests by route, method and status', None),
+    'http_request_duration_seconds': ('histogram', 'Request latency by route', DURATION_BUCKETS),
+    'http_response_size_bytes': ('histogram', 'Response body size by route', SIZE_BUCKETS),
+    'http_request_db_queries': ('histogram', 'Database queries per request by route', QUERY_BUCKETS),
+    'http_request_db_duration_seconds': ('histogram', 'Database time per request by route', DURATION_BUCKETS),
+}
+
+
+def get_config():
+    return {
+        'ENABLED': True,
+        'PATH': '/metrics/',
+        # Shared by every worker of a deployment; None keeps metrics per process
+        'DIRECTORY': os.getenv('METRICS_DIRECTORY'),
+        'FLUSH_INTERVAL': 5,  # seconds
+        # Loopback only unless opened up; '*' allows any client
+        'ALLOWED_IPS': ['127.0.0.1', '::1'],
+        # Requests carrying X-Forwarded-For, Forwarded or X-Real-IP came
+        # through a proxy whose address REMOTE_ADDR shows; refused by default
+        'ALLOW_PROXIED': False,
+        **getattr(settings, 'METRICS', {}),
+    }
+
+
+class Registry:
+    """
+    Counters and histograms of one process, keyed by ``(name, labels)``.
+
+    With a ``DIRECTORY`` configured, a daemon thread writes the registry to
+    its own file there every ``FLUSH_INTERVAL`` seconds, and ``collect()``
+    sums the files of every worker, so a scrape of any worker sees the whole
+    deployment. Files of exited workers are kept so their counts do not go
+    backwards; call ``clear()`` when the server starts (e.g. from gunicorn's
+    ``on_starting`` hook).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._pid = None
+        self._started = None
+
+    def inc(self, name, labels, amount=1):
+        key = (name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, labels)
+        with self._lock:
+            # Per-bucket (not cumulative) counts, then +Inf, sum and count
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0] * (len(buckets) + 3)
+            values[bisect.bisect_left(buckets, value)] += 1
+            values[-2] += value
+            values[-1] += 1
+        self._ensure_flushing()
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                [name, list(labels), list(value) if isinstance(value, list) else value]
+                for (name, labels), value in self._values.items()
+            ]
+
+    def _path(self, directory):
+        return os.path.join(directory, f'metrics-{os.getpid()}-{self._started}.json')
+
+    def _ensure_flushing(self):
+        if self._pid == os.getpid() or not get_config()['DIRECTORY']:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked after recording: the parent's counts are not ours
+                self._values = {}
+            self._pid = os.getpid()
+            self._started = time.time_ns()
+        threading.Thread(target=self._run, name='metrics-flush', daemon=True).start()
+
+    def _run(self):
+        while True:
+            config = get_config()
+            time.sleep(config['FLUSH_INTERVAL'])
+            self.flush(config['DIRECTORY'])
+
+    def flush(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = self._path(directory)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        """Every worker's values summed, as ``{(name, labels): value}``"""
+        directory = get_config()['DIRECTORY']
+        if not directory:
+            rows = self.snapshot()
+        else:
+            if self._pid == os.getpid():
+                self.flush(directory)
+            rows = []
+            for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+                try:
+                    with open(path) as f:
+                        rows.extend(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        merged = {}
+        for name, labels, value in rows:
+            if name not in METRICS:
+                continue
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if isinstance(value, list):
+                current = merged.setdefault(key, [0] * len(value))
+                merged[key] = [total + item for total, item in zip(current, value)]
+            else:
+                merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def clear(self):
+        with self._lock:
+            self._values = {}
+        directory = get_config()['DIRECTORY']
+        if directory:
+            for path in glob.glob(os.path.join(directory, 'metrics-*.json*')):
+                os.remove(path)
+
+
+registry = Registry()
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(values=None):
+    """The registry in the Prometheus text exposition format (0.0.4)"""
+    values = registry.collect() if values is None else values
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind == 'counter':
+                lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip((*buckets, float('inf')), value):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels(labels, [("le", _number(bound))])} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(value[-2])}')
+            lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def route_name(request):
+    """The resolved view name, which keeps label cardinality bounded"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route or 'unnamed'
+
+
+def record_request(request, response, duration, queries, db_duration):
+    route = route_name(request)
+    registry.inc('http_requests_total', (
+        ('route', route), ('method', request.method), ('status', str(response.status_code))
+    ))
+    labels = (('route', route),)
+    registry.observe('http_request_duration_seconds', labels, duration)
+    registry.observe('http_request_db_queries', labels, queries)
+    registry.observe('http_request_db_duration_seconds', labels, db_duration)
+    if not response.streaming:
+        registry.observe('http_response_size_bytes', labels, len(response.content))
+    elif response.has_header('Content-Length'):
+        registry.observe('http_response_size_bytes', labels, int(response['Content-Length']))
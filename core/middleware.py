@@ -1,32 +1,189 @@
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
 from django.utils.deprecation import MiddlewareMixin
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from rest_framework_simplejwt.tokens import AccessToken
+from contextlib import ExitStack
+import json
 import logging
+import random
 import time
+import zlib
+
+from . import health, metrics, sqlprofile
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
 
 logger = logging.getLogger(__name__)
+sqlprofile_logger = logging.getLogger('core.sqlprofile')
+
+class HealthProbeMiddleware(MiddlewareMixin):
+    """
+    Answers liveness and readiness probes before any other middleware runs.
+
+    Listed first in ``MIDDLEWARE`` so probes skip authentication, logging and
+    auditing. Liveness is a constant response; readiness reads the snapshot
+    kept by ``core.health.sampler``.
+    """
+    LIVE = b'{"status": "alive"}'
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        # Take the first sample while the worker boots, not on the first probe
+        health.sampler.ensure_started()
+
+    def process_request(self, request):
+        config = health.get_config()
+        path = request.path_info.rstrip('/')
+        if path == config['LIVE_PATH']:
+            response = HttpResponse(self.LIVE, content_type='application/json')
+        elif path == config['READY_PATH']:
+            ready, snapshot = health.sampler.readiness()
+            response = HttpResponse(
+                json.dumps(snapshot), content_type='application/json', status=200 if ready else 503
+            )
+        else:
+            return None
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+class MetricsMiddleware:
+    """
+    Records per-route request metrics and serves them at ``METRICS['PATH']``.
+
+    Listed right after the health probes so the timings cover the rest of the
+    stack and response sizes are what goes on the wire. Database queries are
+    counted and timed through ``execute_wrapper`` on every connection. The
+    endpoint answers only ``ALLOWED_IPS`` (loopback by default), and not
+    requests that came through a proxy: behind a reverse proxy on the same
+    host every client's ``REMOTE_ADDR`` is loopback.
+    """
+
+    PROXY_HEADERS = ('HTTP_X_FORWARDED_FOR', 'HTTP_FORWARDED', 'HTTP_X_REAL_IP')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = metrics.get_config()
+        if request.path_info == config['PATH']:
+            allowed = config['ALLOWED_IPS']
+            proxied = any(header in request.META for header in self.PROXY_HEADERS)
+            if '*' not in allowed and (
+                request.META.get('REMOTE_ADDR') not in allowed or (proxied and not config['ALLOW_PROXIED'])
+            ):
+                return JsonResponse({'error': 'Forbidden'}, status=403)
+            return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        database = {'queries': 0, 'duration': 0.0}
+
+        def count_query(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                database['queries'] += 1
+                database['duration'] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            response = self.get_response(request)
+        metrics.record_request(
+            request, response, time.perf_counter() - start, database['queries'], database['duration']
+        )
+        return response
+
+class SQLProfilerMiddleware:
+    """
+    Profiles the SQL of each request when ``SQL_PROFILER['ENABLED']`` is on.
+
+    Counts and times queries by normalised shape and flags likely N+1
+    patterns with the view and call site. With ``DEBUG`` the summary goes out
+    in an ``X-SQL-Profile`` header; slow requests and requests with an N+1
+    are written to the ``core.sqlprofile`` logger as JSON reports. Disabled,
+    it is removed from the stack at startup.
+    """
+
+    def __init__(self, get_response):
+        if not sqlprofile.get_config()['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = sqlprofile.get_config()
+        profile = sqlprofile.Profile(config['N_PLUS_ONE_THRESHOLD'])
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        if settings.DEBUG and config['HEADER']:
+            response.headers['X-SQL-Profile'] = profile.summary()
+        n_plus_one = profile.n_plus_one()
+        if n_plus_one or duration * 1000 >= config['SLOW_REQUEST_MS']:
+            report = profile.report(request, response, duration, config['TOP_SHAPES'])
+            sqlprofile_logger.warning(
+                'Likely N+1 queries' if n_plus_one else 'Slow request', extra={'profile': report}
+            )
+        return response
 
 class RequestLoggingMiddleware(MiddlewareMixin):
+    """
+    One structured record per request, with the fields as ``extra`` keys.
+
+    Errors (status 400 and up) are always logged. Other responses are
+    sampled at ``REQUEST_LOGGING['SAMPLE_RATE']``, which can be overridden
+    per path prefix through ``ROUTES``; each record carries the rate it was
+    sampled at so counts can be scaled back up.
+    """
+
+    def get_config(self, path):
+        config = {
+            'ENABLED': True,
+            'SAMPLE_RATE': 1.0,
+            'ROUTES': {},
+            **getattr(settings, 'REQUEST_LOGGING', {}),
+        }
+        routes = config.pop('ROUTES')
+        matches = [prefix for prefix in routes if path.startswith(prefix)]
+        if matches:
+            config.update(routes[max(matches, key=len)])
+        return config
+
     def process_request(self, request):
-        request.start_time = time.time()
+        request.start_time = time.perf_counter()
 
     def process_response(self, request, response):
-        if hasattr(request, 'start_time'):
-            duration = time.time() - request.start_time
-            log_data = {
-                'method': request.method,
-                'path': request.path,
-                'status': response.status_code,
-                'duration': f'{duration:.2f}s',
-                'user': request.user.username if hasattr(request, 'user') and request.user.is_authenticated else 'anonymous',
-                'ip': request.META.get('REMOTE_ADDR'),
-            }
-            
-            if response.status_code >= 400:
-                logger.error(f'Request failed: {log_data}')
-            else:
-                logger.info(f'Request completed: {log_data}')
+        if not hasattr(request, 'start_time'):
+            return response
+        config = self.get_config(request.path)
+        failed = response.status_code >= 400
+        if not config['ENABLED'] or not (failed or random.random() < config['SAMPLE_RATE']):
+            return response
+
+        user = getattr(request, 'user', None)
+        logger.log(logging.ERROR if failed else logging.INFO, 'Request failed' if failed else 'Request completed', extra={
+            'method': request.method,
+            'path': request.path,
+            'route': metrics.route_name(request),
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - request.start_time) * 1000, 2),
+            'user': user.username if user is not None and user.is_authenticated else 'anonymous',
+            'ip': request.META.get('REMOTE_ADDR'),
+            'sample_rate': 1.0 if failed else config['SAMPLE_RATE'],
+        })
         return response
 
 class JWTAuthenticationMiddleware(MiddlewareMixin):
@@ -71,4 +228,121 @@ class EmailVerificationMiddleware(MiddlewareMixin):
                 return JsonResponse(
                     {'error': 'Please verify your email address.'}, 
                     status=403
-                ) 
\ No newline at end of file
+                )
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Negotiated gzip/brotli compression for API responses.
+
+    Regular responses smaller than ``MIN_SIZE`` are left alone. Streaming
+    responses are compressed chunk by chunk as they are sent, so the full body
+    is never held in memory. Levels can be overridden per path prefix through
+    ``RESPONSE_COMPRESSION['ROUTES']``.
+    """
+    COMPRESSIBLE_TYPES = (
+        'application/json',
+        'application/x-ndjson',
+        'text/csv',
+        'text/html',
+        'text/plain',
+    )
+
+    def get_config(self, path):
+        config = {
+            'ENABLED': True,
+            'MIN_SIZE': 1024,
+            'GZIP_LEVEL': 6,
+            'BROTLI_QUALITY': 4,
+            'ROUTES': {},
+            **getattr(settings, 'RESPONSE_COMPRESSION', {}),
+        }
+        routes = config.pop('ROUTES')
+        matches = [prefix for prefix in routes if path.startswith(prefix)]
+        if matches:
+            config.update(routes[max(matches, key=len)])
+        return config
+
+    def negotiate(self, request):
+        """Pick the best encoding the client accepts, or None"""
+        accepted = {}
+        for item in request.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = item.strip().partition(';')
+            quality = 1.0
+            if params.strip().startswith('q='):
+                try:
+                    quality = float(params.strip()[2:])
+                except ValueError:
+                    quality = 0.0
+            accepted[name.strip().lower()] = quality
+
+        for encoding in ('br', 'gzip'):
+            if encoding == 'br' and brotli is None:
+                continue
+            if accepted.get(encoding, accepted.get('*', 0)) > 0:
+                return encoding
+        return None
+
+    def get_compressor(self, encoding, config):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=config['BROTLI_QUALITY'])
+            return compressor.process, compressor.finish
+        compressor = zlib.compressobj(config['GZIP_LEVEL'], zlib.DEFLATED, zlib.MAX_WBITS | 16)
+        return compressor.compress, compressor.flush
+
+    def compress_stream(self, chunks, encoding, config):
+        compress, finish = self.get_compressor(encoding, config)
+        for chunk in chunks:
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+
+    async def acompress_stream(self, chunks, encoding, config):
+        compress, finish = self.get_compressor(encoding, config)
+        async for chunk in chunks:
+            data = compress(chunk)
+            if data:
+                yield data
+        yield finish()
+
+    def process_response(self, request, response):
+        config = self.get_config(request.path)
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if (
+            not config['ENABLED']
+            or response.has_header('Content-Encoding')
+            or content_type not in self.COMPRESSIBLE_TYPES
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = self.negotiate(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = self.acompress_stream(
+                    response.streaming_content, encoding, config
+                )
+            else:
+                response.streaming_content = self.compress_stream(
+                    response.streaming_content, encoding, config
+                )
+            del response.headers['Content-Length']
+        else:
+            if len(response.content) < config['MIN_SIZE']:
+                return response
+            compress, finish = self.get_compressor(encoding, config)
+            compressed = compress(response.content) + finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # The compressed body is no longer byte-identical to the strong ETag
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
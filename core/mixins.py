@@ -0,0 +1,194 @@
+import hashlib
+
+from django.db.models import Count, Max, prefetch_related_objects
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+class ConditionalGetMixin:
+    """
+    Answer ``list`` and ``retrieve`` with 304 Not Modified when nothing changed.
+
+    The validator is built from aggregates (row counts plus the latest value
+    of each of ``conditional_fields``) over the same filtered queryset, so an
+    unchanged resource never runs the full queryset or serializer.
+    ``conditional_fields`` must reach every model the response nests. Fields
+    behind a reverse relation are aggregated in their own query, one per
+    relation, together with a count of its rows so deletions show up too.
+    """
+    conditional_fields = ('updated_at',)
+
+    def get_validator_querysets(self, queryset):
+        """
+        Disjoint querysets that together hold the rows of ``queryset``.
+
+        Combined querysets (``union()``) cannot be aggregated; views returning
+        one override this to hand back its parts, which are aggregated
+        separately and merged.
+        """
+        return [queryset]
+
+    def get_validator_groups(self, model):
+        """``{to-many path: fields}``; ``''`` holds fields reached over forward relations only"""
+        groups = {}
+        for field in self.conditional_fields:
+            *path, _ = field.split('__')
+            current, key = model, ''
+            for index, name in enumerate(path):
+                relation = current._meta.get_field(name)
+                if relation.one_to_many or relation.many_to_many:
+                    key = '__'.join(path[:index + 1])
+                current = relation.related_model
+            groups.setdefault(key, []).append(field)
+        return groups
+
+    def get_validator(self, queryset):
+        """Return ``(etag, last_modified)`` for ``queryset``"""
+        queries = []
+        for key, fields in self.get_validator_groups(queryset.model).items():
+            aggregates = {f'count_{len(queries)}': Count(key or 'pk', distinct=True)}
+            aggregates.update({
+                f'last_{self.conditional_fields.index(field)}': Max(field) for field in fields
+            })
+            queries.append(aggregates)
+
+        values = {}
+        for part in self.get_validator_querysets(queryset):
+            for aggregates in queries:
+                part_values = part.order_by().aggregate(**aggregates)
+                for key, value in part_values.items():
+                    if key.startswith('count_'):
+                        values[key] = values.get(key, 0) + value
+                    elif value is not None and (values.get(key) is None or value > values[key]):
+                        values[key] = value
+                    else:
+                        values.setdefault(key, None)
+        last_modified = max(
+            (value for key, value in values.items() if key.startswith('last_') and value),
+            default=None
+        )
+        etag = hashlib.md5(
+            repr((
+                queryset.model._meta.label,
+                self.request.get_full_path(),
+                getattr(self.request.user, 'pk', None),
+                sorted(values.items()),
+            )).encode(),
+            usedforsecurity=False
+        ).hexdigest()
+        return quote_etag(etag), int(last_modified.timestamp()) if last_modified else None
+
+    def conditional_response(self, queryset, respond):
+        """Return 304 for a matching validator, otherwise ``respond()`` with validators set"""
+        etag, last_modified = self.get_validator(queryset)
+        response = get_conditional_response(
+            self.request,
+            etag=etag,
+            last_modified=last_modified
+        )
+        if response is None:
+            response = respond()
+        if self.request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+            response.headers.setdefault('ETag', etag)
+            if last_modified:
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(
+            queryset,
+            lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        # 404 for a missing or malformed pk and object permissions, before any 304
+        instance = self.get_object()
+        queryset = self.filter_queryset(self.get_queryset()).filter(pk=instance.pk)
+        return self.conditional_response(
+            queryset,
+            lambda: Response(self.get_serializer(instance).data)
+        )
+
+
+class CompiledListMixin:
+    """Serve ``list`` through ``compiled_serializer_class`` when one is set"""
+    compiled_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        if self.compiled_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.compiled_serializer_class(page).data)
+        return Response(self.compiled_serializer_class(queryset).data)
+
+
+class NormalizedListMixin:
+    """
+    ``?normalized=true`` list responses: flat items plus a side-loaded ``included`` map.
+
+    Items are rendered with ``normalized_serializer_class`` (foreign keys as
+    IDs). ``normalized_includes`` maps an ``included`` key to ``(path,
+    serializer_class, prefetch)``: the related object at ``path`` (a
+    ``__``-separated lookup from the item) is rendered once per distinct row
+    with ``serializer_class``, after the whole page has been loaded with a
+    single ``prefetch_related_objects`` call over every path and the extra
+    ``prefetch`` lookups its serializer needs.
+    """
+    normalized_serializer_class = None
+    normalized_includes = {}
+    normalized_param = 'normalized'
+
+    def is_normalized(self):
+        value = self.request.query_params.get(self.normalized_param, '')
+        return self.normalized_serializer_class is not None and value.lower() in ('1', 'true', 'yes')
+
+    def get_normalized_prefetch(self):
+        lookups = []
+        for path, _, prefetch in self.normalized_includes.values():
+            lookups.append(path)
+            lookups.extend(f'{path}__{lookup}' for lookup in prefetch)
+        return list(dict.fromkeys(lookups))
+
+    def get_included(self, items):
+        """``{key: {pk: data}}`` for every distinct related object of ``items``"""
+        included = {}
+        for key, (path, serializer_class, _) in self.normalized_includes.items():
+            objects = {}
+            for item in items:
+                obj = item
+                for name in path.split('__'):
+                    obj = getattr(obj, name, None)
+                    if obj is None:
+                        break
+                if obj is not None:
+                    objects.setdefault(obj.pk, obj)
+            data = serializer_class(
+                list(objects.values()), many=True, context=self.get_serializer_context()
+            ).data
+            included[key] = {str(pk): row for pk, row in zip(objects, data)}
+        return included
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_normalized():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        items = list(page if page is not None else queryset)
+        prefetch_related_objects(items, *self.get_normalized_prefetch())
+
+        data = self.normalized_serializer_class(
+            items, many=True, context=self.get_serializer_context()
+        ).data
+        included = self.get_included(items)
+        if page is not None:
+            response = self.get_paginated_response(data)
+            response.data['included'] = included
+            return response
+        return Response({'results': data, 'included': included})
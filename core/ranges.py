@@ -0,0 +1,73 @@
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateRangeField, RangeOperators
+from django.contrib.postgres.indexes import GistIndex
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from django.db.backends.postgresql.psycopg_any import DateRange
+from django.db.models.signals import pre_migrate
+
+
+class DateRangeFunc(models.Func):
+    """Postgres ``daterange(lower, upper, bounds)``"""
+    function = 'daterange'
+    output_field = DateRangeField()
+
+
+def coverage_field():
+    """
+    ``[start_date, end_date]`` as a stored ``daterange`` column.
+
+    A NULL ``end_date`` leaves the range unbounded above, so open coverage
+    needs no special casing in queries.
+    """
+    return models.GeneratedField(
+        expression=DateRangeFunc('start_date', 'end_date', models.Value('[]')),
+        output_field=DateRangeField(),
+        db_persist=True,
+    )
+
+
+def coverage_index(name):
+    return GistIndex(fields=['coverage'], name=name)
+
+
+def coverage_exclusion(name, *fields, condition=None):
+    """No two rows with equal ``fields`` may have overlapping coverage (needs btree_gist, see below)"""
+    return ExclusionConstraint(
+        name=name,
+        expressions=[(field, RangeOperators.EQUAL) for field in fields] + [
+            ('coverage', RangeOperators.OVERLAPS),
+        ],
+        condition=condition,
+    )
+
+
+def create_btree_gist(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    """
+    Install btree_gist, which the exclusion constraints need for ``=`` on
+    plain columns inside a GiST index.
+
+    Connected to ``pre_migrate``, which runs before ``migrate`` creates the
+    tables of apps without migrations (enrollment) and before any migration,
+    so every coverage constraint is created after the extension. btree_gist
+    is a trusted extension: the database owner can install it.
+    """
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+
+
+pre_migrate.connect(create_btree_gist, dispatch_uid='core.ranges.create_btree_gist')
+
+
+class CoverageQuerySet(models.QuerySet):
+    """As-of queries over a ``coverage`` range, answered by its GiST index"""
+
+    def as_of(self, day):
+        """Rows whose coverage includes ``day``"""
+        return self.filter(coverage__contains=day)
+
+    def overlapping(self, start, end=None):
+        """Rows covered at any point in ``[start, end]``; an open ``end`` means onwards"""
+        return self.filter(coverage__overlap=DateRange(start, end, '[]'))
@@ -0,0 +1,57 @@
+import decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_encoder = encoders.JSONEncoder()
+
+
+def _default(obj):
+    """Fallback for types orjson does not serialize itself, as DRF's encoder does"""
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in ``JSONRenderer`` backed by orjson.
+
+    Produces the same bytes as ``JSONRenderer`` for compact, unindented
+    output: datetimes use a ``Z`` suffix for UTC, ``date``/``UUID`` values are
+    encoded natively and ``Decimal`` goes through the same float coercion as
+    DRF's encoder. Differences are limited to float exponent notation (orjson
+    writes ``1e16`` where ``json`` writes ``1e+16``) and NaN/infinity, which
+    orjson writes as ``null`` instead of raising.
+
+    Falls back to ``JSONRenderer`` when orjson is not installed, when indented
+    output is requested (browsable API, ``; indent=``), when the non-default
+    ``UNICODE_JSON``/``COMPACT_JSON`` settings are used, or when orjson cannot
+    encode the payload (e.g. integers wider than 64 bits).
+    """
+    options = None if orjson is None else orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Keep the output a strict javascript subset, as JSONRenderer does
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,186 @@
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import ISO_8601, fields, relations
+from rest_framework.serializers import BaseSerializer, ListSerializer
+from rest_framework.settings import api_settings
+
+# Field types whose ``to_representation`` returns database values unchanged
+_PASSTHROUGH = {
+    fields.CharField.to_representation,
+    fields.IntegerField.to_representation,
+    fields.BooleanField.to_representation,
+    fields.ReadOnlyField.to_representation,
+}
+
+
+class CompiledSerializer:
+    """
+    Read-only fast path for list endpoints.
+
+    Takes the field list of ``serializer_class`` and compiles it once into a
+    plain function that turns ``values_list()`` tuples into the same dicts the
+    ``ModelSerializer`` would produce. Nested serializers on forward relations
+    are joined into the same query, nested ``many=True`` serializers on reverse
+    relations are loaded with one extra query each.
+
+    Fields that are not backed by a model column (properties, methods) must be
+    given as a query expression in ``expressions``.
+    """
+    serializer_class = None
+    expressions = {}
+
+    def __init__(self, instance):
+        self.instance = instance
+
+    @property
+    def data(self):
+        return self.get_plan().render(self.instance)
+
+    @classmethod
+    def get_plan(cls):
+        plan = cls.__dict__.get('_plan')
+        if plan is None:
+            plan = _Plan(cls.serializer_class(), cls.expressions)
+            cls._plan = plan
+        return plan
+
+
+class _Plan:
+    """Compiled row function plus the columns and child queries it needs"""
+
+    def __init__(self, serializer, expressions=None, key=None):
+        self.model = serializer.Meta.model
+        self.columns = {}
+        self.annotations = {}
+        self.children = []
+        self.namespace = {}
+        self.key = key
+
+        body = self._compile(serializer, self.model, '', expressions or {})
+        source = f'def _row(r, m):\n    return {body}\n'
+        name = f'<compiled {type(serializer).__name__}>'
+        exec(compile(source, name, 'exec'), self.namespace)
+        self.row = self.namespace['_row']
+        self.pk_index = self._column('pk')
+        if key is not None:
+            self.key_index = self._column(key)
+
+    def _column(self, path):
+        return self.columns.setdefault(path, len(self.columns))
+
+    def _compile(self, serializer, model, prefix, expressions):
+        items = [
+            f'{field.field_name!r}: {self._compile_field(field, model, prefix, expressions)}'
+            for field in serializer._readable_fields
+        ]
+        return '{' + ', '.join(items) + '}'
+
+    def _compile_field(self, field, model, prefix, expressions):
+        if field.field_name in expressions:
+            alias = f'_compiled_{field.field_name}'
+            self.annotations[alias] = expressions[field.field_name]
+            return self._value(field, self._column(alias))
+
+        if field.source == '*':
+            raise ImproperlyConfigured(
+                f"Field '{field.field_name}' uses source='*' and cannot be compiled"
+            )
+
+        if isinstance(field, ListSerializer):
+            relation = self._get_field(model, field.source)
+            if not relation.one_to_many:
+                raise ImproperlyConfigured(
+                    f"Nested list '{field.field_name}' must follow a reverse foreign key"
+                )
+            index = self._column(f'{prefix}pk')
+            self.children.append((_Plan(field.child, key=relation.field.attname), index))
+            return f'm[{len(self.children) - 1}].get(r[{index}], [])'
+
+        if isinstance(field, BaseSerializer):
+            relation = self._get_field(model, field.source)
+            if not (relation.many_to_one or relation.one_to_one) or not relation.concrete:
+                raise ImproperlyConfigured(
+                    f"Nested serializer '{field.field_name}' must follow a forward relation"
+                )
+            nested_prefix = f'{prefix}{field.source}__'
+            index = self._column(f'{nested_prefix}pk')
+            body = self._compile(field, relation.related_model, nested_prefix, {})
+            return f'(None if r[{index}] is None else {body})'
+
+        *path, attr = field.source_attrs
+        for name in path:
+            relation = self._get_field(model, name)
+            if not (relation.many_to_one or relation.one_to_one) or relation.null:
+                raise ImproperlyConfigured(
+                    f"Field '{field.field_name}' must follow non-null forward relations"
+                )
+            model = relation.related_model
+        model_field = self._get_field(model, attr)
+        if model_field.is_relation and not (
+            isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None
+        ):
+            raise ImproperlyConfigured(
+                f"Related field '{field.field_name}' can only be compiled as a primary key"
+            )
+        return self._value(field, self._column(prefix + '__'.join(field.source_attrs)))
+
+    def _get_field(self, model, name):
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise ImproperlyConfigured(
+                f"'{model.__name__}.{name}' is not a model field; "
+                f"declare it in `expressions` to compile it"
+            )
+
+    def _value(self, field, index):
+        value = f'r[{index}]'
+        method = type(field).to_representation
+        if method in _PASSTHROUGH or isinstance(field, relations.PrimaryKeyRelatedField):
+            return value
+        if isinstance(field, fields.JSONField) and not field.binary:
+            return value
+        output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+        if (
+            type(field) is fields.DateField
+            and output_format
+            and output_format.lower() == ISO_8601
+        ):
+            return f'(None if {value} is None else {value}.isoformat())'
+        converter = f'_to_representation_{index}'
+        self.namespace[converter] = field.to_representation
+        return f'(None if {value} is None else {converter}({value}))'
+
+    def fetch(self, queryset):
+        """Return the raw rows of ``queryset`` alongside their rendered dicts"""
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        rows = list(queryset.values_list(*self.columns))
+        groups = [
+            child.group({r[index] for r in rows if r[index] is not None})
+            for child, index in self.children
+        ]
+        row = self.row
+        return rows, [row(r, groups) for r in rows]
+
+    def render(self, instance):
+        if not isinstance(instance, (list, tuple)):
+            return self.fetch(instance)[1]
+
+        # An already evaluated page: reload it by pk and keep its order
+        rows, items = self.fetch(
+            self.model._default_manager.filter(pk__in=[obj.pk for obj in instance])
+        )
+        by_pk = {r[self.pk_index]: item for r, item in zip(rows, items)}
+        return [by_pk[obj.pk] for obj in instance]
+
+    def group(self, keys):
+        """Render the child rows for ``keys``, grouped by their foreign key"""
+        if not keys:
+            return {}
+        queryset = self.model._default_manager.filter(
+            **{f'{self.key}__in': keys}
+        ).order_by(*(self.model._meta.ordering or ['pk']))
+        grouped = {}
+        for r, item in zip(*self.fetch(queryset)):
+            grouped.setdefault(r[self.key_index], []).append(item)
+        return grouped
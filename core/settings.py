@@ -21,6 +21,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -28,6 +29,7 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     
     # Local apps
+    'core',
     'accounts.apps.AccountsConfig',
     'enrollment',
     'messaging',
@@ -35,7 +37,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.HealthProbeMiddleware',  # first: probes skip everything below
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.SQLProfilerMiddleware',  # inert unless SQL_PROFILER['ENABLED']
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -94,6 +100,15 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 # JWT settings
@@ -145,6 +160,103 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Membership IDs reserved per worker per database round trip
+MEMBERSHIP_ID_BLOCK_SIZE = 1000
+
+# Membership eligibility index (see accounts.eligibility); the snapshot
+# directory must be shared by every worker on the host
+ELIGIBILITY = {
+    'SNAPSHOT_DIR': os.getenv('ELIGIBILITY_SNAPSHOT_DIR', os.path.join(BASE_DIR, 'var', 'eligibility')),
+    'MAX_BATCH': 1000,
+}
+
+# Commission rate for brokers without a BrokerCommissionRate schedule
+BROKER_COMMISSION_DEFAULT_RATE = os.getenv('BROKER_COMMISSION_DEFAULT_RATE', '0')
+
+# Real-time message delivery (see messaging.realtime). LocalBackend only
+# reaches clients of the worker that saved the message; use PostgresBackend
+# with more than one worker.
+MESSAGING_REALTIME = {
+    'BACKEND': os.getenv('MESSAGING_REALTIME_BACKEND', 'messaging.realtime.LocalBackend'),
+    'CHANNEL': 'messaging_events',
+    'QUEUE_SIZE': 100,  # events buffered per connection before it is told to resync
+    'HEARTBEAT': 25,  # seconds
+    'LONG_POLL_TIMEOUT': 30,  # longest wait a messages/since request may ask for, seconds
+}
+
+# Message full-text search (see messaging.search)
+MESSAGE_SEARCH = {
+    'CONFIG': 'english',  # PostgreSQL text search configuration
+    'MAX_QUERY_LENGTH': 200,
+}
+
+# Cache settings
+# LocMemCache is per process, so signal invalidation only reaches the worker
+# that made the write and the response cache stays off on it; set a shared
+# backend (file, Redis, memcached) to enable it across workers.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'dpc-cache'),
+    }
+}
+
+RESPONSE_CACHE = {
+    # Off on LocMemCache: invalidation would only reach the worker that wrote
+    'ENABLED': 'locmem' not in CACHES['default']['BACKEND'].lower(),
+    'TIMEOUT': 300,  # seconds
+    'KEY_PREFIX': 'response',
+}
+
+# Response compression
+RESPONSE_COMPRESSION = {
+    'ENABLED': True,
+    'MIN_SIZE': 1024,  # bytes; smaller responses are sent as-is
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+    # Overrides by path prefix, longest match wins
+    'ROUTES': {
+        '/api/health/': {'ENABLED': False},
+        '/api/accounts/employers/': {'GZIP_LEVEL': 7, 'BROTLI_QUALITY': 6},
+    },
+}
+
+# Health snapshot, refreshed in the background (see core.health)
+HEALTH = {
+    'INTERVAL': 10,  # seconds between samples
+    'STALE_AFTER': 30,  # seconds; /ready fails on an older snapshot
+    'REQUIRED': ['database'],
+    'MEMORY_PERCENT_MAX': 95,
+    'DISK_PERCENT_MAX': 95,
+}
+
+# Prometheus metrics at /metrics/ (see core.metrics)
+METRICS = {
+    'ENABLED': True,
+    'PATH': '/metrics/',
+    # Directory shared by all workers; clear it when the server starts.
+    # Unset keeps metrics per process.
+    'DIRECTORY': os.getenv('METRICS_DIRECTORY'),
+    'FLUSH_INTERVAL': 5,  # seconds
+    # Scraper addresses; '*' opens the endpoint to any client.
+    # WARNING: REMOTE_ADDR is the proxy's address behind a reverse proxy, so
+    # with nginx on the same host every external request is 127.0.0.1. That
+    # is why requests with X-Forwarded-For / Forwarded / X-Real-IP headers are
+    # refused unless ALLOW_PROXIED is set; scrape workers directly, or block
+    # PATH at the proxy before setting it.
+    'ALLOWED_IPS': os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(','),
+    'ALLOW_PROXIED': False,
+}
+
+# Per-request SQL profiling (see core.sqlprofile)
+SQL_PROFILER = {
+    'ENABLED': os.getenv('SQL_PROFILER', 'false').lower() == 'true',
+    'N_PLUS_ONE_THRESHOLD': 5,  # runs of one query shape with different parameters
+    'SLOW_REQUEST_MS': 500,  # requests at least this slow are reported
+    'HEADER': True,  # X-SQL-Profile summary header, only with DEBUG
+    'TOP_SHAPES': 10,
+}
+
 # Email settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'  # Or your email provider
@@ -158,39 +270,55 @@ DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
-            'style': '{',
-        },
-    },
     'handlers': {
-        'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
-        },
-        'file': {
-            'class': 'logging.handlers.RotatingFileHandler',
+        # Request threads only enqueue; a listener thread writes JSON lines
+        # to the console and the rotating file (see core.log)
+        'queue': {
+            '()': 'core.log.QueueListenerHandler',
             'filename': 'logs/django.log',
-            'maxBytes': 1024 * 1024 * 5,  # 5 MB
-            'backupCount': 5,
-            'formatter': 'verbose',
+            'max_bytes': 1024 * 1024 * 5,  # 5 MB
+            'backup_count': 5,
+            'console': True,
+            'queue_size': 10_000,  # records beyond this are dropped, not waited on
+        },
+        'sql_profile': {
+            '()': 'core.log.QueueListenerHandler',
+            'filename': 'logs/sql_profile.log',
+            'max_bytes': 1024 * 1024 * 20,  # 20 MB
+            'backup_count': 5,
+            'console': False,
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
         'core.middleware': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
+        # Slow-request and N+1 reports from SQLProfilerMiddleware, one JSON object per line
+        'core.sqlprofile': {
+            'handlers': ['sql_profile'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     }
 }
 
+# Request log sampling; errors are always logged
+REQUEST_LOGGING = {
+    'ENABLED': True,
+    'SAMPLE_RATE': 1.0,  # share of successful requests logged
+    # Overrides by path prefix, longest match wins
+    'ROUTES': {
+        '/api/messages/since': {'SAMPLE_RATE': 0.01},
+    },
+}
+
 # Create logs directory if it doesn't exist
 if not os.path.exists('logs'):
     os.makedirs('logs')
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import re
+import sys
+import time
+
+from django.conf import settings
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def get_config():
+    return {
+        'ENABLED': False,
+        'N_PLUS_ONE_THRESHOLD': 5,  # executions of one shape with varying parameters
+        'SLOW_REQUEST_MS': 500,
+        'HEADER': True,  # X-SQL-Profile summary, only when DEBUG is on
+        'TOP_SHAPES': 10,  # shapes listed in a report
+        **getattr(settings, 'SQL_PROFILER', {}),
+    }
+
+
+def normalize(sql):
+    """The shape of a statement: literals and parameter lists collapsed to ``?``"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def call_site():
+    """``path:line in function`` of the innermost project frame issuing a query"""
+    root = str(settings.BASE_DIR)
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(root) and 'site-packages' not in filename and not filename.endswith('sqlprofile.py'):
+            return f'{os.path.relpath(filename, root)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+class Profile:
+    """
+    Query statistics of one request, collected as an ``execute_wrapper``.
+
+    Queries are grouped by normalised shape. A shape that runs
+    ``N_PLUS_ONE_THRESHOLD`` times with different parameters is a likely
+    N+1 and has its call site captured; the stack is only walked at that
+    point, so ordinary queries cost a regex pass and a dict update.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.queries = 0
+        self.duration = 0.0
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.duration += elapsed
+            self.record(sql, params, elapsed)
+
+    def record(self, sql, params, elapsed):
+        shape = normalize(sql)
+        stats = self.shapes.get(shape)
+        if stats is None:
+            stats = self.shapes[shape] = {'count': 0, 'duration': 0.0, 'params': set(), 'sql': sql[:500], 'site': None}
+        stats['count'] += 1
+        stats['duration'] += elapsed
+        stats['params'].add(hashlib.md5(repr(params).encode(), usedforsecurity=False).digest())
+        if stats['site'] is None and len(stats['params']) >= self.threshold:
+            stats['site'] = call_site()
+
+    def n_plus_one(self):
+        """Shapes repeated with varying parameters, most executed first"""
+        return sorted(
+            (shape for shape, stats in self.shapes.items() if len(stats['params']) >= self.threshold),
+            key=lambda shape: -self.shapes[shape]['count']
+        )
+
+    def duplicates(self):
+        """Shapes run more than once with identical parameters"""
+        return [shape for shape, stats in self.shapes.items() if stats['count'] > len(stats['params'])]
+
+    def summary(self):
+        return f'queries={self.queries}; db_ms={self.duration * 1000:.1f}; n_plus_one={len(self.n_plus_one())}'
+
+    def report(self, request, response, duration, top):
+        """A JSON-serialisable record of the request for offline analysis"""
+        match = getattr(request, 'resolver_match', None)
+        shapes = sorted(self.shapes.items(), key=lambda item: -item[1]['duration'])[:top]
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': match._func_path if match is not None else None,
+            'route': match.view_name if match is not None else None,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': self.queries,
+            'db_ms': round(self.duration * 1000, 2),
+            'n_plus_one': [
+                {'shape': shape, 'count': self.shapes[shape]['count'], 'site': self.shapes[shape]['site']}
+                for shape in self.n_plus_one()
+            ],
+            'duplicates': len(self.duplicates()),
+            'shapes': [
+                {
+                    'shape': shape,
+                    'count': stats['count'],
+                    'distinct_params': len(stats['params']),
+                    'db_ms': round(stats['duration'] * 1000, 2),
+                    'example': stats['sql'],
+                }
+                for shape, stats in shapes
+            ],
+        }
@@ -0,0 +1,153 @@
+import datetime
+from decimal import Decimal
+
+from django.test import TestCase
+
+from accounts.models import (
+    Broker,
+    Dependent,
+    DependentMembership,
+    Employee,
+    EmployeeMembership,
+    Employer,
+    Provider,
+    ProviderMembershipTier,
+    User,
+)
+from accounts.serializers import (
+    DependentCompiledSerializer,
+    DependentSerializer,
+    EmployeeCompiledSerializer,
+    EmployeeSerializer,
+)
+from enrollment.models import Enrollment, ProviderPlan, Transaction
+from enrollment.serializers import TransactionCompiledSerializer, TransactionSerializer
+from messaging.models import Message
+from messaging.serializers import MessageCompiledSerializer, MessageSerializer
+
+
+class CompiledSerializerParityTests(TestCase):
+    """CompiledSerializer output must equal the ModelSerializer it compiles"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.contact = User.objects.create_user(
+            username='contact', email='contact@example.com', password='x', user_type='EMPLOYER'
+        )
+        cls.staff = User.objects.create_user(
+            username='staff', email='staff@example.com', password='x', user_type='EMPLOYER'
+        )
+        provider_user = User.objects.create_user(
+            username='provider', email='provider@example.com', password='x', user_type='PROVIDER'
+        )
+        broker_user = User.objects.create_user(
+            username='broker', email='broker@example.com', password='x', user_type='BROKER'
+        )
+        cls.provider = Provider.objects.create(
+            user=provider_user, provider_type=Provider.ProviderType.MDDO, practice_name='Main Street DPC',
+            years_experience=10, npi_number='1234567890', dea_number='AB1234567', license_number='L-1'
+        )
+        cls.broker = Broker.objects.create(
+            user=broker_user, brokerage_name='Acme Benefits', national_producer_number='NPN-1', licensure_number='B-1'
+        )
+        cls.tier = ProviderMembershipTier.objects.create(
+            provider=cls.provider, name='Gold', price=Decimal('89.00'), description='Everything'
+        )
+        cls.employer = Employer.objects.create(
+            contact_person=cls.contact, company_name='Acme', company_type='LLC', industry='Retail',
+            company_size=10, employer_identification_number='12-3456789', phone='555-0100',
+            email='hr@acme.example', address_line1='1 Main St', city='Springfield', state='IL', zip_code='62701'
+        )
+
+        def employee(last_name, user=None):
+            return Employee.objects.create(
+                employer=cls.employer, user=user, first_name='Jordan', last_name=last_name,
+                email=f'{last_name.lower()}@acme.example', address_line1='1 Main St', city='Springfield',
+                state='IL', zip_code='62701', sex='F', date_of_birth=datetime.date(1988, 4, 12),
+                enrollment_date=datetime.date(2024, 1, 1), enrollment_status='ACTIVE'
+            )
+
+        # Contact person, other user, no user: is_contact_person True, False, None
+        cls.with_contact = employee('Alpha', cls.contact)
+        cls.with_user = employee('Bravo', cls.staff)
+        cls.without_user = employee('Charlie')
+        EmployeeMembership.objects.create(
+            employee=cls.with_contact, membership_tier=cls.tier, provider=cls.provider,
+            membership_id='E0000001X', start_date=datetime.date(2024, 1, 1)
+        )
+        EmployeeMembership.objects.create(
+            employee=cls.with_contact, membership_tier=cls.tier, provider=cls.provider,
+            membership_id='E0000002X', start_date=datetime.date(2023, 1, 1),
+            end_date=datetime.date(2023, 12, 31), is_active=False
+        )
+
+        spouse = Dependent.objects.create(
+            employee=cls.with_contact, first_name='Sam', last_name='Alpha', date_of_birth=datetime.date(1987, 2, 3),
+            sex='M', relationship=Dependent.Relationship.SPOUSE, enrollment_date=datetime.date(2024, 1, 1),
+            enrollment_status='ACTIVE'
+        )
+        Dependent.objects.create(
+            employee=cls.with_contact, first_name='Kit', last_name='Alpha', date_of_birth=datetime.date(2015, 6, 30),
+            sex='F', relationship=Dependent.Relationship.CHILD, enrollment_date=datetime.date(2024, 1, 1),
+            enrollment_status='PENDING'
+        )
+        DependentMembership.objects.create(
+            dependent=spouse, membership_tier=cls.tier, provider=cls.provider,
+            membership_id='D0000001X', start_date=datetime.date(2024, 1, 1)
+        )
+
+        plan = ProviderPlan.objects.create(
+            provider=cls.provider, name='Gold', description='Everything', monthly_amount=Decimal('89.00')
+        )
+        enrollment = Enrollment.objects.create(
+            plan=plan, employee=cls.with_contact, broker=cls.broker, start_date=datetime.date(2024, 1, 1)
+        )
+        Transaction.objects.create(
+            enrollment=enrollment, transaction_type=Transaction.TransactionType.PROVIDER_PAYMENT,
+            amount=Decimal('89.00'), status=Transaction.Status.COMPLETED,
+            billing_period_start=datetime.date(2024, 1, 1), billing_period_end=datetime.date(2024, 1, 31),
+            provider=cls.provider, reference_id='T-1', notes='Monthly membership – café plan'
+        )
+        Transaction.objects.create(
+            enrollment=enrollment, transaction_type=Transaction.TransactionType.BROKER_COMMISSION,
+            amount=Decimal('8.90'), billing_period_start=datetime.date(2024, 1, 1),
+            billing_period_end=datetime.date(2024, 1, 31), broker=cls.broker, reference_id='T-2'
+        )
+        Transaction.objects.create(
+            enrollment=enrollment, transaction_type=Transaction.TransactionType.PROVIDER_PAYMENT,
+            amount=Decimal('0.05'), billing_period_start=datetime.date(2024, 2, 1),
+            billing_period_end=datetime.date(2024, 2, 29), reference_id='T-3'
+        )
+
+        Message.objects.create(sender=cls.contact, recipient=cls.staff, content='Hello')
+        Message.objects.create(sender=cls.staff, recipient=cls.contact, content='', is_read=True)
+
+    def assertParity(self, compiled_class, serializer_class, queryset):
+        self.assertTrue(queryset.exists())
+        expected = serializer_class(queryset, many=True).data
+        self.assertEqual(compiled_class(queryset).data, expected)
+        # An evaluated page is reloaded by pk and keeps its order
+        self.assertEqual(compiled_class(list(queryset)).data, expected)
+
+    def test_employee(self):
+        self.assertParity(EmployeeCompiledSerializer, EmployeeSerializer, Employee.objects.all())
+
+    def test_employee_is_contact_person(self):
+        rows = {row['id']: row for row in EmployeeCompiledSerializer(Employee.objects.all()).data}
+        self.assertIs(rows[self.with_contact.pk]['is_contact_person'], True)
+        self.assertIs(rows[self.with_user.pk]['is_contact_person'], False)
+        self.assertIsNone(rows[self.without_user.pk]['is_contact_person'])
+        self.assertIsNone(rows[self.without_user.pk]['user'])
+        self.assertEqual(rows[self.without_user.pk]['memberships'], [])
+
+    def test_dependent(self):
+        self.assertParity(DependentCompiledSerializer, DependentSerializer, Dependent.objects.all())
+
+    def test_transaction(self):
+        self.assertParity(TransactionCompiledSerializer, TransactionSerializer, Transaction.objects.order_by('pk'))
+
+    def test_message(self):
+        self.assertParity(MessageCompiledSerializer, MessageSerializer, Message.objects.all())
+
+    def test_empty_queryset(self):
+        self.assertEqual(TransactionCompiledSerializer(Transaction.objects.none()).data, [])
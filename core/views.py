@@ -1,37 +1,27 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from django.db import connections
-from django.db.utils import OperationalError
-from django.core.cache import cache
-import psutil
-import os
+from .health import sampler
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_check(request):
-    # Check database connection
-    db_healthy = True
-    try:
-        connections['default'].cursor()
-    except OperationalError:
-        db_healthy = False
-
-    # Check system resources
-    memory = psutil.virtual_memory()
-    disk = psutil.disk_usage('/')
-    
+    # Served from the background snapshot; no database or system calls here
+    ready, snapshot = sampler.readiness()
+    checks = snapshot.get('checks', {})
+    database = checks.get('database', {})
     health_status = {
-        'status': 'healthy' if db_healthy else 'unhealthy',
-        'database': 'connected' if db_healthy else 'disconnected',
-        'email_service': os.getenv('EMAIL_HOST_USER') is not None,
+        'status': 'healthy' if ready else 'unhealthy',
+        'database': 'connected' if database.get('healthy') else 'disconnected',
+        'email_service': checks.get('email', {}).get('configured', False),
         'system': {
-            'memory_used': f"{memory.percent}%",
-            'disk_used': f"{disk.percent}%",
-        }
+            'memory_used': f"{checks['memory']['percent']}%" if 'percent' in checks.get('memory', {}) else None,
+            'disk_used': f"{checks['disk']['percent']}%" if 'percent' in checks.get('disk', {}) else None,
+        },
+        'snapshot': snapshot,
     }
 
-    if not db_healthy:
+    if not ready:
         return Response(health_status, status=503)  # Service Unavailable
-    
-    return Response(health_status) 
\ No newline at end of file
+
+    return Response(health_status)
@@ -1,11 +1,12 @@
 from django.contrib import admin
 from .models import (
     ProviderPlan, Enrollment, DependentEnrollment,
-    Transaction, TransactionDetail
+    Transaction, TransactionDetail, BrokerCommissionRate
 )
 
 admin.site.register(ProviderPlan)
 admin.site.register(Enrollment)
 admin.site.register(DependentEnrollment)
 admin.site.register(Transaction)
-admin.site.register(TransactionDetail) 
\ No newline at end of file
+admin.site.register(TransactionDetail) 
+admin.site.register(BrokerCommissionRate)
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class EnrollmentConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'enrollment'
+
+    def ready(self):
+        from . import ledger  # noqa: F401 - connects the revenue ledger signals
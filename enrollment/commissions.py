@@ -0,0 +1,125 @@
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# Commission rates are stored with four decimal places
+RATE_SCALE = 10_000
+
+
+def allocate(payment_ids, brokers, cents, rate_units):
+    """
+    Split each broker's commission across their payments, in whole cents.
+
+    ``cents`` are payment amounts in cents and ``rate_units`` rates in
+    1/10000ths, so every exact commission is an integer ``cents * rate_units``.
+    A broker's total is rounded half up once; each payment gets its exact
+    share rounded down, and the cents left over go to the payments with the
+    largest remainders (ties broken by payment id). Rows therefore always add
+    up to the broker total, and results do not depend on input order.
+
+    Returns ``(row_cents, broker_totals)`` where ``broker_totals`` maps broker
+    id to ``(exact, cents)``; ``exact`` is in cents * RATE_SCALE.
+    """
+    if np is not None:
+        return _allocate_numpy(payment_ids, brokers, cents, rate_units)
+    return _allocate_python(payment_ids, brokers, cents, rate_units)
+
+
+def _allocate_numpy(payment_ids, brokers, cents, rate_units):
+    payment_ids = np.asarray(payment_ids, dtype=np.int64)
+    cents = np.asarray(cents, dtype=np.int64)
+    rate_units = np.asarray(rate_units, dtype=np.int64)
+    broker_ids, group = np.unique(np.asarray(brokers, dtype=np.int64), return_inverse=True)
+
+    exact = cents * rate_units
+    floor, remainder = np.divmod(exact, RATE_SCALE)
+    totals = np.zeros(len(broker_ids), dtype=np.int64)
+    np.add.at(totals, group, exact)
+    targets = (totals + RATE_SCALE // 2) // RATE_SCALE
+    floors = np.zeros(len(broker_ids), dtype=np.int64)
+    np.add.at(floors, group, floor)
+    shortfall = targets - floors
+
+    # Rank rows within each broker by remainder (largest first), then id
+    order = np.lexsort((payment_ids, -remainder, group))
+    sorted_group = group[order]
+    starts = np.searchsorted(sorted_group, np.arange(len(broker_ids)))
+    rank = np.arange(len(order)) - starts[sorted_group]
+    bonus = np.zeros(len(order), dtype=np.int64)
+    bonus[order] = rank < shortfall[sorted_group]
+
+    return (
+        (floor + bonus).tolist(),
+        {
+            int(broker): (int(total), int(target))
+            for broker, total, target in zip(broker_ids, totals, targets)
+        },
+    )
+
+
+def _allocate_python(payment_ids, brokers, cents, rate_units):
+    exact = [amount * rate for amount, rate in zip(cents, rate_units)]
+    totals = {}
+    for broker, value in zip(brokers, exact):
+        totals[broker] = totals.get(broker, 0) + value
+    targets = {broker: (total + RATE_SCALE // 2) // RATE_SCALE for broker, total in totals.items()}
+
+    row_cents = [value // RATE_SCALE for value in exact]
+    shortfall = dict(targets)
+    for broker, value in zip(brokers, row_cents):
+        shortfall[broker] -= value
+
+    order = sorted(
+        range(len(exact)),
+        key=lambda i: (brokers[i], -(exact[i] % RATE_SCALE), payment_ids[i])
+    )
+    for i in order:
+        if shortfall[brokers[i]] > 0:
+            row_cents[i] += 1
+            shortfall[brokers[i]] -= 1
+
+    return row_cents, {broker: (totals[broker], targets[broker]) for broker in totals}
+
+
+def lookup_rates(brokers, plans, default_rates, plan_rates, fallback):
+    """
+    Rate for each row, in 1/10000ths.
+
+    ``plan_rates`` maps ``(broker, plan)`` to a rate and wins over
+    ``default_rates`` (per broker), which wins over ``fallback``.
+    """
+    if np is None:
+        return [
+            plan_rates.get((broker, plan), default_rates.get(broker, fallback))
+            for broker, plan in zip(brokers, plans)
+        ]
+
+    brokers = np.asarray(brokers, dtype=np.int64)
+    plans = np.asarray(plans, dtype=np.int64)
+    rates = np.full(len(brokers), fallback, dtype=np.int64)
+    if default_rates:
+        _apply(rates, brokers, np.fromiter(default_rates, dtype=np.int64), default_rates.values())
+    if plan_rates:
+        known_brokers, known_plans = (np.array(side, dtype=np.int64) for side in zip(*plan_rates))
+        _apply(
+            rates,
+            _pair_keys(brokers, plans),
+            _pair_keys(known_brokers, known_plans),
+            plan_rates.values()
+        )
+    return rates.tolist()
+
+
+def _apply(rates, keys, known, values):
+    """Overwrite ``rates`` wherever ``keys`` is one of ``known``"""
+    values = np.fromiter(values, dtype=np.int64, count=len(known))
+    order = np.argsort(known)
+    known, values = known[order], values[order]
+    position = np.minimum(np.searchsorted(known, keys), len(known) - 1)
+    found = known[position] == keys
+    rates[found] = values[position[found]]
+
+
+def _pair_keys(brokers, plans):
+    return (brokers << 32) | plans
@@ -0,0 +1,388 @@
+import csv
+import datetime
+import hashlib
+import io
+import json
+import struct
+import sys
+import zipfile
+import zlib
+from array import array
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import Transaction, TransactionDetail
+
+MAGIC = b'TCOL1'
+FOOTER = struct.Struct('<Q5s')
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+EPOCH_ORDINAL = EPOCH.date().toordinal()
+
+# name, type, model field; decimals are stored as scaled integers
+TRANSACTION_SCHEMA = [
+    ('id', 'int64', 'id'),
+    ('enrollment_id', 'int64', 'enrollment_id'),
+    ('transaction_type', 'string', 'transaction_type'),
+    ('amount', 'decimal(10,2)', 'amount'),
+    ('status', 'string', 'status'),
+    ('billing_period_start', 'date', 'billing_period_start'),
+    ('billing_period_end', 'date', 'billing_period_end'),
+    ('provider_id', 'int64', 'provider_id'),
+    ('broker_id', 'int64', 'broker_id'),
+    ('reference_id', 'string', 'reference_id'),
+    ('notes', 'string', 'notes'),
+    ('created_at', 'timestamp', 'created_at'),
+    ('updated_at', 'timestamp', 'updated_at'),
+]
+DETAIL_SCHEMA = [
+    ('id', 'int64', 'id'),
+    ('transaction_id', 'int64', 'transaction_id'),
+    ('description', 'string', 'description'),
+    ('amount', 'decimal(10,2)', 'amount'),
+    ('dependent_enrollment_id', 'int64', 'dependent_enrollment_id'),
+    ('created_at', 'timestamp', 'created_at'),
+]
+
+
+def _scale(column_type):
+    return int(column_type[column_type.index(',') + 1:-1]) if column_type.startswith('decimal') else 0
+
+
+def _int64(values):
+    data = array('q', values)
+    if sys.byteorder == 'big':
+        data.byteswap()
+    return data.tobytes()
+
+
+def _array(typecode, data):
+    """Little-endian bytes back into an array"""
+    values = array(typecode, data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def _to_int(value, column_type):
+    if column_type == 'int64':
+        return value
+    if column_type == 'date':
+        return value.toordinal() - EPOCH_ORDINAL
+    if column_type == 'timestamp':
+        return (value - EPOCH) // datetime.timedelta(microseconds=1)
+    return int(value.scaleb(_scale(column_type)))
+
+
+def _from_int(value, column_type):
+    if column_type == 'int64':
+        return value
+    if column_type == 'date':
+        return datetime.date.fromordinal(value + EPOCH_ORDINAL)
+    if column_type == 'timestamp':
+        return EPOCH + datetime.timedelta(microseconds=value)
+    return Decimal(value).scaleb(-_scale(column_type))
+
+
+class _CountingStream:
+    """Pass-through writer that tracks size and SHA-256 of what was written"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.size += len(data)
+        self.sha256.update(data)
+        return self.stream.write(data)
+
+
+class ColumnarWriter:
+    """
+    Compact binary columnar format (``.tcol``).
+
+    The file is a sequence of row groups followed by a JSON footer, its
+    length and the ``TCOL1`` magic. Within a row group every column is one
+    zlib-compressed chunk: a null bitmap when the column has nulls, then the
+    values as little-endian int64 (integers, dates as days and timestamps as
+    microseconds since the epoch, decimals scaled to integers), or for strings
+    either a dictionary plus int32 codes or int64 offsets plus UTF-8 data.
+    The footer records the schema and each chunk's offset, length and encoding,
+    so readers can fetch single columns of single row groups.
+    """
+    extension = 'tcol'
+    content_type = 'application/octet-stream'
+
+    def __init__(self, stream, schema):
+        self.stream = _CountingStream(stream)
+        self.schema = schema
+        self.row_groups = []
+        self.rows = 0
+
+    def write_row_group(self, columns):
+        count = len(columns[0]) if columns else 0
+        group = {'rows': count, 'columns': []}
+        for (name, column_type, _), values in zip(self.schema, columns):
+            payload, meta = self._encode(values, column_type)
+            chunk = zlib.compress(payload, 6)
+            group['columns'].append({'offset': self.stream.size, 'length': len(chunk), **meta})
+            self.stream.write(chunk)
+        self.row_groups.append(group)
+        self.rows += count
+
+    def _encode(self, values, column_type):
+        nulls = sum(value is None for value in values)
+        meta = {'null_count': nulls}
+        parts = []
+        if nulls:
+            parts.append(bytes(value is not None for value in values))
+
+        if column_type == 'string':
+            values = ['' if value is None else value for value in values]
+            distinct = dict.fromkeys(values)
+            if len(distinct) * 2 <= len(values):
+                codes = {value: code for code, value in enumerate(distinct)}
+                dictionary = [value.encode() for value in distinct]
+                meta['encoding'] = 'dictionary'
+                meta['dictionary_size'] = len(dictionary)
+                parts.append(_int64(self._offsets(dictionary)))
+                parts.append(b''.join(dictionary))
+                indices = array('i', (codes[value] for value in values))
+                if sys.byteorder == 'big':
+                    indices.byteswap()
+                parts.append(indices.tobytes())
+            else:
+                encoded = [value.encode() for value in values]
+                meta['encoding'] = 'plain'
+                parts.append(_int64(self._offsets(encoded)))
+                parts.append(b''.join(encoded))
+        else:
+            meta['encoding'] = 'plain'
+            parts.append(_int64(
+                0 if value is None else _to_int(value, column_type) for value in values
+            ))
+        return b''.join(parts), meta
+
+    def _offsets(self, encoded):
+        offsets, position = [0], 0
+        for value in encoded:
+            position += len(value)
+            offsets.append(position)
+        return offsets
+
+    def close(self):
+        footer = json.dumps({
+            'schema': [
+                {'name': name, 'type': column_type} for name, column_type, _ in self.schema
+            ],
+            'row_groups': self.row_groups,
+        }).encode()
+        self.stream.write(footer)
+        self.stream.write(FOOTER.pack(len(footer), MAGIC))
+
+
+class CsvWriter:
+    """CSV with a header row; dates and timestamps in ISO 8601, nulls as empty fields"""
+    extension = 'csv'
+    content_type = 'text/csv'
+
+    def __init__(self, stream, schema):
+        self.stream = _CountingStream(stream)
+        self.schema = schema
+        self.text = io.StringIO()
+        self.writer = csv.writer(self.text)
+        self.rows = 0
+        self.writer.writerow([name for name, _, _ in schema])
+        self._flush()
+
+    def _flush(self):
+        self.stream.write(self.text.getvalue().encode())
+        self.text.seek(0)
+        self.text.truncate()
+
+    def write_row_group(self, columns):
+        rows = list(zip(*columns))
+        self.writer.writerows(
+            ['' if value is None else value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+            for row in rows
+        )
+        self.rows += len(rows)
+        self._flush()
+
+    def close(self):
+        pass
+
+
+WRITERS = {'csv': CsvWriter, 'tcol': ColumnarWriter}
+
+
+def read_columnar(stream):
+    """Yield ``{column: values}`` per row group of a ``.tcol`` file opened in binary mode"""
+    stream.seek(-FOOTER.size, io.SEEK_END)
+    length, magic = FOOTER.unpack(stream.read(FOOTER.size))
+    if magic != MAGIC:
+        raise ValueError('Not a TCOL file')
+    stream.seek(-FOOTER.size - length, io.SEEK_END)
+    footer = json.loads(stream.read(length))
+    schema = footer['schema']
+
+    for group in footer['row_groups']:
+        rows = group['rows']
+        columns = {}
+        for column, meta in zip(schema, group['columns']):
+            stream.seek(meta['offset'])
+            payload = zlib.decompress(stream.read(meta['length']))
+            valid = None
+            if meta['null_count']:
+                valid, payload = payload[:rows], payload[rows:]
+
+            if column['type'] == 'string':
+                size = meta['dictionary_size'] if meta['encoding'] == 'dictionary' else rows
+                offsets = _array('q', payload[:8 * (size + 1)])
+                data = payload[8 * (size + 1):]
+                strings = [data[offsets[i]:offsets[i + 1]].decode() for i in range(size)]
+                if meta['encoding'] == 'dictionary':
+                    codes = _array('i', data[offsets[size]:])
+                    values = [strings[code] for code in codes]
+                else:
+                    values = strings
+            else:
+                values = [_from_int(value, column['type']) for value in _array('q', payload)]
+            if valid is not None:
+                values = [value if flag else None for value, flag in zip(values, valid)]
+            columns[column['name']] = values
+        yield columns
+
+
+class TransactionExport:
+    """
+    Export one billing period's transactions and transaction details.
+
+    Rows are streamed with ``QuerySet.iterator()`` (a server-side cursor on
+    PostgreSQL) and handed to the writer ``row_group_size`` rows at a time, so
+    memory stays flat however large the period is. ``manifest()`` describes
+    the files written: schema, row and row-group counts, sizes and SHA-256.
+    """
+
+    def __init__(self, period_start, file_format='tcol', row_group_size=50_000):
+        if file_format not in WRITERS:
+            raise ValueError(f"Unsupported export format '{file_format}'")
+        self.period_start = period_start.replace(day=1)
+        self.writer_class = WRITERS[file_format]
+        self.row_group_size = row_group_size
+        self.files = []
+
+    def tables(self):
+        return [
+            (
+                'transactions',
+                TRANSACTION_SCHEMA,
+                Transaction.objects.filter(billing_period_start=self.period_start),
+            ),
+            (
+                'transaction_details',
+                DETAIL_SCHEMA,
+                TransactionDetail.objects.filter(transaction__billing_period_start=self.period_start),
+            ),
+        ]
+
+    def row_groups(self, queryset, schema):
+        """Column lists of at most ``row_group_size`` rows"""
+        rows = queryset.order_by('pk').values_list(
+            *(field for _, _, field in schema)
+        ).iterator(chunk_size=min(self.row_group_size, 10_000))
+        group = []
+        for row in rows:
+            group.append(row)
+            if len(group) == self.row_group_size:
+                yield [list(column) for column in zip(*group)]
+                group = []
+        if group:
+            yield [list(column) for column in zip(*group)]
+
+    def filename(self, table):
+        return f'{table}-{self.period_start:%Y-%m}.{self.writer_class.extension}'
+
+    def manifest_name(self):
+        return f'manifest-{self.period_start:%Y-%m}.json'
+
+    def write_table(self, table, schema, queryset, stream):
+        writer = self.writer_class(stream, schema)
+        groups = 0
+        for columns in self.row_groups(queryset, schema):
+            writer.write_row_group(columns)
+            groups += 1
+        writer.close()
+        self._record(table, schema, writer, groups)
+
+    def manifest(self):
+        return {
+            'period_start': self.period_start.isoformat(),
+            'generated_at': timezone.now().isoformat(),
+            'row_group_size': self.row_group_size,
+            'files': self.files,
+        }
+
+    def write_directory(self, directory):
+        """Write every table plus the manifest into ``directory``"""
+        for table, schema, queryset in self.tables():
+            with open(f'{directory}/{self.filename(table)}', 'wb') as stream:
+                self.write_table(table, schema, queryset, stream)
+        with open(f'{directory}/{self.manifest_name()}', 'w') as stream:
+            json.dump(self.manifest(), stream, indent=2)
+        return self.manifest()
+
+    def stream_zip(self):
+        """Yield a zip of every table plus the manifest as it is produced"""
+        buffer = _ChunkBuffer()
+        with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED) as archive:
+            for table, schema, queryset in self.tables():
+                with archive.open(self.filename(table), 'w', force_zip64=True) as member:
+                    writer = self.writer_class(member, schema)
+                    groups = 0
+                    for columns in self.row_groups(queryset, schema):
+                        writer.write_row_group(columns)
+                        groups += 1
+                        yield buffer.take()
+                    writer.close()
+                self._record(table, schema, writer, groups)
+                yield buffer.take()
+            archive.writestr(self.manifest_name(), json.dumps(self.manifest(), indent=2))
+        yield buffer.take()
+
+    def _record(self, table, schema, writer, groups):
+        self.files.append({
+            'name': self.filename(table),
+            'table': table,
+            'format': writer.extension,
+            'rows': writer.rows,
+            'row_groups': groups,
+            'bytes': writer.stream.size,
+            'sha256': writer.stream.sha256.hexdigest(),
+            'schema': [{'name': name, 'type': column_type} for name, column_type, _ in schema],
+        })
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Unseekable sink that hands back whatever was written since the last ``take()``"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
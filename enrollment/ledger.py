@@ -0,0 +1,167 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from .models import Enrollment, Transaction, ProviderRevenueLedger
+
+COLUMNS = ('revenue', 'refunds', 'completed_count', 'refunded_count')
+ZERO = (Decimal('0'), Decimal('0'), 0, 0)
+
+
+def contribution(status, amount):
+    """What one transaction adds to its ledger row"""
+    if status == Transaction.Status.COMPLETED:
+        return (amount, Decimal('0'), 1, 0)
+    if status == Transaction.Status.REFUNDED:
+        return (Decimal('0'), amount, 0, 1)
+    return ZERO
+
+
+def ledger_key(provider_id, enrollment_id, day, transaction_type):
+    """Broker commissions carry no provider; they count against the enrollment's plan provider"""
+    if provider_id is None:
+        provider_id = Enrollment.objects.filter(pk=enrollment_id).values_list(
+            'plan__provider_id', flat=True
+        ).first()
+    return provider_id, day, transaction_type
+
+
+def apply_deltas(deltas):
+    """Add ``{(provider, day, type): (revenue, refunds, completed, refunded)}`` to the ledger"""
+    table = ProviderRevenueLedger._meta.db_table
+    now = timezone.now()
+    rows = [
+        (*key, *delta, now)
+        for key, delta in deltas.items()
+        if key[0] is not None and any(delta)
+    ]
+    if not rows:
+        return
+    updates = ', '.join(f'{column} = {table}.{column} + EXCLUDED.{column}' for column in COLUMNS)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} (provider_id, day, transaction_type, {", ".join(COLUMNS)}, updated_at) '
+            f'VALUES (%s, %s, %s, %s, %s, %s, %s, %s) '
+            f'ON CONFLICT (provider_id, day, transaction_type) DO UPDATE SET {updates}, updated_at = EXCLUDED.updated_at',
+            rows
+        )
+
+
+def _add(deltas, key, values, sign):
+    current = deltas.get(key, ZERO)
+    deltas[key] = tuple(total + sign * value for total, value in zip(current, values))
+
+
+def capture_previous(sender, instance, raw=False, **kwargs):
+    instance._ledger_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._ledger_previous = Transaction.objects.filter(pk=instance.pk).values_list(
+        'provider_id', 'enrollment_id', 'billing_period_start', 'transaction_type', 'status', 'amount'
+    ).first()
+
+
+def record_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    previous = getattr(instance, '_ledger_previous', None)
+    if previous is not None:
+        provider_id, enrollment_id, day, transaction_type, status, amount = previous
+        old = contribution(status, amount)
+        if old != ZERO:
+            _add(deltas, ledger_key(provider_id, enrollment_id, day, transaction_type), old, -1)
+    new = contribution(instance.status, Decimal(instance.amount))
+    if new != ZERO:
+        key = ledger_key(
+            instance.provider_id, instance.enrollment_id,
+            instance.billing_period_start, instance.transaction_type
+        )
+        _add(deltas, key, new, 1)
+    apply_deltas(deltas)
+
+
+def record_delete(sender, instance, **kwargs):
+    old = contribution(instance.status, Decimal(instance.amount))
+    if old != ZERO:
+        key = ledger_key(
+            instance.provider_id, instance.enrollment_id,
+            instance.billing_period_start, instance.transaction_type
+        )
+        apply_deltas({key: tuple(-value for value in old)})
+
+
+pre_save.connect(capture_previous, sender=Transaction, dispatch_uid='enrollment.ledger.pre_save')
+post_save.connect(record_save, sender=Transaction, dispatch_uid='enrollment.ledger.post_save')
+post_delete.connect(record_delete, sender=Transaction, dispatch_uid='enrollment.ledger.post_delete')
+
+
+def recompute(start=None, end=None):
+    """Ledger rows computed from scratch over ``Transaction``, keyed like the ledger"""
+    queryset = Transaction.objects.filter(
+        status__in=[Transaction.Status.COMPLETED, Transaction.Status.REFUNDED]
+    )
+    if start:
+        queryset = queryset.filter(billing_period_start__gte=start)
+    if end:
+        queryset = queryset.filter(billing_period_start__lte=end)
+    completed = Q(status=Transaction.Status.COMPLETED)
+    refunded = Q(status=Transaction.Status.REFUNDED)
+    rows = queryset.annotate(
+        ledger_provider=Coalesce('provider_id', 'enrollment__plan__provider_id')
+    ).values(
+        'ledger_provider', 'billing_period_start', 'transaction_type'
+    ).annotate(
+        revenue=Sum('amount', filter=completed, default=Decimal('0')),
+        refunds=Sum('amount', filter=refunded, default=Decimal('0')),
+        completed_count=Count('pk', filter=completed),
+        refunded_count=Count('pk', filter=refunded),
+    ).order_by()
+    return {
+        (row['ledger_provider'], row['billing_period_start'], row['transaction_type']):
+            tuple(row[column] for column in COLUMNS)
+        for row in rows
+        if row['ledger_provider'] is not None
+    }
+
+
+def _ledger_rows(start=None, end=None):
+    queryset = ProviderRevenueLedger.objects.all()
+    if start:
+        queryset = queryset.filter(day__gte=start)
+    if end:
+        queryset = queryset.filter(day__lte=end)
+    return queryset
+
+
+@transaction.atomic
+def rebuild(start=None, end=None):
+    """Replace the ledger for the range with a full recompute; returns the row count"""
+    rows = recompute(start, end)
+    _ledger_rows(start, end).delete()
+    ProviderRevenueLedger.objects.bulk_create([
+        ProviderRevenueLedger(
+            provider_id=provider_id, day=day, transaction_type=transaction_type,
+            **dict(zip(COLUMNS, values))
+        )
+        for (provider_id, day, transaction_type), values in rows.items()
+    ], batch_size=1000)
+    return len(rows)
+
+
+def verify(start=None, end=None):
+    """Ledger rows that differ from a full recompute: ``{key: (ledger, recomputed)}``"""
+    expected = recompute(start, end)
+    actual = {
+        (row.provider_id, row.day, row.transaction_type): tuple(getattr(row, column) for column in COLUMNS)
+        for row in _ledger_rows(start, end)
+    }
+    return {
+        key: (actual.get(key, ZERO), expected.get(key, ZERO))
+        for key in expected.keys() | actual.keys()
+        if actual.get(key, ZERO) != expected.get(key, ZERO)
+    }
@@ -0,0 +1,182 @@
+import datetime
+import time
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+
+from accounts.models import User, Provider, Employer, Employee, Dependent
+from enrollment.models import (
+    ProviderPlan,
+    Enrollment,
+    DependentEnrollment,
+    Transaction,
+    TransactionDetail
+)
+from enrollment.services import BillingRunService
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic enrollments, time BillingRunService and check it against a row-by-row run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enrollments', type=int, default=1_000_000)
+        parser.add_argument('--dependent-every', type=int, default=3,
+                            help='Give every Nth employee a covered dependent')
+        parser.add_argument('--compare', type=int, default=2000,
+                            help='Enrollments to bill row by row for the parity check and baseline')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('BillingRunService needs PostgreSQL')
+
+        # Everything the benchmark writes is rolled back at the end
+        with transaction.atomic():
+            plan = self._seed(options['enrollments'], options['dependent_every'])
+            self._bench(plan, options)
+            transaction.set_rollback(True)
+
+    def _bench(self, plan, options):
+        period = datetime.date(2099, 1, 1)
+        service = BillingRunService(period)
+
+        start = time.perf_counter()
+        result = service.run()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"First run: {result['transactions_created']} transactions, "
+            f"{result['dependent_lines']} dependent lines in {elapsed:.2f}s "
+            f"({result['transactions_created'] / elapsed:,.0f} enrollments/s)"
+        )
+
+        start = time.perf_counter()
+        rerun = service.run()
+        self.stdout.write(f'Rerun: {rerun["transactions_created"]} transactions in {time.perf_counter() - start:.2f}s')
+        if rerun['transactions_created'] or rerun['dependent_lines']:
+            raise CommandError('Rerunning the period billed enrollments twice')
+
+        billed = Transaction.objects.filter(billing_period_start=period, enrollment__plan=plan)
+        lines = TransactionDetail.objects.filter(transaction__in=billed).aggregate(total=Sum('amount'))['total']
+        if lines != result['total_amount'] or billed.aggregate(total=Sum('amount'))['total'] != lines:
+            raise CommandError('Transaction amounts do not match their itemised lines')
+
+        # Row-by-row baseline over a sample, billed for the previous month
+        sample = list(
+            Enrollment.objects.filter(plan=plan).select_related('plan')
+            .annotate(dependents=Count('dependent_enrollments')).order_by('pk')[:options['compare']]
+        )
+        baseline_period = datetime.date(2098, 12, 1)
+        start = time.perf_counter()
+        for enrollment in sample:
+            self._bill_row_by_row(enrollment, baseline_period)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f'Row-by-row baseline: {len(sample) / elapsed:,.0f} enrollments/s')
+
+        expected = {
+            enrollment.pk: enrollment.plan.monthly_amount * (1 + enrollment.dependents)
+            for enrollment in sample
+        }
+        actual = dict(billed.filter(enrollment_id__in=expected).values_list('enrollment_id', 'amount'))
+        if actual != expected:
+            raise CommandError('BillingRunService amounts differ from the row-by-row run')
+        self.stdout.write(self.style.SUCCESS('Billing run matches row-by-row billing and is idempotent'))
+
+    def _bill_row_by_row(self, enrollment, period_start):
+        payment = Transaction.objects.create(
+            enrollment=enrollment,
+            transaction_type=Transaction.TransactionType.PROVIDER_PAYMENT,
+            amount=Decimal('0'),
+            billing_period_start=period_start,
+            billing_period_end=period_start.replace(day=31),
+            provider_id=enrollment.plan.provider_id,
+            reference_id=f'BENCH-{period_start:%Y%m}-{enrollment.pk}',
+        )
+        total = Decimal('0')
+        TransactionDetail.objects.create(
+            transaction=payment,
+            description='Member monthly membership',
+            amount=enrollment.plan.monthly_amount
+        )
+        total += enrollment.plan.monthly_amount
+        for dependent_enrollment in enrollment.dependent_enrollments.all():
+            TransactionDetail.objects.create(
+                transaction=payment,
+                description='Dependent monthly membership',
+                amount=enrollment.plan.monthly_amount,
+                dependent_enrollment=dependent_enrollment
+            )
+            total += enrollment.plan.monthly_amount
+        payment.amount = total
+        payment.save()
+
+    def _seed(self, count, dependent_every):
+        """Insert ``count`` employees with one ACTIVE enrollment each, in SQL"""
+        self.stdout.write(f'Seeding {count:,} enrollments...')
+        start = time.perf_counter()
+        address = {
+            'phone': '555-0100', 'address_line1': '1 Bench St',
+            'city': 'Springfield', 'state': 'IL', 'zip_code': '62701',
+        }
+        provider_user = User.objects.create(
+            username='bench-billing-provider', user_type=User.UserType.PROVIDER, **address
+        )
+        employer_user = User.objects.create(
+            username='bench-billing-employer', user_type=User.UserType.EMPLOYER, **address
+        )
+        provider = Provider.objects.create(
+            user=provider_user, provider_type=Provider.ProviderType.MDDO,
+            practice_name='Bench DPC', years_experience=1, npi_number='0000000000',
+            dea_number='000000000', license_number='BENCH'
+        )
+        employer = Employer.objects.create(
+            contact_person=employer_user, company_name='Bench Co', company_type='LLC',
+            industry='Testing', company_size=count, employer_identification_number='00-0000000',
+            email='bench@example.invalid', **address
+        )
+        plan = ProviderPlan.objects.create(
+            provider=provider, name='Bench plan', description='', monthly_amount=Decimal('79.50')
+        )
+
+        params = {
+            'count': count, 'every': dependent_every, 'employer': employer.pk, 'plan': plan.pk,
+            'active': Enrollment.Status.ACTIVE, 'start': datetime.date(2098, 1, 1),
+        }
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {Employee._meta.db_table} (
+                    employer_id, first_name, last_name, email, address_line1, address_line2,
+                    city, state, zip_code, sex, date_of_birth, enrollment_date, enrollment_status, updated_at
+                )
+                SELECT %(employer)s, 'Bench', 'Employee ' || i, 'bench-billing-' || i || '@example.invalid',
+                       '1 Bench St', '', 'Springfield', 'IL', '62701', 'F', DATE '1990-01-01',
+                       %(start)s, 'ACTIVE', NOW()
+                FROM generate_series(1, %(count)s) AS i
+            """, params)
+            cursor.execute(f"""
+                INSERT INTO {Enrollment._meta.db_table} (
+                    plan_id, employee_id, broker_id, status, start_date, end_date, created_at, updated_at
+                )
+                SELECT %(plan)s, id, NULL, %(active)s, %(start)s, NULL, NOW(), NOW()
+                FROM {Employee._meta.db_table} WHERE employer_id = %(employer)s
+            """, params)
+            cursor.execute(f"""
+                INSERT INTO {Dependent._meta.db_table} (
+                    employee_id, first_name, last_name, date_of_birth, sex, relationship,
+                    enrollment_date, enrollment_status, updated_at
+                )
+                SELECT id, 'Bench', 'Dependent', DATE '2015-01-01', 'M', 'CHILD', %(start)s, 'ACTIVE', NOW()
+                FROM {Employee._meta.db_table}
+                WHERE employer_id = %(employer)s AND id %% %(every)s = 0
+            """, params)
+            cursor.execute(f"""
+                INSERT INTO {DependentEnrollment._meta.db_table} (
+                    enrollment_id, dependent_id, start_date, end_date, created_at, updated_at
+                )
+                SELECT e.id, d.id, %(start)s, NULL, NOW(), NOW()
+                FROM {Dependent._meta.db_table} d
+                JOIN {Enrollment._meta.db_table} e ON e.employee_id = d.employee_id
+                WHERE e.plan_id = %(plan)s
+            """, params)
+        self.stdout.write(f'Seeded in {time.perf_counter() - start:.1f}s')
+        return plan
@@ -0,0 +1,38 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from enrollment.exports import TransactionExport, WRITERS
+
+
+class Command(BaseCommand):
+    help = "Export a billing month's transactions and details as columnar files with a manifest"
+
+    def add_arguments(self, parser):
+        parser.add_argument('period', help='YYYY-MM')
+        parser.add_argument('--output', default='.', help='Directory to write into')
+        parser.add_argument('--format', dest='file_format', choices=sorted(WRITERS), default='tcol')
+        parser.add_argument('--row-group-size', type=int, default=50_000)
+
+    def handle(self, *args, **options):
+        try:
+            period_start = parse_date(f"{options['period']}-01")
+        except ValueError:
+            period_start = None
+        if period_start is None:
+            raise CommandError('period must be YYYY-MM')
+        os.makedirs(options['output'], exist_ok=True)
+
+        export = TransactionExport(
+            period_start,
+            file_format=options['file_format'],
+            row_group_size=options['row_group_size']
+        )
+        manifest = export.write_directory(options['output'])
+        for entry in manifest['files']:
+            self.stdout.write(
+                f"{entry['name']}: {entry['rows']} rows in {entry['row_groups']} row groups, "
+                f"{entry['bytes']} bytes"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Export written to {options['output']}"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from enrollment import ledger
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the provider revenue ledger from Transaction rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='YYYY-MM-DD, first ledger day to include')
+        parser.add_argument('--end', help='YYYY-MM-DD, last ledger day to include')
+        parser.add_argument('--verify', action='store_true', help='Only report differences')
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for name in ('start', 'end'):
+            if options[name]:
+                bounds[name] = parse_date(options[name])
+                if bounds[name] is None:
+                    raise CommandError(f'--{name} must be YYYY-MM-DD')
+
+        if not options['verify']:
+            rows = ledger.rebuild(**bounds)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} ledger rows'))
+            return
+
+        differences = ledger.verify(**bounds)
+        for (provider_id, day, transaction_type), (actual, expected) in sorted(differences.items()):
+            self.stderr.write(f'{provider_id} {day} {transaction_type}: ledger {actual}, recomputed {expected}')
+        if differences:
+            raise CommandError(f'{len(differences)} ledger rows differ from a full recompute')
+        self.stdout.write(self.style.SUCCESS('Ledger matches a full recompute'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from enrollment.services import BillingRunService
+
+
+class Command(BaseCommand):
+    help = 'Generate provider payment transactions for a billing month; safe to rerun'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', help='YYYY-MM, defaults to the current month')
+
+    def handle(self, *args, **options):
+        period_start = timezone.now().date()
+        if options['period']:
+            period_start = parse_date(f"{options['period']}-01")
+            if period_start is None:
+                raise CommandError('--period must be YYYY-MM')
+
+        result = BillingRunService(period_start).run()
+        self.stdout.write(self.style.SUCCESS(
+            f"Billed {result['period_start']:%Y-%m}: {result['transactions_created']} transactions "
+            f"({result['dependent_lines']} dependent lines) totalling {result['total_amount']}"
+        ))
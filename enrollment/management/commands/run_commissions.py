@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from enrollment.services import BrokerCommissionService
+
+
+class Command(BaseCommand):
+    help = "Generate broker commission transactions for a billing month's provider payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', help='YYYY-MM, defaults to the current month')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        period_start = timezone.now().date()
+        if options['period']:
+            period_start = parse_date(f"{options['period']}-01")
+            if period_start is None:
+                raise CommandError('--period must be YYYY-MM')
+
+        result = BrokerCommissionService(period_start, batch_size=options['batch_size']).run()
+        for broker_id, (expected, written) in sorted(result['mismatches'].items()):
+            self.stderr.write(f'Broker {broker_id}: expected {expected}, written {written}')
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['period_start']:%Y-%m}: {result['commissions_created']} commissions "
+            f"totalling {result['total_amount']} on {result['payments']} provider payments"
+        ))
+        if result['mismatches']:
+            raise CommandError(f"{len(result['mismatches'])} brokers do not reconcile")
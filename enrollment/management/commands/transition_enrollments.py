@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from enrollment.models import Enrollment
+from enrollment.services import EnrollmentTransitionService, EnrollmentTransitionError
+
+
+class Command(BaseCommand):
+    help = 'Bulk move enrollments to a new status, e.g. at plan-year rollover'
+
+    def add_arguments(self, parser):
+        parser.add_argument('status', choices=Enrollment.Status.values)
+        parser.add_argument('--from-status', choices=Enrollment.Status.values)
+        parser.add_argument('--plan', type=int, help='Only enrollments in this plan')
+        parser.add_argument('--ids', type=int, nargs='+', help='Only these enrollments')
+        parser.add_argument('--effective-date', help='YYYY-MM-DD, defaults to today')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if not (options['ids'] or options['from_status'] or options['plan']):
+            raise CommandError('Provide --ids, --from-status or --plan to select enrollments')
+
+        effective_date = None
+        if options['effective_date']:
+            try:
+                effective_date = parse_date(options['effective_date'])
+            except ValueError:
+                effective_date = None
+            if effective_date is None:
+                raise CommandError('--effective-date must be YYYY-MM-DD')
+
+        queryset = Enrollment.objects.all()
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+        if options['from_status']:
+            queryset = queryset.filter(status=options['from_status'])
+        if options['plan']:
+            queryset = queryset.filter(plan_id=options['plan'])
+
+        try:
+            service = EnrollmentTransitionService(
+                options['status'],
+                effective_date=effective_date,
+                batch_size=options['batch_size']
+            )
+        except EnrollmentTransitionError as e:
+            raise CommandError(str(e))
+
+        result = service.transition(queryset, dry_run=options['dry_run'])
+        prefix = 'Would transition' if options['dry_run'] else 'Transitioned'
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {result['transitioned']} enrollments to {options['status']}; "
+            f"{result['dependents_ended']} dependent enrollments ended, "
+            f"{result['dependents_reopened']} reopened; "
+            f"{len(result['skipped'])} skipped"
+        ))
@@ -1,5 +1,6 @@
 from django.db import models
 from accounts.models import Provider, Employee, Dependent, Broker
+from core.ranges import CoverageQuerySet, coverage_exclusion, coverage_field, coverage_index
 
 class ProviderPlan(models.Model):
     """Membership plans offered by providers"""
@@ -30,6 +31,15 @@ class Enrollment(models.Model):
         INACTIVE = 'INACTIVE', 'Inactive'
         CANCELLED = 'CANCELLED', 'Cancelled'
 
+    # Allowed status changes: target -> statuses it can be reached from
+    TRANSITIONS = {
+        Status.ACTIVE: [Status.PENDING, Status.INACTIVE],
+        Status.INACTIVE: [Status.ACTIVE],
+        Status.CANCELLED: [Status.PENDING, Status.ACTIVE, Status.INACTIVE],
+    }
+    # Statuses that end coverage for the enrollment and its dependents
+    TERMINAL_STATUSES = [Status.INACTIVE, Status.CANCELLED]
+
     plan = models.ForeignKey(
         ProviderPlan,
         on_delete=models.PROTECT,
@@ -54,12 +64,26 @@ class Enrollment(models.Model):
     )
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
+    coverage = coverage_field()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CoverageQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.employee.full_name} - {self.plan.name}"
 
+    class Meta:
+        indexes = [
+            coverage_index('enrollment_coverage_gist'),
+        ]
+        constraints = [
+            coverage_exclusion(
+                'enrollment_no_overlapping_coverage', 'employee',
+                condition=~models.Q(status='CANCELLED')
+            ),
+        ]
+
 class DependentEnrollment(models.Model):
     """Tracks dependents enrolled under an employee's plan"""
     enrollment = models.ForeignKey(
@@ -74,14 +98,23 @@ class DependentEnrollment(models.Model):
     )
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
+    coverage = coverage_field()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CoverageQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.dependent.full_name} - {self.enrollment.plan.name}"
 
     class Meta:
         unique_together = ['enrollment', 'dependent']
+        indexes = [
+            coverage_index('dep_enrollment_coverage_gist'),
+        ]
+        constraints = [
+            coverage_exclusion('dependent_enrollment_no_overlapping_coverage', 'dependent'),
+        ]
 
 class Transaction(models.Model):
     """Tracks all financial transactions for enrollments"""
@@ -167,3 +200,60 @@ class TransactionDetail(models.Model):
 
     def __str__(self):
         return f"{self.transaction.reference_id} - {self.description}"
+
+class BrokerCommissionRate(models.Model):
+    """Commission rate schedule for a broker, optionally for a single plan"""
+    broker = models.ForeignKey(
+        Broker,
+        on_delete=models.CASCADE,
+        related_name='commission_rates'
+    )
+    plan = models.ForeignKey(
+        ProviderPlan,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='commission_rates',
+        help_text="Leave blank for the broker's rate on every plan"
+    )
+    rate = models.DecimalField(
+        max_digits=5,
+        decimal_places=4,
+        help_text="Fraction of the provider payment, e.g. 0.0500 for 5%"
+    )
+    effective_date = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.broker} - {self.rate} from {self.effective_date}"
+
+    class Meta:
+        unique_together = ['broker', 'plan', 'effective_date']
+
+class ProviderRevenueLedger(models.Model):
+    """Daily revenue per provider and transaction type, kept current by enrollment.ledger"""
+    provider = models.ForeignKey(
+        Provider,
+        on_delete=models.CASCADE,
+        related_name='revenue_ledger'
+    )
+    day = models.DateField(help_text="Billing period start of the transactions")
+    transaction_type = models.CharField(
+        max_length=20,
+        choices=Transaction.TransactionType.choices
+    )
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    refunds = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    completed_count = models.IntegerField(default=0)
+    refunded_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.provider_id} {self.day} {self.transaction_type}: {self.revenue}"
+
+    class Meta:
+        unique_together = ['provider', 'day', 'transaction_type']
+        indexes = [
+            models.Index(fields=['day', 'provider']),
+        ]
@@ -6,6 +6,7 @@ from .models import (
     Transaction,
     TransactionDetail
 )
+from core.serializers import CompiledSerializer
 from accounts.serializers import (
     ProviderSerializer,
     EmployeeSerializer,
@@ -50,6 +51,24 @@ class DependentEnrollmentSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+class ProviderPlanFlatSerializer(serializers.ModelSerializer):
+    """Plan with its provider as an ID, for normalized responses"""
+    class Meta:
+        model = ProviderPlan
+        fields = ProviderPlanSerializer.Meta.fields
+
+class EnrollmentFlatSerializer(serializers.ModelSerializer):
+    """Enrollment with related rows as IDs, for normalized responses"""
+    class Meta:
+        model = Enrollment
+        fields = EnrollmentSerializer.Meta.fields
+
+class DependentEnrollmentFlatSerializer(serializers.ModelSerializer):
+    """Dependent enrollment with related rows as IDs, for normalized responses"""
+    class Meta:
+        model = DependentEnrollment
+        fields = DependentEnrollmentSerializer.Meta.fields
+
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
@@ -61,6 +80,10 @@ class TransactionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
+class TransactionCompiledSerializer(CompiledSerializer):
+    """Read-only fast path for transaction lists"""
+    serializer_class = TransactionSerializer
+
 class TransactionDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = TransactionDetail
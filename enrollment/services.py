@@ -0,0 +1,460 @@
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, F, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+from django.utils import timezone
+
+from accounts.models import EmployeeMembership, DependentMembership
+from audit.services import AuditService
+from . import commissions
+from .models import (
+    ProviderPlan,
+    Enrollment,
+    DependentEnrollment,
+    Transaction,
+    TransactionDetail,
+    BrokerCommissionRate
+)
+
+
+def month_bounds(day):
+    """First and last day of the month containing ``day``"""
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+class EnrollmentTransitionError(ValueError):
+    """Raised for a status change the enrollment state machine does not allow"""
+
+
+class EnrollmentTransitionService:
+    """
+    Set-based enrollment status changes.
+
+    Enrollments are processed in batches of ``batch_size`` ids. Each batch runs
+    in its own transaction: the eligible rows are locked, moved with a single
+    UPDATE filtered on the statuses ``Enrollment.TRANSITIONS`` allows, and, for
+    terminal statuses, their open dependent enrollments are end-dated with one
+    more UPDATE. End dates are never set before a row's start date, so
+    cancelling an enrollment that has not started yet ends it on its start.
+    Reactivating an ended enrollment clears its end date and reopens the
+    dependent enrollments that ended with it. Audit entries for the batch are
+    written with one INSERT.
+    """
+
+    def __init__(self, status, effective_date=None, user=None, request=None, batch_size=1000):
+        if status not in Enrollment.TRANSITIONS:
+            raise EnrollmentTransitionError(f"Enrollments cannot be moved to '{status}'")
+        self.status = status
+        self.sources = Enrollment.TRANSITIONS[status]
+        self.effective_date = effective_date or timezone.now().date()
+        self.user = user
+        self.request = request
+        self.batch_size = batch_size
+
+    def transition(self, queryset, dry_run=False):
+        """Move every eligible enrollment in ``queryset``; returns counts and skipped ids"""
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+        result = {'transitioned': 0, 'dependents_ended': 0, 'dependents_reopened': 0, 'skipped': []}
+        for start in range(0, len(ids), self.batch_size):
+            batch = ids[start:start + self.batch_size]
+            if dry_run:
+                eligible = set(
+                    Enrollment.objects.filter(pk__in=batch, status__in=self.sources)
+                    .values_list('pk', flat=True)
+                )
+                result['transitioned'] += len(eligible)
+            else:
+                eligible, dependents_ended, dependents_reopened = self._transition_batch(batch)
+                result['transitioned'] += len(eligible)
+                result['dependents_ended'] += dependents_ended
+                result['dependents_reopened'] += dependents_reopened
+            result['skipped'].extend(pk for pk in batch if pk not in eligible)
+        return result
+
+    @transaction.atomic
+    def _transition_batch(self, batch):
+        previous = dict(
+            Enrollment.objects.select_for_update()
+            .filter(pk__in=batch, status__in=self.sources)
+            .values_list('pk', 'status')
+        )
+        if not previous:
+            return previous, 0, 0
+
+        now = timezone.now()
+        # Coverage ranges are [start_date, end_date]: never end before the start
+        ends = Greatest(F('start_date'), Value(self.effective_date))
+        terminal = self.status in Enrollment.TERMINAL_STATUSES
+        dependents_ended = dependents_reopened = 0
+        if terminal:
+            Enrollment.objects.filter(pk__in=previous).update(
+                status=self.status, end_date=Coalesce(F('end_date'), ends), updated_at=now
+            )
+            dependents_ended = DependentEnrollment.objects.filter(
+                enrollment_id__in=previous,
+                end_date__isnull=True
+            ).update(end_date=ends, updated_at=now)
+        else:
+            reopened = [pk for pk, status in previous.items() if status in Enrollment.TERMINAL_STATUSES]
+            if reopened:
+                # Dependents that ended with the enrollment, before its end is cleared
+                dependents_reopened = DependentEnrollment.objects.filter(
+                    enrollment_id__in=reopened,
+                    end_date=F('enrollment__end_date')
+                ).update(end_date=None, updated_at=now)
+                Enrollment.objects.filter(pk__in=reopened).update(end_date=None)
+            Enrollment.objects.filter(pk__in=previous).update(status=self.status, updated_at=now)
+
+        AuditService.log_actions_bulk(
+            user=self.user,
+            action='UPDATE',
+            objects=[Enrollment(pk=pk) for pk in previous],
+            request=self.request,
+            details={
+                'status': self.status,
+                'effective_date': self.effective_date.isoformat(),
+                'bulk_transition': True,
+            },
+            object_details={pk: {'previous_status': status} for pk, status in previous.items()}
+        )
+        return previous, dependents_ended, dependents_reopened
+
+
+class BillingRunService:
+    """
+    Monthly provider billing in a handful of set-based statements.
+
+    For one billing period it inserts a provider payment ``Transaction`` for
+    every ACTIVE enrollment whose coverage overlaps the period, itemises it in
+    ``TransactionDetail`` (one line for the member, one per covered dependent)
+    and sets each transaction's amount to the sum of its lines. Everything runs
+    as INSERT ... SELECT inside one transaction, so no rows pass through Python.
+
+    Reference ids are deterministic (``PRV-<YYYYMM>-<enrollment id>``) and
+    conflicting inserts are ignored, so rerunning a period only bills
+    enrollments that were missed before.
+    """
+    REFERENCE_PREFIX = 'PRV'
+
+    def __init__(self, period_start):
+        self.period_start, self.period_end = month_bounds(period_start)
+
+    @property
+    def reference_prefix(self):
+        return f'{self.REFERENCE_PREFIX}-{self.period_start:%Y%m}-'
+
+    def _tables(self):
+        return {
+            'plan': ProviderPlan._meta.db_table,
+            'enrollment': Enrollment._meta.db_table,
+            'dependent_enrollment': DependentEnrollment._meta.db_table,
+            'transaction': Transaction._meta.db_table,
+            'detail': TransactionDetail._meta.db_table,
+        }
+
+    @transaction.atomic
+    def run(self):
+        """Bill the period; returns what this run created"""
+        run_at = timezone.now()
+        params = {
+            'start': self.period_start,
+            'end': self.period_end,
+            'prefix': self.reference_prefix,
+            'run_at': run_at,
+            'active': Enrollment.Status.ACTIVE,
+            'provider_payment': Transaction.TransactionType.PROVIDER_PAYMENT,
+            'pending': Transaction.Status.PENDING,
+            'member_line': 'Member monthly membership',
+            'dependent_line': 'Dependent monthly membership',
+        }
+        tables = self._tables()
+
+        with connection.cursor() as cursor:
+            # 1. One pending provider payment per covered enrollment
+            cursor.execute(f"""
+                INSERT INTO {tables['transaction']} (
+                    enrollment_id, transaction_type, amount, status,
+                    billing_period_start, billing_period_end, provider_id, broker_id,
+                    reference_id, notes, created_at, updated_at
+                )
+                SELECT e.id, %(provider_payment)s, 0, %(pending)s,
+                       %(start)s, %(end)s, p.provider_id, NULL,
+                       %(prefix)s || e.id, '', %(run_at)s, %(run_at)s
+                FROM {tables['enrollment']} e
+                JOIN {tables['plan']} p ON p.id = e.plan_id
+                WHERE e.status = %(active)s
+                  AND e.start_date <= %(end)s
+                  AND (e.end_date IS NULL OR e.end_date >= %(start)s)
+                ON CONFLICT (reference_id) DO NOTHING
+            """, params)
+            created = cursor.rowcount
+
+            # 2. Member line for every transaction created above
+            cursor.execute(f"""
+                INSERT INTO {tables['detail']} (
+                    transaction_id, description, amount, dependent_enrollment_id, created_at
+                )
+                SELECT t.id, %(member_line)s, p.monthly_amount, NULL, %(run_at)s
+                FROM {tables['transaction']} t
+                JOIN {tables['enrollment']} e ON e.id = t.enrollment_id
+                JOIN {tables['plan']} p ON p.id = e.plan_id
+                WHERE t.created_at = %(run_at)s
+                  AND t.billing_period_start = %(start)s
+                  AND t.transaction_type = %(provider_payment)s
+            """, params)
+
+            # 3. One line per dependent covered during the period
+            cursor.execute(f"""
+                INSERT INTO {tables['detail']} (
+                    transaction_id, description, amount, dependent_enrollment_id, created_at
+                )
+                SELECT t.id, %(dependent_line)s, p.monthly_amount, d.id, %(run_at)s
+                FROM {tables['transaction']} t
+                JOIN {tables['enrollment']} e ON e.id = t.enrollment_id
+                JOIN {tables['plan']} p ON p.id = e.plan_id
+                JOIN {tables['dependent_enrollment']} d ON d.enrollment_id = e.id
+                WHERE t.created_at = %(run_at)s
+                  AND t.billing_period_start = %(start)s
+                  AND t.transaction_type = %(provider_payment)s
+                  AND d.start_date <= %(end)s
+                  AND (d.end_date IS NULL OR d.end_date >= %(start)s)
+            """, params)
+            dependent_lines = cursor.rowcount
+
+            # 4. Transaction amount is the sum of its lines
+            cursor.execute(f"""
+                UPDATE {tables['transaction']} AS t
+                SET amount = lines.total
+                FROM (
+                    SELECT transaction_id, SUM(amount) AS total
+                    FROM {tables['detail']}
+                    WHERE created_at = %(run_at)s
+                    GROUP BY transaction_id
+                ) lines
+                WHERE t.id = lines.transaction_id
+                  AND t.created_at = %(run_at)s
+            """, params)
+
+            cursor.execute(f"""
+                SELECT COALESCE(SUM(amount), 0)
+                FROM {tables['transaction']}
+                WHERE created_at = %(run_at)s
+                  AND billing_period_start = %(start)s
+                  AND transaction_type = %(provider_payment)s
+            """, params)
+            total = cursor.fetchone()[0]
+
+        return {
+            'period_start': self.period_start,
+            'period_end': self.period_end,
+            'transactions_created': created,
+            'dependent_lines': dependent_lines,
+            'total_amount': total,
+        }
+
+
+class BrokerCommissionService:
+    """
+    Broker commissions on a billing period's provider payments.
+
+    Payments on brokered enrollments are loaded as columns (payment id,
+    broker, plan, amount in cents), rates are resolved from each broker's
+    ``BrokerCommissionRate`` schedule in effect at the start of the period and
+    commissions are computed with integer column arithmetic in
+    ``enrollment.commissions`` (NumPy when installed). Each broker's total is
+    rounded half up to the cent once and split across payments so the written
+    rows add up to it exactly. Rows are inserted under deterministic
+    ``BRK-<YYYYMM>-<payment id>`` references with ``ON CONFLICT DO NOTHING
+    RETURNING``, so reruns are idempotent and the report counts only the rows
+    this run actually wrote.
+    """
+    REFERENCE_PREFIX = 'BRK'
+    COLUMNS = (
+        'enrollment_id', 'transaction_type', 'amount', 'status',
+        'billing_period_start', 'billing_period_end', 'provider_id', 'broker_id',
+        'reference_id', 'notes', 'created_at', 'updated_at',
+    )
+    EXCLUDED_STATUSES = [Transaction.Status.FAILED, Transaction.Status.REFUNDED]
+
+    def __init__(self, period_start, batch_size=5000):
+        self.period_start, self.period_end = month_bounds(period_start)
+        self.batch_size = batch_size
+
+    @property
+    def reference_prefix(self):
+        return f'{self.REFERENCE_PREFIX}-{self.period_start:%Y%m}-'
+
+    def payments(self):
+        """Commissionable provider payments as columns"""
+        rows = Transaction.objects.filter(
+            transaction_type=Transaction.TransactionType.PROVIDER_PAYMENT,
+            billing_period_start=self.period_start,
+            enrollment__broker__isnull=False
+        ).exclude(
+            status__in=self.EXCLUDED_STATUSES
+        ).annotate(
+            cents=Cast(F('amount') * 100, BigIntegerField())
+        ).order_by('pk').values_list(
+            'pk', 'enrollment_id', 'enrollment__broker_id', 'enrollment__plan_id',
+            'cents', 'reference_id'
+        ).iterator(chunk_size=self.batch_size)
+        columns = list(zip(*rows)) or [()] * 6
+        return dict(zip(['ids', 'enrollments', 'brokers', 'plans', 'cents', 'references'], columns))
+
+    def schedule(self):
+        """``(broker rates, (broker, plan) rates, fallback)`` in 1/10000ths"""
+        default_rates, plan_rates = {}, {}
+        rates = BrokerCommissionRate.objects.filter(
+            effective_date__lte=self.period_start
+        ).order_by('effective_date').values_list('broker_id', 'plan_id', 'rate')
+        for broker, plan, rate in rates:
+            # Later effective dates overwrite earlier ones
+            units = int(rate * commissions.RATE_SCALE)
+            if plan is None:
+                default_rates[broker] = units
+            else:
+                plan_rates[broker, plan] = units
+        fallback = int(Decimal(settings.BROKER_COMMISSION_DEFAULT_RATE) * commissions.RATE_SCALE)
+        return default_rates, plan_rates, fallback
+
+    def compute(self):
+        """Per-payment commission cents, rates and per-broker totals"""
+        payments = self.payments()
+        rates = commissions.lookup_rates(payments['brokers'], payments['plans'], *self.schedule())
+        row_cents, totals = commissions.allocate(
+            payments['ids'], payments['brokers'], payments['cents'], rates
+        )
+        return payments, rates, row_cents, totals
+
+    def run(self):
+        """Write missing commission rows for the period; returns counts and reconciliation"""
+        payments, rates, row_cents, totals = self.compute()
+        existing = set(
+            Transaction.objects.filter(reference_id__startswith=self.reference_prefix)
+            .values_list('reference_id', flat=True)
+        )
+
+        run_at = timezone.now()
+        to_create = []
+        for payment_id, enrollment_id, broker_id, reference, rate, cents in zip(
+            payments['ids'], payments['enrollments'], payments['brokers'],
+            payments['references'], rates, row_cents
+        ):
+            reference_id = f'{self.reference_prefix}{payment_id}'
+            if cents <= 0 or reference_id in existing:
+                continue
+            to_create.append((
+                enrollment_id, Transaction.TransactionType.BROKER_COMMISSION, Decimal(cents).scaleb(-2),
+                Transaction.Status.PENDING, self.period_start, self.period_end, None, broker_id,
+                reference_id, f'{Decimal(rate).scaleb(-4)} of {reference}', run_at, run_at
+            ))
+
+        # A concurrent run may insert some of the same references; RETURNING
+        # reports only the rows this statement wrote
+        created, total_amount = 0, Decimal('0')
+        row = '(' + ', '.join(['%s'] * len(self.COLUMNS)) + ')'
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(to_create), self.batch_size):
+                batch = to_create[start:start + self.batch_size]
+                cursor.execute(f"""
+                    INSERT INTO {Transaction._meta.db_table} ({', '.join(self.COLUMNS)})
+                    VALUES {', '.join([row] * len(batch))}
+                    ON CONFLICT (reference_id) DO NOTHING
+                    RETURNING id, amount
+                """, [value for values in batch for value in values])
+                for _, amount in cursor.fetchall():
+                    created += 1
+                    total_amount += amount
+
+        return {
+            'period_start': self.period_start,
+            'period_end': self.period_end,
+            'payments': len(payments['ids']),
+            'commissions_created': created,
+            'total_amount': total_amount,
+            'mismatches': self.reconcile(totals),
+        }
+
+    def reconcile(self, totals=None):
+        """
+        Brokers whose written commissions differ from their expected total.
+
+        Expected totals are the exact sums of amount * rate rounded half up to
+        the cent with ``Decimal``; returns ``{broker_id: (expected, written)}``.
+        """
+        if totals is None:
+            totals = self.compute()[3]
+        written = dict(
+            Transaction.objects.filter(
+                transaction_type=Transaction.TransactionType.BROKER_COMMISSION,
+                reference_id__startswith=self.reference_prefix
+            ).values_list('broker_id').annotate(total=Sum('amount'))
+        )
+        mismatches = {}
+        for broker_id in totals.keys() | written.keys():
+            exact = totals.get(broker_id, (0, 0))[0]
+            expected = Decimal(exact).scaleb(-6).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            actual = written.get(broker_id) or Decimal('0.00')
+            if expected != actual:
+                mismatches[broker_id] = (expected, actual)
+        return mismatches
+
+
+class CoverageSnapshot:
+    """
+    Who was covered on ``day``, optionally for one provider and/or employer.
+
+    Every lookup is an as-of query on a ``coverage`` daterange column, so it is
+    answered by that table's GiST index however much history there is.
+    """
+
+    def __init__(self, day, provider=None, employer=None):
+        self.day = day
+        self.provider = provider
+        self.employer = employer
+
+    def enrollments(self):
+        queryset = Enrollment.objects.as_of(self.day).exclude(status=Enrollment.Status.CANCELLED)
+        if self.provider:
+            queryset = queryset.filter(plan__provider_id=self.provider)
+        if self.employer:
+            queryset = queryset.filter(employee__employer_id=self.employer)
+        return queryset
+
+    def dependent_enrollments(self):
+        return DependentEnrollment.objects.as_of(self.day).filter(
+            enrollment__in=self.enrollments()
+        )
+
+    def employee_memberships(self):
+        queryset = EmployeeMembership.objects.as_of(self.day).filter(is_active=True)
+        if self.provider:
+            queryset = queryset.filter(provider_id=self.provider)
+        if self.employer:
+            queryset = queryset.filter(employee__employer_id=self.employer)
+        return queryset
+
+    def dependent_memberships(self):
+        queryset = DependentMembership.objects.as_of(self.day).filter(is_active=True)
+        if self.provider:
+            queryset = queryset.filter(provider_id=self.provider)
+        if self.employer:
+            queryset = queryset.filter(dependent__employee__employer_id=self.employer)
+        return queryset
+
+    def summary(self):
+        return {
+            'date': self.day,
+            'employees': list(self.enrollments().values(
+                'employee_id', 'employee__first_name', 'employee__last_name', 'plan_id'
+            ).order_by('employee_id')),
+            'dependents': list(self.dependent_enrollments().values(
+                'dependent_id', 'dependent__first_name', 'dependent__last_name', 'enrollment_id'
+            ).order_by('dependent_id')),
+            'employee_memberships': self.employee_memberships().count(),
+            'dependent_memberships': self.dependent_memberships().count(),
+        }
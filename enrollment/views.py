@@ -1,24 +1,90 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from .models import (
     ProviderPlan,
     Enrollment,
     DependentEnrollment,
     Transaction,
-    TransactionDetail
+    TransactionDetail,
+    ProviderRevenueLedger
 )
 from .serializers import (
     ProviderPlanSerializer,
     EnrollmentSerializer,
     DependentEnrollmentSerializer,
     TransactionSerializer,
-    TransactionDetailSerializer
+    TransactionCompiledSerializer,
+    TransactionDetailSerializer,
+    ProviderPlanFlatSerializer,
+    EnrollmentFlatSerializer,
+    DependentEnrollmentFlatSerializer
 )
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from accounts.models import (
+    Provider,
+    ProviderMembershipTier,
+    ProviderOperatingHours,
+    User
+)
+from accounts.permissions import IsAdmin
+from accounts.serializers import (
+    ProviderSerializer,
+    EmployeeSerializer,
+    DependentSerializer,
+    BrokerSerializer
+)
+from core.cache import cache_response
+from core.mixins import CompiledListMixin, ConditionalGetMixin, NormalizedListMixin
+from .exports import TransactionExport, WRITERS as EXPORT_WRITERS
+from .services import (
+    CoverageSnapshot,
+    EnrollmentTransitionService,
+    EnrollmentTransitionError
+)
+
+
+def parse_date_param(value):
+    """``parse_date`` that also gives None for impossible dates such as 2024-02-30"""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
 
-class ProviderPlanViewSet(viewsets.ModelViewSet):
+def as_of_param(request):
+    """The ``as_of`` query parameter as a date (None when absent); a malformed one is a 400"""
+    value = request.query_params.get('as_of')
+    if not value:
+        return None
+    as_of = parse_date_param(value)
+    if as_of is None:
+        raise ValidationError({"error": "as_of must be YYYY-MM-DD"})
+    return as_of
+
+# Timestamps of every row the nested serializers render, relative to that object
+PROVIDER_VERSION = ('updated_at', 'user__updated_at', 'operating_hours__updated_at', 'membership_tiers__updated_at')
+PLAN_VERSION = ('updated_at', *(f'provider__{field}' for field in PROVIDER_VERSION))
+MEMBERSHIPS_VERSION = (
+    'memberships__updated_at', 'memberships__membership_tier__updated_at', 'memberships__provider__updated_at',
+)
+EMPLOYEE_VERSION = ('updated_at', 'user__updated_at', 'employer__updated_at', *MEMBERSHIPS_VERSION)
+BROKER_VERSION = ('updated_at', 'user__updated_at')
+DEPENDENT_VERSION = ('updated_at', *MEMBERSHIPS_VERSION)
+ENROLLMENT_VERSION = (
+    'updated_at',
+    *(f'plan__{field}' for field in PLAN_VERSION),
+    *(f'employee__{field}' for field in EMPLOYEE_VERSION),
+    *(f'broker__{field}' for field in BROKER_VERSION),
+)
+
+class ProviderPlanViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = ProviderPlan.objects.all()
     serializer_class = ProviderPlanSerializer
+    conditional_fields = PLAN_VERSION
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -28,6 +94,13 @@ class ProviderPlanViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(provider_id=provider_id)
         return queryset
 
+    @cache_response(
+        ProviderPlan, Provider, User,
+        ProviderOperatingHours, ProviderMembershipTier
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(detail=True, methods=['get'])
     def enrollments(self, request, pk=None):
         """Get all enrollments for a specific plan"""
@@ -36,9 +109,25 @@ class ProviderPlanViewSet(viewsets.ModelViewSet):
         serializer = EnrollmentSerializer(enrollments, many=True)
         return Response(serializer.data)
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+# Prefetches the nested account serializers need, relative to the included row
+PROVIDER_PREFETCH = ('user', 'operating_hours', 'membership_tiers')
+EMPLOYEE_PREFETCH = (
+    'user', 'employer__contact_person', 'memberships__membership_tier', 'memberships__provider'
+)
+BROKER_PREFETCH = ('user',)
+DEPENDENT_PREFETCH = ('memberships__membership_tier', 'memberships__provider')
+
+class EnrollmentViewSet(ConditionalGetMixin, NormalizedListMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
+    normalized_serializer_class = EnrollmentFlatSerializer
+    normalized_includes = {
+        'plans': ('plan', ProviderPlanFlatSerializer, ()),
+        'providers': ('plan__provider', ProviderSerializer, PROVIDER_PREFETCH),
+        'employees': ('employee', EmployeeSerializer, EMPLOYEE_PREFETCH),
+        'brokers': ('broker', BrokerSerializer, BROKER_PREFETCH),
+    }
+    conditional_fields = ENROLLMENT_VERSION
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -46,8 +135,92 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
         employee_id = self.request.query_params.get('employee', None)
         if employee_id:
             queryset = queryset.filter(employee_id=employee_id)
+        as_of = as_of_param(self.request)
+        if as_of:
+            queryset = queryset.as_of(as_of)
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def coverage(self, request):
+        """Employees and dependents covered on a date, by provider and/or employer"""
+        day = parse_date_param(request.query_params.get('date'))
+        if day is None:
+            return Response(
+                {"error": "date must be YYYY-MM-DD"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        filters = {}
+        for name in ('provider', 'employer'):
+            value = request.query_params.get(name)
+            if not value:
+                continue
+            try:
+                filters[name] = int(value)
+            except ValueError:
+                return Response(
+                    {"error": f"{name} must be an integer id"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        snapshot = CoverageSnapshot(day, **filters)
+        return Response(snapshot.summary())
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdmin])
+    def bulk_transition(self, request):
+        """Move many enrollments to a new status in set-based batches"""
+        ids = request.data.get('ids')
+        from_status = request.data.get('from_status')
+        plan_id = request.data.get('plan')
+        effective_date = request.data.get('effective_date')
+        if effective_date:
+            effective_date = parse_date_param(effective_date)
+            if effective_date is None:
+                return Response(
+                    {"error": "effective_date must be YYYY-MM-DD"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        if ids is not None and not (
+            isinstance(ids, list) and all(type(pk) is int for pk in ids)
+        ):
+            return Response(
+                {"error": "ids must be a list of integer ids"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if plan_id is not None:
+            try:
+                plan_id = int(plan_id)
+            except (TypeError, ValueError):
+                return Response(
+                    {"error": "plan must be an integer id"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        if not (ids or from_status or plan_id):
+            return Response(
+                {"error": "Provide ids, from_status or plan to select enrollments"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.get_queryset()
+        if ids:
+            queryset = queryset.filter(pk__in=ids)
+        if from_status:
+            queryset = queryset.filter(status=from_status)
+        if plan_id is not None:
+            queryset = queryset.filter(plan_id=plan_id)
+
+        try:
+            service = EnrollmentTransitionService(
+                request.data.get('status'),
+                effective_date=effective_date,
+                user=request.user,
+                request=request
+            )
+        except EnrollmentTransitionError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(service.transition(
+            queryset,
+            dry_run=str(request.data.get('dry_run', '')).lower() == 'true'
+        ))
+
     @action(detail=True, methods=['post'])
     def add_dependent(self, request, pk=None):
         """Add a dependent to an enrollment"""
@@ -80,9 +253,23 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-class DependentEnrollmentViewSet(viewsets.ModelViewSet):
+class DependentEnrollmentViewSet(ConditionalGetMixin, NormalizedListMixin, viewsets.ModelViewSet):
     queryset = DependentEnrollment.objects.all()
     serializer_class = DependentEnrollmentSerializer
+    normalized_serializer_class = DependentEnrollmentFlatSerializer
+    normalized_includes = {
+        'enrollments': ('enrollment', EnrollmentFlatSerializer, ()),
+        'dependents': ('dependent', DependentSerializer, DEPENDENT_PREFETCH),
+        'plans': ('enrollment__plan', ProviderPlanFlatSerializer, ()),
+        'providers': ('enrollment__plan__provider', ProviderSerializer, PROVIDER_PREFETCH),
+        'employees': ('enrollment__employee', EmployeeSerializer, EMPLOYEE_PREFETCH),
+        'brokers': ('enrollment__broker', BrokerSerializer, BROKER_PREFETCH),
+    }
+    conditional_fields = (
+        'updated_at',
+        *(f'enrollment__{field}' for field in ENROLLMENT_VERSION),
+        *(f'dependent__{field}' for field in DEPENDENT_VERSION),
+    )
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -90,11 +277,15 @@ class DependentEnrollmentViewSet(viewsets.ModelViewSet):
         enrollment_id = self.request.query_params.get('enrollment', None)
         if enrollment_id:
             queryset = queryset.filter(enrollment_id=enrollment_id)
+        as_of = as_of_param(self.request)
+        if as_of:
+            queryset = queryset.as_of(as_of)
         return queryset
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ConditionalGetMixin, CompiledListMixin, viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    compiled_serializer_class = TransactionCompiledSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
@@ -104,21 +295,84 @@ class TransactionViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(enrollment_id=enrollment_id)
         return queryset
 
+    REVENUE_BREAKDOWNS = {'provider': 'provider_id', 'type': 'transaction_type', 'day': 'day'}
+
     @action(detail=False, methods=['get'])
     def provider_revenue(self, request):
-        """Get total revenue for providers within a date range"""
-        start_date = request.query_params.get('start_date')
-        end_date = request.query_params.get('end_date')
-        
-        revenue = Transaction.objects.filter(
-            transaction_type=Transaction.TransactionType.PROVIDER_PAYMENT,
-            status=Transaction.Status.COMPLETED,
-            billing_period_start__gte=start_date,
-            billing_period_end__lte=end_date
-        ).aggregate(total_revenue=models.Sum('amount'))
-        
+        """Get total revenue for providers within a date range, from the daily revenue ledger"""
+        queryset = ProviderRevenueLedger.objects.all()
+        for param, lookup in (('start_date', 'day__gte'), ('end_date', 'day__lte')):
+            value = request.query_params.get(param)
+            if value:
+                parsed = parse_date_param(value)
+                if parsed is None:
+                    return Response(
+                        {'error': f'{param} must be YYYY-MM-DD'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                queryset = queryset.filter(**{lookup: parsed})
+
+        transaction_type = request.query_params.get(
+            'transaction_type', Transaction.TransactionType.PROVIDER_PAYMENT
+        )
+        if transaction_type != 'all':
+            queryset = queryset.filter(transaction_type=transaction_type)
+        provider_id = request.query_params.get('provider')
+        if provider_id:
+            try:
+                queryset = queryset.filter(provider_id=int(provider_id))
+            except ValueError:
+                return Response(
+                    {'error': 'provider must be an integer id'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        breakdown = [name for name in request.query_params.get('breakdown', '').split(',') if name]
+        unknown = set(breakdown) - self.REVENUE_BREAKDOWNS.keys()
+        if unknown:
+            return Response(
+                {'error': f"Unknown breakdown: {', '.join(sorted(unknown))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        totals = {
+            'total_revenue': Sum('revenue', default=0),
+            'total_refunds': Sum('refunds', default=0),
+            'completed_count': Sum('completed_count', default=0),
+            'refunded_count': Sum('refunded_count', default=0),
+        }
+        revenue = queryset.aggregate(**totals)
+        if breakdown:
+            fields = [self.REVENUE_BREAKDOWNS[name] for name in breakdown]
+            revenue['breakdown'] = [
+                {name: row.pop(field) for name, field in zip(breakdown, fields)} | row
+                for row in queryset.values(*fields).annotate(**totals).order_by(*fields)
+            ]
         return Response(revenue)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdmin])
+    def export(self, request):
+        """Stream a billing month's transactions and details as a zip with a manifest"""
+        period_start = parse_date_param(f"{request.query_params.get('period', '')}-01")
+        if period_start is None:
+            return Response(
+                {"error": "period must be YYYY-MM"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        file_format = request.query_params.get('file_format', 'tcol')
+        if file_format not in EXPORT_WRITERS:
+            return Response(
+                {"error": f"file_format must be one of {', '.join(sorted(EXPORT_WRITERS))}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        export = TransactionExport(period_start, file_format=file_format)
+        response = StreamingHttpResponse(export.stream_zip(), content_type='application/zip')
+        response['Content-Disposition'] = (
+            f'attachment; filename="transactions-{period_start:%Y-%m}-{file_format}.zip"'
+        )
+        return response
+
 class TransactionDetailViewSet(viewsets.ModelViewSet):
     queryset = TransactionDetail.objects.all()
     serializer_class = TransactionDetailSerializer
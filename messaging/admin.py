@@ -1,4 +1,5 @@
 from django.contrib import admin
-from .models import Message
+from .models import Message, UnreadCounter
 
-admin.site.register(Message) 
\ No newline at end of file
+admin.site.register(Message)
+admin.site.register(UnreadCounter)
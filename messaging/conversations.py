@@ -0,0 +1,172 @@
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import Conversation, Message
+
+# messages, unread by user_low, unread by user_high
+ZERO = (0, 0, 0)
+
+
+def pair(user_a, user_b):
+    """The ``(user_low, user_high)`` key of a conversation"""
+    return (user_a, user_b) if user_a <= user_b else (user_b, user_a)
+
+
+def contribution(sender_id, recipient_id, is_read):
+    """``(pair, (messages, unread_low, unread_high))`` that one message adds"""
+    key = pair(sender_id, recipient_id)
+    if is_read:
+        return key, (1, 0, 0)
+    return key, (1, 1, 0) if recipient_id == key[0] else (1, 0, 1)
+
+
+def apply_deltas(deltas, latest=None):
+    """
+    Add ``{pair: (messages, unread_low, unread_high)}`` to the conversations.
+
+    ``latest`` maps pairs to their newest new message as ``(id, created_at)``;
+    those conversations are created if missing and move their last-message
+    pointer forward. Other pairs are only updated in place.
+    """
+    latest = latest or {}
+    table = Conversation._meta.db_table
+    now = timezone.now()
+    sends = [
+        (*key, *deltas.get(key, ZERO), message_id, created_at, now)
+        for key, (message_id, created_at) in latest.items()
+    ]
+    updates = [(*delta, now, *key) for key, delta in deltas.items() if key not in latest and any(delta)]
+    with connection.cursor() as cursor:
+        if sends:
+            newer = f'EXCLUDED.last_activity_at >= {table}.last_activity_at'
+            cursor.executemany(
+                f'INSERT INTO {table} (user_low_id, user_high_id, message_count, unread_low, unread_high, '
+                f'last_message_id, last_activity_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s) '
+                f'ON CONFLICT (user_low_id, user_high_id) DO UPDATE SET '
+                f'message_count = {table}.message_count + EXCLUDED.message_count, '
+                f'unread_low = {table}.unread_low + EXCLUDED.unread_low, '
+                f'unread_high = {table}.unread_high + EXCLUDED.unread_high, '
+                f'last_message_id = CASE WHEN {newer} THEN EXCLUDED.last_message_id ELSE {table}.last_message_id END, '
+                f'last_activity_at = CASE WHEN {newer} THEN EXCLUDED.last_activity_at ELSE {table}.last_activity_at END, '
+                f'updated_at = EXCLUDED.updated_at',
+                sends
+            )
+        if updates:
+            cursor.executemany(
+                f'UPDATE {table} SET message_count = message_count + %s, unread_low = unread_low + %s, '
+                f'unread_high = unread_high + %s, updated_at = %s WHERE user_low_id = %s AND user_high_id = %s',
+                updates
+            )
+
+
+def add_delta(deltas, key, values, sign):
+    current = deltas.get(key, ZERO)
+    deltas[key] = tuple(total + sign * value for total, value in zip(current, values))
+
+
+def record_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas, latest = {}, {}
+    # Captured before the save by messaging.counters.capture_previous
+    previous = getattr(instance, '_message_previous', None)
+    if previous is not None:
+        add_delta(deltas, *contribution(*previous), -1)
+    key, values = contribution(instance.sender_id, instance.recipient_id, instance.is_read)
+    add_delta(deltas, key, values, 1)
+    if created:
+        latest[key] = (instance.pk, instance.created_at)
+    apply_deltas(deltas, latest)
+    if previous is not None and pair(*previous[:2]) != key:
+        # Moved to another pair: both last-message pointers may be stale
+        refresh([pair(*previous[:2]), key])
+
+
+def record_delete(sender, instance, **kwargs):
+    # Locked before the delete by messaging.counters.capture_previous
+    previous = getattr(instance, '_message_previous', (instance.sender_id, instance.recipient_id, instance.is_read))
+    if previous is None:
+        return
+    key, values = contribution(*previous)
+    apply_deltas({key: tuple(-value for value in values)})
+    conversations = Conversation.objects.filter(user_low_id=key[0], user_high_id=key[1])
+    # The last-message foreign key was set to NULL if this message was it
+    if conversations.filter(last_message__isnull=True).exists():
+        last = Message.objects.filter(_pair_filter([key])).order_by('-id').values_list('pk', 'created_at').first()
+        if last is None:
+            conversations.delete()
+        else:
+            conversations.update(last_message_id=last[0], last_activity_at=last[1], updated_at=timezone.now())
+
+
+post_save.connect(record_save, sender=Message, dispatch_uid='messaging.conversations.post_save')
+post_delete.connect(record_delete, sender=Message, dispatch_uid='messaging.conversations.post_delete')
+
+
+def _pair_filter(pairs):
+    condition = Q(pk__in=[])
+    for user_low, user_high in pairs:
+        condition |= Q(sender_id=user_low, recipient_id=user_high) | Q(sender_id=user_high, recipient_id=user_low)
+    return condition
+
+
+def recompute(pairs=None):
+    """``{pair: (messages, unread_low, unread_high, last_message_id, last_activity_at)}`` from ``Message``"""
+    queryset = Message.objects.all() if pairs is None else Message.objects.filter(_pair_filter(pairs))
+    totals = {}
+    rows = queryset.values('sender_id', 'recipient_id', 'is_read').annotate(
+        messages=Count('pk'), last_id=Max('id')
+    ).order_by()
+    for row in rows:
+        key, values = contribution(row['sender_id'], row['recipient_id'], row['is_read'])
+        messages, unread_low, unread_high, last_id = totals.get(key, (0, 0, 0, None))
+        totals[key] = (
+            messages + row['messages'],
+            unread_low + values[1] * row['messages'],
+            unread_high + values[2] * row['messages'],
+            max(last_id or 0, row['last_id']),
+        )
+    last = dict(Message.objects.filter(
+        pk__in=[values[3] for values in totals.values()]
+    ).values_list('pk', 'created_at'))
+    return {key: (*values, last[values[3]]) for key, values in totals.items()}
+
+
+def refresh(pairs):
+    """Recompute the given conversations from ``Message``"""
+    pairs = list(dict.fromkeys(pairs))
+    rows = recompute(pairs)
+    for key in pairs:
+        conversations = Conversation.objects.filter(user_low_id=key[0], user_high_id=key[1])
+        if key not in rows:
+            conversations.delete()
+            continue
+        messages, unread_low, unread_high, last_id, last_at = rows[key]
+        updated = conversations.update(
+            message_count=messages, unread_low=unread_low, unread_high=unread_high,
+            last_message_id=last_id, last_activity_at=last_at, updated_at=timezone.now()
+        )
+        if not updated:
+            Conversation.objects.create(
+                user_low_id=key[0], user_high_id=key[1], message_count=messages,
+                unread_low=unread_low, unread_high=unread_high,
+                last_message_id=last_id, last_activity_at=last_at
+            )
+
+
+@transaction.atomic
+def rebuild():
+    """Replace every conversation with a full recompute; returns the row count"""
+    rows = recompute()
+    Conversation.objects.all().delete()
+    Conversation.objects.bulk_create([
+        Conversation(
+            user_low_id=user_low, user_high_id=user_high, message_count=messages,
+            unread_low=unread_low, unread_high=unread_high,
+            last_message_id=last_id, last_activity_at=last_at
+        )
+        for (user_low, user_high), (messages, unread_low, unread_high, last_id, last_at) in rows.items()
+    ], batch_size=1000)
+    return len(rows)
@@ -0,0 +1,116 @@
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.utils import timezone
+
+from .models import Message, UnreadCounter
+
+
+def apply_deltas(deltas):
+    """Add ``{user_id: change}`` to the users' unread counters"""
+    table = UnreadCounter._meta.db_table
+    now = timezone.now()
+    rows = [(user_id, delta, now) for user_id, delta in deltas.items() if delta]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} (user_id, unread_count, updated_at) VALUES (%s, %s, %s) '
+            f'ON CONFLICT (user_id) DO UPDATE SET '
+            f'unread_count = {table}.unread_count + EXCLUDED.unread_count, updated_at = EXCLUDED.updated_at',
+            rows
+        )
+
+
+def unread_count(user):
+    """The counter value for ``user``; no counter row means nothing unread"""
+    return UnreadCounter.objects.filter(user=user).values_list('unread_count', flat=True).first() or 0
+
+
+def _add(deltas, recipient_id, is_read, sign):
+    if not is_read:
+        deltas[recipient_id] = deltas.get(recipient_id, 0) + sign
+
+
+def capture_previous(sender, instance, raw=False, using=None, **kwargs):
+    """
+    Stash the stored ``(sender, recipient, is_read)``; messaging.conversations reads it too.
+
+    Inside a transaction the row is locked until commit, so two concurrent
+    saves of one message cannot both read the same previous state and apply
+    its delta twice. Saves that should keep the counters exact under
+    concurrency must therefore run in ``transaction.atomic``.
+    """
+    instance._message_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    queryset = Message.objects.using(using).filter(pk=instance.pk)
+    if transaction.get_connection(using).in_atomic_block:
+        queryset = queryset.select_for_update()
+    instance._message_previous = queryset.values_list('sender_id', 'recipient_id', 'is_read').first()
+
+
+def record_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    previous = getattr(instance, '_message_previous', None)
+    if previous is not None:
+        _add(deltas, *previous[1:], -1)
+    _add(deltas, instance.recipient_id, instance.is_read, 1)
+    apply_deltas(deltas)
+
+
+def record_delete(sender, instance, **kwargs):
+    # The stored row locked by pre_delete rather than the possibly stale
+    # instance; None means a concurrent delete already removed it
+    previous = getattr(instance, '_message_previous', (None, instance.recipient_id, instance.is_read))
+    if previous is None:
+        return
+    deltas = {}
+    _add(deltas, *previous[1:], -1)
+    apply_deltas(deltas)
+
+
+pre_save.connect(capture_previous, sender=Message, dispatch_uid='messaging.counters.pre_save')
+pre_delete.connect(capture_previous, sender=Message, dispatch_uid='messaging.counters.pre_delete')
+post_save.connect(record_save, sender=Message, dispatch_uid='messaging.counters.post_save')
+post_delete.connect(record_delete, sender=Message, dispatch_uid='messaging.counters.post_delete')
+
+
+def recount(user_ids=None):
+    """``{user_id: unread}`` counted from scratch over ``Message``"""
+    queryset = Message.objects.filter(is_read=False)
+    if user_ids is not None:
+        queryset = queryset.filter(recipient_id__in=user_ids)
+    rows = queryset.values('recipient_id').annotate(unread=Count('pk')).order_by()
+    return {row['recipient_id']: row['unread'] for row in rows}
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    """Replace the counters (of ``user_ids``, or everyone) with a full recount; returns the row count"""
+    counts = recount(user_ids)
+    counters = UnreadCounter.objects.all()
+    if user_ids is not None:
+        counters = counters.filter(user_id__in=user_ids)
+    counters.delete()
+    UnreadCounter.objects.bulk_create([
+        UnreadCounter(user_id=user_id, unread_count=unread)
+        for user_id, unread in counts.items()
+    ], batch_size=1000)
+    return len(counts)
+
+
+def verify(user_ids=None):
+    """Counters that differ from a full recount: ``{user_id: (counter, recounted)}``"""
+    expected = recount(user_ids)
+    counters = UnreadCounter.objects.all()
+    if user_ids is not None:
+        counters = counters.filter(user_id__in=user_ids)
+    actual = dict(counters.values_list('user_id', 'unread_count'))
+    return {
+        user_id: (actual.get(user_id, 0), expected.get(user_id, 0))
+        for user_id in expected.keys() | actual.keys()
+        if actual.get(user_id, 0) != expected.get(user_id, 0)
+    }
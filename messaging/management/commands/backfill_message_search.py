@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from messaging import search
+
+
+class Command(BaseCommand):
+    help = 'Fill the full-text search vector of messages written before it existed, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        done = 0
+        for done in search.backfill(options['batch_size']):
+            self.stdout.write(f'{done:,} messages indexed')
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled {done:,} messages in {time.perf_counter() - start:.1f}s'
+        ))
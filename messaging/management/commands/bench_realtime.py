@@ -0,0 +1,105 @@
+import asyncio
+import gc
+import os
+import time
+import tracemalloc
+
+import psutil
+from django.core.management.base import BaseCommand, CommandError
+
+from messaging.realtime import Hub, LocalBackend, serve
+
+
+class _Client:
+    """An idle in-memory WebSocket client: never sends, counts what it receives"""
+
+    def __init__(self):
+        self.closed = asyncio.get_running_loop().create_future()
+        self.received = 0
+        self.done = None
+
+    async def receive(self):
+        await self.closed
+        return {'type': 'websocket.disconnect'}
+
+    async def emit(self, event):
+        self.received += 1
+        if self.done is not None and not self.done.done():
+            self.done.set_result(None)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure how many idle real-time connections one worker can hold: '
+        'application-side memory per connection and fan-out time, without sockets'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=20_000)
+        parser.add_argument('--users', type=int, default=0, help='Distinct users (default: one per connection)')
+        parser.add_argument('--memory-budget', type=int, default=1024, help='MB a worker may spend on connections')
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        count = options['connections']
+        users = options['users'] or count
+        hub = Hub()
+        hub._backend = LocalBackend(hub, {})
+        process = psutil.Process(os.getpid())
+
+        gc.collect()
+        rss_before = process.memory_info().rss
+        tracemalloc.start()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        clients = [_Client() for _ in range(count)]
+        tasks = [
+            asyncio.ensure_future(serve(index % users + 1, client.receive, client.emit, {'websocket.disconnect'}, hub=hub))
+            for index, client in enumerate(clients)
+        ]
+        while hub.connection_count < count:
+            await asyncio.sleep(0)
+        opened = time.perf_counter() - start
+        await asyncio.sleep(0.1)
+        gc.collect()
+        traced = tracemalloc.get_traced_memory()[0] - traced_before
+        tracemalloc.stop()
+        rss = process.memory_info().rss - rss_before
+
+        per_connection = traced / count
+        self.stdout.write(f'Opened {count:,} idle connections in {opened:.2f}s')
+        self.stdout.write(
+            f'Memory: {per_connection / 1024:.2f} KiB per connection traced, '
+            f'{rss / count / 1024:.2f} KiB per connection RSS growth'
+        )
+        budget = options['memory_budget'] * 1024 * 1024
+        self.stdout.write(
+            f"Capacity: about {budget / max(per_connection, rss / count):,.0f} idle connections "
+            f"per {options['memory_budget']} MB (application side; add the server's per-socket cost)"
+        )
+
+        # One event to every user, delivered through the hub
+        loop = asyncio.get_running_loop()
+        for client in clients:
+            client.done = loop.create_future()
+        start = time.perf_counter()
+        for user_id in range(1, users + 1):
+            hub.deliver(user_id, {'type': 'message', 'id': user_id})
+        await asyncio.gather(*(client.done for client in clients))
+        fanout = time.perf_counter() - start
+        self.stdout.write(f'Fan-out: {count:,} deliveries in {fanout * 1000:.1f}ms ({count / fanout:,.0f}/s)')
+
+        # The idle loop stays responsive while holding every connection
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        lag = time.perf_counter() - start - 0.01
+        self.stdout.write(f'Event loop lag while holding them: {lag * 1000:.2f}ms')
+
+        for client in clients:
+            client.closed.set_result(None)
+        await asyncio.gather(*tasks)
+        if hub.connection_count or any(client.received != 1 for client in clients):
+            raise CommandError('Connections did not each receive one event and unsubscribe cleanly')
+        self.stdout.write(self.style.SUCCESS('Every connection received its event and closed cleanly'))
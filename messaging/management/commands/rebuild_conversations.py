@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from messaging import conversations
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the conversation summary table from Message rows'
+
+    def handle(self, *args, **options):
+        rows = conversations.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} conversations'))
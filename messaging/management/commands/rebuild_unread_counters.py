@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from messaging import counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the per-user unread message counters from Message rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only this user ID (repeatable)')
+        parser.add_argument('--verify', action='store_true', help='Only report differences')
+
+    def handle(self, *args, **options):
+        user_ids = options['users']
+        if not options['verify']:
+            rows = counters.rebuild(user_ids)
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} unread counters'))
+            return
+
+        differences = counters.verify(user_ids)
+        for user_id, (actual, expected) in sorted(differences.items()):
+            self.stderr.write(f'user {user_id}: counter {actual}, recounted {expected}')
+        if differences:
+            raise CommandError(f'{len(differences)} unread counters differ from a full recount')
+        self.stdout.write(self.style.SUCCESS('Unread counters match a full recount'))
@@ -1,6 +1,44 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from accounts.models import User
 
+
+class MessageQuerySet(models.QuerySet):
+    def involving(self, user):
+        """Messages ``user`` sent or received"""
+        return self.filter(models.Q(sender=user) | models.Q(recipient=user))
+
+    def inbox_parts(self, user, archived=False):
+        """
+        The sent and received halves of ``user``'s messages, each one index scan.
+
+        Messages to oneself belong to the sent half only, so the halves never
+        overlap and can be combined with ``UNION ALL``. Only messages ``user``
+        has archived on their side are included with ``archived``, none otherwise.
+        """
+        return (
+            self.filter(sender=user, sender_archived_at__isnull=not archived),
+            self.filter(recipient=user, recipient_archived_at__isnull=not archived).exclude(sender=user),
+        )
+
+    def thread_parts(self, user, other):
+        """The two directions of ``user``'s conversation with ``other``, each one index scan"""
+        return (
+            self.filter(sender=user, recipient=other),
+            self.filter(sender=other, recipient=user).exclude(sender=user),
+        )
+
+    def received_after(self, user, message_id):
+        """Messages to ``user`` newer than ``message_id``, oldest first"""
+        return self.filter(recipient=user, id__gt=message_id).order_by('id')
+
+    def inbox(self, user, archived=False):
+        """``involving(user)`` newest first, as a ``UNION ALL`` of the two halves"""
+        sent, received = self.inbox_parts(user, archived)
+        return sent.order_by().union(received.order_by(), all=True).order_by('-created_at', '-id')
+
+
 class Message(models.Model):
     sender = models.ForeignKey(
         User,
@@ -14,11 +52,104 @@ class Message(models.Model):
     )
     content = models.TextField()
     is_read = models.BooleanField(default=False)
+    # Archiving hides a message from one side's inbox only
+    sender_archived_at = models.DateTimeField(null=True, blank=True)
+    recipient_archived_at = models.DateTimeField(null=True, blank=True)
+    # Kept current by messaging.search; NULL until written or backfilled
+    search_vector = SearchVectorField(null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MessageQuerySet.as_manager()
+
     def __str__(self):
         return f"From: {self.sender} To: {self.recipient}"
 
     class Meta:
-        ordering = ['-created_at'] 
\ No newline at end of file
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read', '-created_at']),
+            models.Index(fields=['recipient', '-created_at']),
+            models.Index(fields=['sender', '-created_at']),
+            models.Index(fields=['sender', 'recipient', '-id']),
+            models.Index(fields=['recipient', 'id']),
+            GinIndex(fields=['search_vector'], name='message_search_gin'),
+        ]
+
+
+class UnreadCounter(models.Model):
+    """Unread received messages per user, kept current by messaging.counters"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_counter'
+    )
+    unread_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count} unread"
+
+
+class ConversationQuerySet(models.QuerySet):
+    def for_user_parts(self, user):
+        """``user``'s conversations as two disjoint halves, one per side of the pair"""
+        return (
+            self.filter(user_low=user),
+            self.filter(user_high=user).exclude(user_low=user),
+        )
+
+
+class Conversation(models.Model):
+    """
+    One row per pair of users, kept current by messaging.conversations.
+
+    The pair is stored with the lower user ID first, so either side finds the
+    same row; a user's notes to themselves have ``user_low == user_high``.
+    """
+    user_low = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    user_high = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    last_message = models.ForeignKey(
+        Message,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+'
+    )
+    last_activity_at = models.DateTimeField()
+    message_count = models.IntegerField(default=0)
+    unread_low = models.IntegerField(default=0, help_text="Messages user_low has not read")
+    unread_high = models.IntegerField(default=0, help_text="Messages user_high has not read")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ConversationQuerySet.as_manager()
+
+    def counterpart_id(self, user_id):
+        return self.user_high_id if user_id == self.user_low_id else self.user_low_id
+
+    def unread_for(self, user_id):
+        return self.unread_low if user_id == self.user_low_id else self.unread_high
+
+    def __str__(self):
+        return f"{self.user_low_id} <-> {self.user_high_id}"
+
+    class Meta:
+        unique_together = ['user_low', 'user_high']
+        indexes = [
+            models.Index(fields=['user_low', '-last_activity_at', '-id']),
+            models.Index(fields=['user_high', '-last_activity_at', '-id']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(user_low__lte=models.F('user_high')),
+                name='conversation_ordered_pair'
+            ),
+        ]
@@ -0,0 +1,522 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models.signals import post_save
+from django.utils.module_loading import import_string
+
+from core.keyset import decode_cursor, encode_cursor
+from .models import Message
+from .serializers import MessageSerializer
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_PATH = '/ws/messages/'
+STREAM_PATH = '/api/messages/stream/'
+SINCE_PATHS = ('/api/messages/since', '/api/messages/since/')
+
+# Sent instead of a backlog the client could not keep up with; refetch over REST
+RESYNC = {'type': 'resync'}
+
+
+def get_config():
+    return {
+        'BACKEND': 'messaging.realtime.LocalBackend',
+        'CHANNEL': 'messaging_events',
+        'QUEUE_SIZE': 100,
+        'HEARTBEAT': 25,
+        'LONG_POLL_TIMEOUT': 30,
+        **getattr(settings, 'MESSAGING_REALTIME', {}),
+    }
+
+
+class Subscription:
+    """One connected client: a bounded queue of events for ``user_id``"""
+
+    def __init__(self, user_id, queue_size):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(queue_size)
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+
+class Hub:
+    """
+    In-process pub/sub between message writes and connected clients.
+
+    Subscriptions live on the event loop of the ASGI server; ``publish()``
+    may be called from any thread and goes through the configured backend,
+    which decides how far an event travels (this process, or every worker).
+    """
+
+    def __init__(self, backend=None):
+        self.subscriptions = {}
+        self.loop = None
+        self._backend = backend
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    config = get_config()
+                    self._backend = import_string(config['BACKEND'])(self, config)
+        return self._backend
+
+    @property
+    def connection_count(self):
+        return sum(len(subscriptions) for subscriptions in self.subscriptions.values())
+
+    def subscribe(self, user_id):
+        """Register a client; must be called on the event loop"""
+        self.loop = asyncio.get_running_loop()
+        self.backend.start()
+        subscription = Subscription(user_id, get_config()['QUEUE_SIZE'])
+        self.subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscriptions = self.subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.user_id]
+
+    def deliver(self, user_id, event):
+        """Queue ``event`` for every client of ``user_id``; runs on the event loop"""
+        for subscription in list(self.subscriptions.get(user_id, ())):
+            subscription.put(event)
+
+    def deliver_threadsafe(self, user_id, event):
+        loop = self.loop
+        # Skip the loop wakeup when nobody here is listening
+        if loop is None or loop.is_closed() or user_id not in self.subscriptions:
+            return
+        loop.call_soon_threadsafe(self.deliver, user_id, event)
+
+    def publish(self, user_id, event):
+        self.backend.publish(user_id, event)
+
+    def publish_many(self, events):
+        """Publish ``(user_id, event)`` pairs in one go"""
+        self.backend.publish_many(events)
+
+    def close(self):
+        if self._backend is not None:
+            self._backend.stop()
+
+
+class LocalBackend:
+    """Events reach clients of this process only; enough for one worker and for tests"""
+
+    def __init__(self, hub, config):
+        self.hub = hub
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def publish(self, user_id, event):
+        self.hub.deliver_threadsafe(user_id, event)
+
+    def publish_many(self, events):
+        for user_id, event in events:
+            self.publish(user_id, event)
+
+
+class PostgresBackend:
+    """
+    Events reach clients of every worker through PostgreSQL ``NOTIFY``.
+
+    Each ASGI worker runs one listener thread on its own connection and hands
+    notifications to its hub, so writers in any process (WSGI included) only
+    need a ``pg_notify`` on their usual connection. NOTIFY payloads are capped
+    at 8000 bytes; larger events are sent without their message body and
+    marked ``truncated`` for the client to fetch.
+    """
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, hub, config):
+        self.hub = hub
+        self.channel = config['CHANNEL']
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._listen, name='messaging-realtime-listen', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def _payload(self, user_id, event):
+        payload = json.dumps({'user': user_id, 'event': event})
+        if len(payload.encode()) > self.MAX_PAYLOAD:
+            payload = json.dumps({
+                'user': user_id,
+                'event': {'type': event['type'], 'id': event.get('id'), 'truncated': True},
+            })
+        return payload
+
+    def publish(self, user_id, event):
+        self.publish_many([(user_id, event)])
+
+    def publish_many(self, events):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                'SELECT pg_notify(%s, %s)',
+                [(self.channel, self._payload(user_id, event)) for user_id, event in events]
+            )
+
+    def _listen(self):
+        wrapper = connections['default']
+        while not self.stopping.is_set():
+            try:
+                listener = wrapper.get_new_connection(wrapper.get_connection_params())
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute(f'LISTEN {wrapper.ops.quote_name(self.channel)}')
+                while not self.stopping.is_set():
+                    if select.select([listener], [], [], 1.0) == ([], [], []):
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        notification = json.loads(listener.notifies.pop(0).payload)
+                        self.hub.deliver_threadsafe(notification['user'], notification['event'])
+                listener.close()
+            except Exception:
+                logger.exception('Realtime listener failed; reconnecting')
+                time.sleep(1)
+
+
+hub = Hub()
+
+
+def message_event(message):
+    return {'type': 'message', 'id': message.pk, 'message': dict(MessageSerializer(message).data)}
+
+
+def message_created(sender, instance, created, raw=False, **kwargs):
+    if raw or not created:
+        return
+    event = message_event(instance)
+    transaction.on_commit(lambda: hub.publish(instance.recipient_id, event))
+
+
+post_save.connect(message_created, sender=Message, dispatch_uid='messaging.realtime.post_save')
+
+
+# Messages since a cursor
+
+def parse_since(params):
+    """
+    ``(after_id, limit, timeout)`` from ``messages/since`` query parameters.
+
+    ``after_id`` is ``None`` without a cursor; raises ``ValueError``.
+    """
+    cursor = params.get('cursor')
+    after_id = decode_cursor(cursor, 1)[0] if cursor else None
+    if after_id is not None and not isinstance(after_id, int):
+        raise ValueError('Invalid cursor')
+    limit = int(params.get('limit', 100))
+    timeout = float(params.get('timeout', get_config()['LONG_POLL_TIMEOUT']))
+    if limit < 1 or not timeout >= 0:
+        raise ValueError('limit and timeout must be positive')
+    return after_id, min(limit, 500), min(timeout, get_config()['LONG_POLL_TIMEOUT'])
+
+
+def fetch_since(user_id, after_id, limit):
+    """
+    ``{'results', 'next_cursor'}`` for messages to ``user_id`` after ``after_id``.
+
+    Without a cursor nothing is returned, only a cursor at the newest
+    received message to poll from. Reads the ``(recipient, id)`` index.
+    """
+    messages = Message.objects.filter(recipient_id=user_id)
+    if after_id is None:
+        last = messages.order_by('-id').values_list('id', flat=True).first()
+        return {'results': [], 'next_cursor': encode_cursor([last or 0])}
+    page = list(Message.objects.received_after(user_id, after_id)[:limit])
+    return {
+        'results': MessageSerializer(page, many=True).data,
+        'next_cursor': encode_cursor([page[-1].pk if page else after_id]),
+    }
+
+
+def _fetch_since(user_id, after_id, limit):
+    close_old_connections()
+    try:
+        return fetch_since(user_id, after_id, limit)
+    finally:
+        close_old_connections()
+
+
+async def wait_since(user_id, after_id, limit, timeout, receive, hub=hub):
+    """
+    ``fetch_since``, parked for up to ``timeout`` seconds until there is something to return.
+
+    The request subscribes to the hub before the first query, so a message
+    committed in between still wakes it. While parked it holds no thread and
+    no database connection, only a hub subscription. Returns ``None`` if
+    the client disconnects first.
+    """
+    subscription = hub.subscribe(user_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+
+    async def wait_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    disconnected = asyncio.ensure_future(wait_disconnect())
+    try:
+        while True:
+            result = await sync_to_async(_fetch_since)(user_id, after_id, limit)
+            remaining = deadline - loop.time()
+            if result['results'] or after_id is None or remaining <= 0:
+                return result
+            get = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait({get, disconnected}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            get.cancel()
+            if disconnected in done:
+                return None
+            # Woken or timed out: either way the final answer comes from the database
+    finally:
+        disconnected.cancel()
+        hub.unsubscribe(subscription)
+
+
+# ASGI endpoints
+
+def handles(scope):
+    """Whether ``application`` serves this scope instead of Django"""
+    if scope['type'] == 'websocket':
+        return scope['path'] == WEBSOCKET_PATH
+    return scope['type'] == 'lifespan' or (
+        scope['type'] == 'http' and (scope['path'] == STREAM_PATH or scope['path'] in SINCE_PATHS)
+    )
+
+
+# Status and body for each way authenticate() can refuse a connection
+AUTHENTICATION_ERRORS = {
+    401: {'error': 'Authentication required'},
+    # As EmailVerificationMiddleware answers the REST API
+    403: {'error': 'Please verify your email address.'},
+}
+
+
+def _authenticate(raw_token):
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+    close_old_connections()
+    try:
+        authentication = JWTAuthentication()
+        user = authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None, 401
+    finally:
+        close_old_connections()
+    if not user.email_verified:
+        return None, 403
+    return user.pk, None
+
+
+async def authenticate(scope):
+    """
+    ``(user_id, None)`` from a ``Bearer`` header or, for browsers, a
+    ``?token=`` query parameter; ``(None, status)`` for a missing or invalid
+    token (401) or an unverified email address (403).
+    """
+    headers = dict(scope.get('headers', ()))
+    authorization = headers.get(b'authorization', b'').decode()
+    token = authorization[7:] if authorization.startswith('Bearer ') else None
+    if token is None:
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+    if not token:
+        return None, 401
+    return await sync_to_async(_authenticate)(token)
+
+
+async def serve(user_id, receive, emit, disconnect_types, hub=hub):
+    """
+    Push ``user_id``'s events through ``emit`` until the client goes away.
+
+    ``emit(None)`` is a heartbeat, sent whenever the connection has been
+    quiet for ``HEARTBEAT`` seconds so proxies keep it open.
+    """
+    heartbeat = get_config()['HEARTBEAT']
+    subscription = hub.subscribe(user_id)
+
+    async def wait_disconnect():
+        while (await receive())['type'] not in disconnect_types:
+            pass
+
+    disconnected = asyncio.ensure_future(wait_disconnect())
+    get = None
+    try:
+        while True:
+            get = get or asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait({get, disconnected}, timeout=heartbeat, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                return
+            if get in done:
+                event, get = get.result(), None
+                await emit(event)
+            else:
+                await emit(None)
+    except OSError:
+        # The server reports a write to a closed connection
+        return
+    finally:
+        if get is not None:
+            get.cancel()
+        disconnected.cancel()
+        hub.unsubscribe(subscription)
+
+
+async def websocket_endpoint(scope, receive, send):
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    user_id, error = await authenticate(scope)
+    if error is not None:
+        # 4401 / 4403: the HTTP status in the application close code range
+        await send({'type': 'websocket.close', 'code': 4000 + error})
+        return
+    await send({'type': 'websocket.accept'})
+
+    async def emit(event):
+        await send({'type': 'websocket.send', 'text': json.dumps(event or {'type': 'ping'})})
+
+    await serve(user_id, receive, emit, {'websocket.disconnect'})
+
+
+def cors_headers(scope):
+    """
+    The CORS headers django-cors-headers would add, for an ``Origin`` in
+    ``CORS_ALLOWED_ORIGINS``. These endpoints are served outside Django, so
+    its middleware never sees them.
+    """
+    origin = dict(scope.get('headers', ())).get(b'origin', b'').decode()
+    if not origin or origin not in getattr(settings, 'CORS_ALLOWED_ORIGINS', ()):
+        return []
+    headers = [(b'access-control-allow-origin', origin.encode()), (b'vary', b'origin')]
+    if getattr(settings, 'CORS_ALLOW_CREDENTIALS', False):
+        headers.append((b'access-control-allow-credentials', b'true'))
+    return headers
+
+
+async def preflight(send, cors):
+    """Answer an ``OPTIONS`` preflight for a GET endpoint; without ``cors`` the browser refuses"""
+    headers = list(cors)
+    if cors:
+        allow_headers = getattr(settings, 'CORS_ALLOW_HEADERS', ('authorization',))
+        headers += [
+            (b'access-control-allow-methods', b'GET, OPTIONS'),
+            (b'access-control-allow-headers', ', '.join(allow_headers).encode()),
+            (b'access-control-max-age', b'86400'),
+        ]
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [(b'content-length', b'0'), *headers]})
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def stream_endpoint(scope, receive, send):
+    """Server-sent events, for clients that cannot open a WebSocket"""
+    cors = cors_headers(scope)
+    if scope['method'] == 'OPTIONS':
+        await preflight(send, cors)
+        return
+    if scope['method'] != 'GET':
+        await send({'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'GET, OPTIONS'), *cors]})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    user_id, error = await authenticate(scope)
+    if error is not None:
+        await _respond(send, error, AUTHENTICATION_ERRORS[error], cors)
+        return
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no'), *cors,
+    ]})
+
+    async def emit(event):
+        if event is None:
+            body = b': ping\n\n'
+        else:
+            event_id = f"id: {event['id']}\n" if event.get('id') else ''
+            body = f"{event_id}event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode()
+        await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+    await serve(user_id, receive, emit, {'http.disconnect'})
+
+
+async def _respond(send, status, data, headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), *headers],
+    })
+    await send({'type': 'http.response.body', 'body': json.dumps(data).encode()})
+
+
+async def since_endpoint(scope, receive, send):
+    """Long poll: answers at once when there are newer messages, otherwise waits for one"""
+    cors = cors_headers(scope)
+    if scope['method'] == 'OPTIONS':
+        # The Authorization header makes every cross-origin poll preflighted
+        await preflight(send, cors)
+        return
+    if scope['method'] != 'GET':
+        await _respond(send, 405, {'error': 'Method not allowed'}, [(b'allow', b'GET, OPTIONS'), *cors])
+        return
+    user_id, error = await authenticate(scope)
+    if error is not None:
+        await _respond(send, error, AUTHENTICATION_ERRORS[error], cors)
+        return
+    params = {key: values[0] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+    try:
+        after_id, limit, timeout = parse_since(params)
+    except ValueError:
+        await _respond(send, 400, {'error': 'Invalid cursor, limit or timeout'}, cors)
+        return
+    result = await wait_since(user_id, after_id, limit, timeout, receive)
+    if result is not None:
+        await _respond(send, 200, result, [(b'cache-control', b'no-store'), *cors])
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            hub.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await websocket_endpoint(scope, receive, send)
+    elif scope['type'] == 'lifespan':
+        await lifespan(scope, receive, send)
+    elif scope['path'] in SINCE_PATHS:
+        await since_endpoint(scope, receive, send)
+    else:
+        await stream_endpoint(scope, receive, send)
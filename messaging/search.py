@@ -0,0 +1,94 @@
+import html
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import transaction
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.db.models.signals import post_save
+
+from core.keyset import keyset_page
+from .models import Message
+
+
+def get_config():
+    return {
+        'CONFIG': 'english',
+        'MAX_QUERY_LENGTH': 200,
+        'HEADLINE': {'max_words': 35, 'min_words': 15, 'max_fragments': 2},
+        **getattr(settings, 'MESSAGE_SEARCH', {}),
+    }
+
+
+# Placeholders that cannot occur in escaped text, swapped for <mark> tags afterwards
+MARK_START, MARK_STOP = '\x02', '\x03'
+
+
+def _highlight(headline):
+    return html.escape(headline).replace(MARK_START, '<mark>').replace(MARK_STOP, '</mark>')
+
+
+def update_vectors(queryset):
+    """Recompute ``search_vector`` for ``queryset`` with one UPDATE; returns the row count"""
+    return queryset.update(search_vector=SearchVector('content', config=get_config()['CONFIG']))
+
+
+def message_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'content' not in update_fields):
+        return
+    update_vectors(Message.objects.filter(pk=instance.pk))
+
+
+post_save.connect(message_saved, sender=Message, dispatch_uid='messaging.search.post_save')
+
+
+def backfill(batch_size=5000):
+    """
+    Fill ``search_vector`` where it is missing, ``batch_size`` rows per transaction.
+
+    Walks the primary key so every batch is an index range scan and short
+    row locks; yields the running count after each batch.
+    """
+    last_pk, done = 0, 0
+    while True:
+        batch = list(
+            Message.objects.filter(pk__gt=last_pk, search_vector__isnull=True)
+            .order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return
+        with transaction.atomic():
+            done += update_vectors(Message.objects.filter(pk__in=batch, search_vector__isnull=True))
+        last_pk = batch[-1]
+        yield done
+
+
+def search(user, text, cursor=None, limit=20):
+    """
+    ``user``'s sent and received messages matching ``text``, best first.
+
+    ``text`` uses web search syntax ("quoted phrases", or, -exclusions). The
+    GIN index finds the matches; ``rank`` is cast to double precision so the
+    ``(rank, id)`` keyset cursor round-trips exactly. Headlines are computed
+    for the returned page only and are HTML-escaped apart from their
+    ``<mark>`` tags. Returns ``(messages, next_cursor)``, each message
+    carrying ``rank`` and ``headline``.
+    """
+    config = get_config()
+    query = SearchQuery(text[:config['MAX_QUERY_LENGTH']], config=config['CONFIG'], search_type='websearch')
+    matches = Message.objects.involving(user).filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+    )
+    messages, next_cursor = keyset_page([matches], ['rank', 'id'], cursor, limit)
+
+    headlines = dict(
+        Message.objects.filter(pk__in=[message.pk for message in messages]).annotate(
+            headline=SearchHeadline(
+                'content', query, config=config['CONFIG'],
+                start_sel=MARK_START, stop_sel=MARK_STOP, **config['HEADLINE']
+            )
+        ).values_list('pk', 'headline')
+    )
+    for message in messages:
+        message.headline = _highlight(headlines.get(message.pk, ''))
+    return messages, next_cursor
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Message
+from .models import Message, Conversation
+from core.serializers import CompiledSerializer
 
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,4 +9,28 @@ class MessageSerializer(serializers.ModelSerializer):
             'id', 'sender', 'recipient', 'content',
             'is_read', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['sender', 'created_at', 'updated_at'] 
\ No newline at end of file
+        read_only_fields = ['sender', 'created_at', 'updated_at'] 
+
+class MessageCompiledSerializer(CompiledSerializer):
+    """Read-only fast path for message lists"""
+    serializer_class = MessageSerializer
+
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """A conversation as seen by ``context['user']``"""
+    counterpart = serializers.SerializerMethodField()
+    unread_count = serializers.SerializerMethodField()
+    last_message = MessageSerializer(read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = [
+            'id', 'counterpart', 'last_message', 'last_activity_at',
+            'message_count', 'unread_count'
+        ]
+
+    def get_counterpart(self, obj):
+        return obj.counterpart_id(self.context['user'].pk)
+
+    def get_unread_count(self, obj):
+        return obj.unread_for(self.context['user'].pk)
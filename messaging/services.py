@@ -0,0 +1,181 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import Employee
+from audit.services import AuditService
+from . import conversations, counters, search
+from .models import Message
+from .realtime import hub, message_event
+
+MAX_IDS = 1000
+
+
+class MessageSelectionError(ValueError):
+    """Raised for a bulk operation without a usable message selection"""
+
+
+class MessageBulkService:
+    """
+    Mark-read and archive over many of ``user``'s messages at once.
+
+    A selection is an ID list, everything up to a message ID, or both, and can
+    be narrowed to one ``counterpart``. Each operation is a single UPDATE ...
+    RETURNING; the returned rows feed the unread counter, conversation and
+    audit updates, which are each written in one batch.
+    """
+
+    def __init__(self, user, request=None):
+        self.user = user
+        self.request = request
+
+    def _selection(self, ids, up_to, counterpart_column, counterpart):
+        if ids is None and up_to is None:
+            raise MessageSelectionError('Give ids, a cursor, or both')
+        conditions, params = [], []
+        if ids is not None:
+            # A string would be iterated digit by digit: "56" is not [5, 6]
+            if not isinstance(ids, list):
+                raise MessageSelectionError('ids must be a list of message ids')
+            ids = [int(pk) for pk in ids]
+            if len(ids) > MAX_IDS:
+                raise MessageSelectionError(f'At most {MAX_IDS} ids per request')
+            if not ids:
+                return None, None
+            conditions.append(f'id IN ({", ".join(["%s"] * len(ids))})')
+            params.extend(ids)
+        if up_to is not None:
+            conditions.append('id <= %s')
+            params.append(int(up_to))
+        if counterpart is not None:
+            conditions.append(f'{counterpart_column} = %s')
+            params.append(int(counterpart))
+        return conditions, params
+
+    def _update(self, assignments, assignment_params, conditions, params, returning):
+        table = Message._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET {", ".join(assignments)} '
+                f'WHERE {" AND ".join(conditions)} RETURNING {returning}',
+                [*assignment_params, *params]
+            )
+            return cursor.fetchall()
+
+    def _audit(self, ids, details):
+        AuditService.log_actions_bulk(
+            user=self.user,
+            action='UPDATE',
+            objects=[Message(pk=pk) for pk in ids],
+            request=self.request,
+            details={**details, 'bulk': True},
+        )
+
+    @transaction.atomic
+    def mark_read(self, ids=None, up_to=None, counterpart=None):
+        """Mark the selected unread messages to ``user`` read; returns their IDs"""
+        conditions, params = self._selection(ids, up_to, 'sender_id', counterpart)
+        if conditions is None:
+            return []
+        rows = self._update(
+            ['is_read = %s', 'updated_at = %s'], [True, timezone.now()],
+            ['recipient_id = %s', 'is_read = %s', *conditions], [self.user.pk, False, *params],
+            'id, sender_id'
+        )
+        if not rows:
+            return []
+
+        unread = {}
+        for _, sender_id in rows:
+            key, values = conversations.contribution(sender_id, self.user.pk, False)
+            conversations.add_delta(unread, key, (0, *values[1:]), -1)
+        counters.apply_deltas({self.user.pk: -len(rows)})
+        conversations.apply_deltas(unread)
+        self._audit([pk for pk, _ in rows], {'is_read': True})
+        return [pk for pk, _ in rows]
+
+    @transaction.atomic
+    def archive(self, ids=None, up_to=None, counterpart=None):
+        """Archive the selected messages on ``user``'s side (sent and received); returns their IDs"""
+        now = timezone.now()
+        archived = []
+        for side, other in (('sender', 'recipient'), ('recipient', 'sender')):
+            conditions, params = self._selection(ids, up_to, f'{other}_id', counterpart)
+            if conditions is None:
+                return []
+            rows = self._update(
+                [f'{side}_archived_at = %s'], [now],
+                [f'{side}_id = %s', f'{side}_archived_at IS NULL', *conditions], [self.user.pk, *params],
+                'id'
+            )
+            archived.extend(pk for pk, in rows)
+        # A note to oneself is archived on both sides but counted once
+        archived = list(dict.fromkeys(archived))
+        if archived:
+            self._audit(archived, {'archived': True})
+        return archived
+
+
+class BroadcastService:
+    """
+    One message from ``sender`` to every user of a computed audience.
+
+    Messages are inserted with ``bulk_create`` in chunks of ``chunk_size``,
+    each chunk in its own transaction together with its search vectors,
+    unread counter, conversation and audit rows, and its real-time events go
+    out once it commits. Recipients without a user account are skipped, as is the sender.
+    """
+
+    def __init__(self, sender, content, request=None, chunk_size=1000):
+        self.sender = sender
+        self.content = content
+        self.request = request
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def employer_audience(employer):
+        """User IDs of an employer's employees"""
+        return Employee.objects.filter(
+            employer=employer, user__isnull=False
+        ).order_by().values_list('user_id', flat=True)
+
+    @staticmethod
+    def broker_audience(broker):
+        """User IDs of employees enrolled through a broker"""
+        return Employee.objects.filter(
+            plan_enrollments__broker=broker, user__isnull=False
+        ).order_by().values_list('user_id', flat=True).distinct()
+
+    def send(self, recipient_ids, audience=None):
+        """Send to ``recipient_ids``; returns the number of messages created"""
+        recipients = sorted(set(recipient_ids) - {self.sender.pk})
+        sent = 0
+        for start in range(0, len(recipients), self.chunk_size):
+            sent += self._send_chunk(recipients[start:start + self.chunk_size], audience)
+        return sent
+
+    @transaction.atomic
+    def _send_chunk(self, recipients, audience):
+        messages = Message.objects.bulk_create([
+            Message(sender=self.sender, recipient_id=recipient_id, content=self.content)
+            for recipient_id in recipients
+        ])
+        search.update_vectors(Message.objects.filter(pk__in=[message.pk for message in messages]))
+
+        deltas, latest = {}, {}
+        for message in messages:
+            key, values = conversations.contribution(message.sender_id, message.recipient_id, False)
+            conversations.add_delta(deltas, key, values, 1)
+            latest[key] = (message.pk, message.created_at)
+        counters.apply_deltas({recipient_id: 1 for recipient_id in recipients})
+        conversations.apply_deltas(deltas, latest)
+        AuditService.log_actions_bulk(
+            user=self.sender,
+            action='CREATE',
+            objects=messages,
+            request=self.request,
+            details={'broadcast': True, 'audience': audience},
+        )
+
+        events = [(message.recipient_id, message_event(message)) for message in messages]
+        transaction.on_commit(lambda: hub.publish_many(events))
+        return len(messages)
@@ -1,19 +1,199 @@
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from .models import Message
-from .serializers import MessageSerializer
-from django.db import models
+from rest_framework.response import Response
+from .models import Message, Conversation
+from .serializers import MessageSerializer, MessageCompiledSerializer, ConversationSerializer
+from . import counters, realtime, search
+from .services import BroadcastService, MessageBulkService, MessageSelectionError
+from accounts.models import Broker, Employer
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from core.keyset import decode_cursor, keyset_page
+from core.mixins import CompiledListMixin, ConditionalGetMixin
 
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(ConditionalGetMixin, CompiledListMixin, viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
+    compiled_serializer_class = MessageCompiledSerializer
     permission_classes = [IsAuthenticated]
+    keyset_page_size = 50
+    keyset_max_page_size = 200
+
+    def is_archive_view(self):
+        return self.request.query_params.get('archived', '').lower() in ('1', 'true', 'yes')
 
     def get_queryset(self):
         user = self.request.user
-        return Message.objects.filter(
-            models.Q(sender=user) | models.Q(recipient=user)
-        ).order_by('-created_at')
+        if self.action == 'list':
+            # Sent and received halves as two index scans instead of one OR scan
+            return Message.objects.inbox(user, archived=self.is_archive_view())
+        return Message.objects.involving(user).order_by('-created_at')
+
+    def get_validator_querysets(self, queryset):
+        if self.action == 'list':
+            return list(Message.objects.inbox_parts(self.request.user, archived=self.is_archive_view()))
+        return super().get_validator_querysets(queryset)
 
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(sender=self.request.user) 
\ No newline at end of file
+        # The unread counter is updated by a post_save signal in the same transaction
+        serializer.save(sender=self.request.user)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        serializer.save()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        """Unread received messages, answered from the user's counter row"""
+        return Response({'unread_count': counters.unread_count(request.user)})
+
+    def keyset_response(self, request, parts, fields, render):
+        """A ``{'results', 'next_cursor'}`` page of ``parts`` ordered by ``fields`` descending"""
+        try:
+            limit = int(request.query_params.get('limit', self.keyset_page_size))
+            if limit < 1:
+                raise ValueError('limit must be positive')
+            items, next_cursor = keyset_page(
+                parts, fields, request.query_params.get('cursor'), min(limit, self.keyset_max_page_size)
+            )
+        except (ValueError, ValidationError):
+            return Response({'error': 'Invalid cursor or limit'}, status=400)
+        return Response({'results': render(items), 'next_cursor': next_cursor})
+
+    @action(detail=False, methods=['get'])
+    def conversations(self, request):
+        """Latest message and unread count per counterpart, most recent first"""
+        def render(items):
+            prefetch_related_objects(items, 'last_message')
+            context = {**self.get_serializer_context(), 'user': request.user}
+            return ConversationSerializer(items, many=True, context=context).data
+
+        return self.keyset_response(
+            request,
+            Conversation.objects.for_user_parts(request.user),
+            ['last_activity_at', 'id'],
+            render
+        )
+
+    @action(detail=False, methods=['get'], url_path=r'thread/(?P<user_id>\d+)')
+    def thread(self, request, user_id=None):
+        """Messages between the user and ``user_id``, newest first"""
+        return self.keyset_response(
+            request,
+            Message.objects.thread_parts(request.user, int(user_id)),
+            ['id'],
+            lambda items: MessageCompiledSerializer(items).data
+        )
+
+    @action(detail=False, methods=['get'])
+    def since(self, request):
+        """
+        Messages received after ``cursor``, oldest first, answered immediately.
+
+        Under ASGI this path is served by messaging.realtime instead, which
+        parks the request until a message arrives or ``timeout`` passes.
+        """
+        try:
+            after_id, limit, _ = realtime.parse_since(request.query_params)
+        except ValueError:
+            return Response({'error': 'Invalid cursor, limit or timeout'}, status=400)
+        return Response(realtime.fetch_since(request.user.pk, after_id, limit))
+
+    def bulk_selection(self, request):
+        """``ids``, ``cursor`` (up to and including that message) and ``counterpart`` from the body"""
+        cursor = request.data.get('cursor')
+        up_to = decode_cursor(cursor, 1)[0] if cursor else None
+        return {
+            'ids': request.data.get('ids'),
+            'up_to': up_to,
+            'counterpart': request.data.get('counterpart'),
+        }
+
+    def bulk_operation(self, request, operation, key):
+        service = MessageBulkService(request.user, request=request)
+        try:
+            ids = getattr(service, operation)(**self.bulk_selection(request))
+        except (TypeError, ValueError) as e:
+            message = str(e) if isinstance(e, MessageSelectionError) else 'Invalid ids, cursor or counterpart'
+            return Response({'error': message}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({key: len(ids), 'ids': ids, 'unread_count': counters.unread_count(request.user)})
+
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        """Mark received messages read by ID list and/or up to a cursor, in one UPDATE"""
+        return self.bulk_operation(request, 'mark_read', 'updated')
+
+    @action(detail=False, methods=['post'])
+    def archive(self, request):
+        """Archive messages on the user's side by ID list and/or up to a cursor"""
+        return self.bulk_operation(request, 'archive', 'archived')
+
+    @action(detail=False, methods=['post'])
+    def broadcast(self, request):
+        """
+        Send one message to every employee of an employer or every client of a broker.
+
+        Employers and brokers reach their own audience; admins name it with
+        ``employer`` or ``broker``.
+        """
+        content = request.data.get('content')
+        if not content:
+            return Response({'error': 'content is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        employer_id, broker_id = request.data.get('employer'), request.data.get('broker')
+        if user.user_type == 'EMPLOYER':
+            employer = Employer.objects.filter(contact_person=user).first()
+            broker = None
+        elif user.user_type == 'BROKER':
+            employer, broker = None, Broker.objects.filter(user=user).first()
+        elif user.user_type == 'ADMIN' and bool(employer_id) != bool(broker_id):
+            try:
+                employer_id, broker_id = (int(pk) if pk else None for pk in (employer_id, broker_id))
+            except (TypeError, ValueError):
+                return Response({'error': 'employer and broker must be integer ids'}, status=status.HTTP_400_BAD_REQUEST)
+            employer = Employer.objects.filter(pk=employer_id).first() if employer_id else None
+            broker = Broker.objects.filter(pk=broker_id).first() if broker_id else None
+        elif user.user_type == 'ADMIN':
+            return Response({'error': 'Give exactly one of employer or broker'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            return Response({'error': 'Only employers, brokers and admins can broadcast'}, status=status.HTTP_403_FORBIDDEN)
+        if employer is None and broker is None:
+            return Response({'error': 'Audience not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        service = BroadcastService(user, content, request=request)
+        if employer is not None:
+            audience = f'employer:{employer.pk}'
+            sent = service.send(BroadcastService.employer_audience(employer), audience)
+        else:
+            audience = f'broker:{broker.pk}'
+            sent = service.send(BroadcastService.broker_audience(broker), audience)
+        return Response({'sent': sent, 'audience': audience}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Full-text search over the user's messages: ranked, highlighted, keyset-paginated"""
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 20))
+            if limit < 1:
+                raise ValueError('limit must be positive')
+            messages, next_cursor = search.search(
+                request.user, text, request.query_params.get('cursor'), min(limit, 100)
+            )
+        except (ValueError, ValidationError):
+            return Response({'error': 'Invalid cursor or limit'}, status=status.HTTP_400_BAD_REQUEST)
+        results = [
+            {**data, 'rank': message.rank, 'headline': message.headline}
+            for message, data in zip(messages, MessageSerializer(messages, many=True).data)
+        ]
+        return Response({'results': results, 'next_cursor': next_cursor})